@@ -0,0 +1,381 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from rutas_datos import (ARCHIVO_ESQUEMA, RUTA_RESULTADOS, RUTA_TRANSACCIONES,  # noqa: F401
+                         columnar_actualizado, ruta_columnar, version_tabla)
+
+# Almacenamiento columnar binario para transacciones y resultados RFM.
+#
+# Cada tabla se guarda en un directorio <nombre>.columnas/ con un esquema.json y
+# un archivo .npy por columna, de modo que se puede leer solo un subconjunto de
+# columnas (o mapearlas en memoria) sin parsear texto:
+#   - IDs y textos de baja cardinalidad: categóricos (códigos enteros + categorías)
+#   - textos de alta cardinalidad (p. ej. transaction_id): bytes de ancho fijo
+#   - fechas: datetime64[ns] nativo
+#   - enteros: el tipo más pequeño que contiene los valores
+#   - montos: float32 cuando redondear a sus decimales reproduce el valor original
+#
+# Con compacto=False (tablas compartidas entre procesos) los textos siempre son
+# categóricos y los montos se guardan en float64, así que cargar la tabla con
+# mmap=True no convierte ninguna columna numérica: los arrays del DataFrame son
+# las páginas del archivo, compartidas por todos los procesos que lo mapean.
+#
+# En memoria las tablas se cargan con tipos compactos (compactar_tipos), vengan
+# del CSV o del formato columnar; los montos en float32 se vuelven a float64
+# con valores_float64 antes de sumarlos.
+#
+# Uso: python almacenamiento_rfm.py [transacciones_rfm.csv resultados_rfm.csv] [--memoria]
+
+COLUMNAS_FECHA = ['transaction_date']
+
+# IDs que siempre se cargan como categóricos (aunque sean casi todos distintos,
+# como customer_id en resultados): los cruces entre tablas usan sus códigos
+COLUMNAS_ID = ['customer_id', 'product_id']
+
+# Proporción máxima de valores únicos para guardar un texto como categórico
+MAX_PROPORCION_CATEGORIAS = 0.5
+
+def _tipo_entero(valores):
+    if len(valores) == 0:
+        return np.int8
+    minimo, maximo = valores.min(), valores.max()
+    for tipo in (np.int8, np.int16, np.int32):
+        if np.iinfo(tipo).min <= minimo and maximo <= np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+# Menor número de decimales con el que float32 + redondeo reproduce exactamente
+# los valores float64 (si no hay ninguno la columna queda en float64: una
+# diferencia mínima en un monto cambia sumas y, con ellas, quintiles)
+def _decimales_float32(valores):
+    restaurados = valores.astype(np.float32).astype(np.float64)
+    for decimales in range(5):
+        if np.array_equal(np.round(restaurados, decimales), valores):
+            return decimales
+    return None
+
+# Se escribe en un directorio temporal que luego reemplaza al anterior, así
+# quien lea la tabla mientras tanto ve la versión vieja o la nueva completa
+def guardar_columnas(df, ruta, compacto=True):
+    destino = ruta
+    ruta = f'{destino}.tmp-{os.getpid()}'
+    shutil.rmtree(ruta, ignore_errors=True)
+    os.makedirs(ruta)
+    esquema = {'filas': len(df), 'columnas': {}}
+
+    for columna in df.columns:
+        serie = df[columna]
+        base = os.path.join(ruta, columna)
+
+        if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype == object:
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                if compacto and serie.nunique() > MAX_PROPORCION_CATEGORIAS * len(serie):
+                    np.save(base + '.npy', serie.str.encode('utf-8').to_numpy(dtype=bytes))
+                    esquema['columnas'][columna] = {'tipo': 'texto'}
+                    continue
+                serie = serie.astype('category')
+            codigos = serie.cat.codes.to_numpy()
+            np.save(base + '.npy', codigos.astype(_tipo_entero(codigos)))
+            np.save(base + '.categorias.npy', serie.cat.categories.to_numpy(dtype=str))
+            esquema['columnas'][columna] = {'tipo': 'categoria'}
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            np.save(base + '.npy', serie.to_numpy(dtype='datetime64[ns]'))
+            esquema['columnas'][columna] = {'tipo': 'fecha'}
+        elif pd.api.types.is_integer_dtype(serie):
+            valores = serie.to_numpy()
+            np.save(base + '.npy', valores.astype(_tipo_entero(valores)))
+            esquema['columnas'][columna] = {'tipo': 'entero'}
+        else:
+            valores = valores_float64(df, columna)
+            decimales = _decimales_float32(valores) if compacto else None
+            if decimales is None:
+                np.save(base + '.npy', valores)
+            else:
+                np.save(base + '.npy', valores.astype(np.float32))
+            esquema['columnas'][columna] = {'tipo': 'decimal', 'decimales': decimales}
+
+    # El esquema se escribe al final: su fecha de modificación marca la versión
+    with open(os.path.join(ruta, ARCHIVO_ESQUEMA), 'w') as f:
+        json.dump(esquema, f, indent=2)
+    _reemplazar_directorio(ruta, destino)
+
+# Los arrays ya mapeados en memoria desde el directorio anterior siguen siendo
+# válidos después de borrarlo
+def _reemplazar_directorio(nuevo, ruta):
+    anterior = f'{ruta}.old-{os.getpid()}'
+    if os.path.exists(ruta):
+        os.rename(ruta, anterior)
+    os.rename(nuevo, ruta)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+# Escritura por lotes de una tabla columnar con un número de filas conocido de
+# antemano: cada .npy se crea con su tamaño final y los lotes se escriben en su
+# posición, así que la memoria usada no depende del total. `columnas` describe
+# cada columna con su entrada del esquema más el dtype almacenado
+# ('categorias' para las categóricas; los lotes traen los códigos)
+class EscritorColumnas:
+    def __init__(self, ruta, filas, columnas):
+        self.ruta = ruta
+        self.temporal = f'{ruta}.tmp-{os.getpid()}'
+        self.filas = filas
+        self.posicion = 0
+        shutil.rmtree(self.temporal, ignore_errors=True)
+        os.makedirs(self.temporal)
+
+        self.esquema = {'filas': filas, 'columnas': {}}
+        self.archivos = {}
+        for columna, info in columnas.items():
+            base = os.path.join(self.temporal, columna)
+            if info['tipo'] == 'categoria':
+                np.save(base + '.categorias.npy', np.asarray(info['categorias'], dtype=str))
+            # open_memmap escribe la cabecera y reserva el archivo; los datos se
+            # escriben después con write para no retener páginas mapeadas
+            array = np.lib.format.open_memmap(base + '.npy', mode='w+', dtype=info['dtype'], shape=(filas,))
+            dtype, inicio = array.dtype, array.offset
+            del array
+            self.archivos[columna] = (open(base + '.npy', 'r+b'), dtype, inicio)
+            self.esquema['columnas'][columna] = {
+                clave: valor for clave, valor in info.items() if clave not in ('dtype', 'categorias')}
+
+    def escribir(self, lote):
+        filas = 0
+        for columna, (archivo, dtype, inicio) in self.archivos.items():
+            valores = np.ascontiguousarray(lote[columna], dtype=dtype)
+            archivo.seek(inicio + self.posicion * dtype.itemsize)
+            archivo.write(valores.tobytes())
+            filas = len(valores)
+        self.posicion += filas
+
+    def cerrar(self):
+        for archivo, _, _ in self.archivos.values():
+            archivo.close()
+        self.archivos = {}
+        if self.posicion != self.filas:
+            raise ValueError(f'se escribieron {self.posicion:,} de {self.filas:,} filas')
+        with open(os.path.join(self.temporal, ARCHIVO_ESQUEMA), 'w') as f:
+            json.dump(self.esquema, f, indent=2)
+        _reemplazar_directorio(self.temporal, self.ruta)
+
+def leer_esquema(ruta):
+    with open(os.path.join(ruta, ARCHIVO_ESQUEMA)) as f:
+        return json.load(f)
+
+# Con compacto=True los decimales guardados en float32 se dejan en float32
+# (valores_float64 recupera los originales)
+def _construir_columna(info, valores, categorias=None, compacto=False):
+    if info['tipo'] == 'categoria':
+        return pd.Categorical.from_codes(valores, dtype=categorias)
+    if info['tipo'] == 'texto':
+        return np.char.decode(valores, 'utf-8').astype(object)
+    if info['tipo'] == 'decimal' and info['decimales'] is not None and not compacto:
+        return np.round(valores.astype(np.float64), info['decimales'])
+    return valores
+
+def _abrir_columnas(ruta, columnas, mmap):
+    esquema = leer_esquema(ruta)
+    columnas = list(esquema['columnas']) if columnas is None else columnas
+    abiertas = {}
+    for columna in columnas:
+        info = esquema['columnas'][columna]
+        base = os.path.join(ruta, columna)
+        valores = np.load(base + '.npy', mmap_mode='r' if mmap else None)
+        categorias = None
+        if info['tipo'] == 'categoria':
+            # Un mismo dtype para todos los lotes: concatenarlos no compara categorías
+            categorias = cargar_categorias(ruta, columna)
+        abiertas[columna] = (info, valores, categorias)
+    return esquema, abiertas
+
+def cargar_categorias(ruta, columna):
+    return pd.CategoricalDtype(np.load(os.path.join(ruta, columna + '.categorias.npy')).astype(object))
+
+# Leer una tabla columnar. Con mmap=True los arrays numéricos se mapean en
+# memoria de solo lectura en lugar de copiarse (el DataFrame los usa sin
+# copiarlos); con `filas` (máscara o índices) solo se materializan esas filas.
+# Con compacto=True los montos quedan en float32 si así se guardaron
+def cargar_columnas(ruta, columnas=None, mmap=False, filas=None, compacto=False):
+    _, abiertas = _abrir_columnas(ruta, columnas, mmap or filas is not None)
+    df = pd.DataFrame({
+        columna: _construir_columna(info, valores if filas is None else valores[filas], categorias, compacto)
+        for columna, (info, valores, categorias) in abiertas.items()
+    }, copy=False)
+    if compacto:
+        df.attrs['decimales'] = {columna: info['decimales'] for columna, (info, valores, _) in abiertas.items()
+                                 if info['tipo'] == 'decimal' and valores.dtype == np.float32}
+    return df
+
+# Tipos compactos en memoria para una tabla leída con los tipos por defecto de
+# pandas: IDs y textos de baja cardinalidad categóricos, enteros en el tipo más
+# chico que los contiene (int8 para R/F/M, int16 para recency o RFM_Score) y
+# montos en float32 cuando redondear a sus decimales reproduce el valor (los
+# decimales quedan en df.attrs['decimales'] para valores_float64)
+def compactar_tipos(df):
+    columnas, decimales = {}, dict(df.attrs.get('decimales', {}))
+    for columna in df.columns:
+        serie = df[columna]
+        if serie.dtype == object:
+            if columna in COLUMNAS_ID or serie.nunique() <= MAX_PROPORCION_CATEGORIAS * len(serie):
+                serie = serie.astype('category')
+        elif pd.api.types.is_integer_dtype(serie) and not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(_tipo_entero(serie.to_numpy()))
+        elif pd.api.types.is_float_dtype(serie) and serie.dtype != np.float32:
+            valores = serie.to_numpy(dtype=np.float64)
+            cifras = _decimales_float32(valores) if len(valores) else None
+            if cifras is not None:
+                serie = serie.astype(np.float32)
+                decimales[columna] = cifras
+        columnas[columna] = serie
+    compacto = pd.DataFrame(columnas, index=df.index, copy=False)
+    compacto.attrs['decimales'] = decimales
+    return compacto
+
+# Valores de una columna numérica en float64; los montos compactados a float32
+# se redondean a sus decimales, así que las sumas dan lo mismo que con los
+# valores originales
+def valores_float64(df, columna):
+    valores = df[columna].to_numpy(dtype=np.float64)
+    decimales = df.attrs.get('decimales', {}).get(columna)
+    return valores if decimales is None else np.round(valores, decimales)
+
+# Memoria de un frame en MB (con el contenido de los textos)
+def memoria_mb(df):
+    return df.memory_usage(index=True, deep=True).sum() / 2**20
+
+# Recorrer una tabla columnar en lotes de `tamano_lote` filas; los arrays se
+# mapean en memoria, así que solo el lote actual se materializa
+def iterar_columnas(ruta, columnas=None, tamano_lote=1_000_000):
+    esquema, abiertas = _abrir_columnas(ruta, columnas, mmap=True)
+    for inicio in range(0, esquema['filas'], tamano_lote):
+        fin = inicio + tamano_lote
+        yield pd.DataFrame({
+            columna: _construir_columna(info, np.asarray(valores[inicio:fin]), categorias)
+            for columna, (info, valores, categorias) in abiertas.items()
+        })
+
+# Leer una tabla desde su versión columnar si existe y no es más antigua que
+# el CSV; si no, desde el CSV. Con compacto=True (lo que usan el dashboard y el
+# análisis) con los tipos de compactar_tipos
+def leer_tabla(ruta_csv, columnas=None, compacto=True):
+    if columnar_actualizado(ruta_csv):
+        return cargar_columnas(ruta_columnar(ruta_csv), columnas, compacto=compacto)
+
+    df = _leer_csv(ruta_csv, columnas)
+    return compactar_tipos(df) if compacto else df
+
+def _leer_csv(ruta_csv, columnas=None):
+    df = pd.read_csv(ruta_csv, usecols=columnas)
+    for columna in COLUMNAS_FECHA:
+        if columna in df.columns:
+            df[columna] = pd.to_datetime(df[columna])
+    return df
+
+# Igual que leer_tabla, pero en lotes de como máximo `tamano_lote` filas
+def iterar_tabla(ruta_csv, columnas=None, tamano_lote=1_000_000):
+    if columnar_actualizado(ruta_csv):
+        yield from iterar_columnas(ruta_columnar(ruta_csv), columnas, tamano_lote)
+        return
+
+    for lote in pd.read_csv(ruta_csv, usecols=columnas, chunksize=tamano_lote):
+        for columna in COLUMNAS_FECHA:
+            if columna in lote.columns:
+                lote[columna] = pd.to_datetime(lote[columna])
+        yield lote
+
+def leer_transacciones(columnas=None, ruta=RUTA_TRANSACCIONES, compacto=True):
+    return leer_tabla(ruta, columnas, compacto)
+
+def leer_resultados(columnas=None, ruta=RUTA_RESULTADOS, compacto=True):
+    return leer_tabla(ruta, columnas, compacto)
+
+# Directorio de la copia compartida de una tabla para su versión actual y
+# columnas pedidas
+def ruta_compartida(ruta_csv, directorio, columnas=None):
+    nombre = os.path.splitext(os.path.basename(ruta_csv))[0]
+    clave = 'todas' if columnas is None else format(zlib.crc32(','.join(columnas).encode()), '08x')
+    return os.path.join(directorio, f'{nombre}-{version_tabla(ruta_csv)}-{clave}.columnas')
+
+# Leer una tabla desde una copia compartida en `directorio` (p. ej. /dev/shm),
+# mapeada en memoria. El primer proceso que la pide la materializa (con un
+# bloqueo de archivo, los demás esperan y la reutilizan); después cada proceso
+# solo mapea los mismos archivos
+def leer_tabla_compartida(ruta_csv, directorio, columnas=None):
+    destino = ruta_compartida(ruta_csv, directorio, columnas)
+    if not os.path.exists(os.path.join(destino, ARCHIVO_ESQUEMA)):
+        os.makedirs(directorio, exist_ok=True)
+        with open(destino + '.lock', 'w') as bloqueo:
+            fcntl.flock(bloqueo, fcntl.LOCK_EX)
+            if not os.path.exists(os.path.join(destino, ARCHIVO_ESQUEMA)):
+                guardar_columnas(leer_tabla(ruta_csv, columnas, compacto=False), destino, compacto=False)
+    return cargar_columnas(destino, columnas, mmap=True)
+
+# Borrar las copias compartidas de una tabla salvo `conservar` (los procesos que
+# aún las tienen mapeadas las siguen viendo hasta soltarlas)
+def limpiar_compartidas(ruta_csv, directorio, conservar):
+    nombre = os.path.splitext(os.path.basename(ruta_csv))[0]
+    for archivo in os.listdir(directorio):
+        ruta = os.path.join(directorio, archivo)
+        if not archivo.startswith(nombre + '-') or ruta in (conservar, conservar + '.lock'):
+            continue
+        if archivo.endswith('.columnas'):
+            shutil.rmtree(ruta, ignore_errors=True)
+        elif archivo.endswith('.columnas.lock') and os.path.exists(ruta):
+            os.remove(ruta)
+
+def convertir_csv(ruta_csv):
+    destino = ruta_columnar(ruta_csv)
+    guardar_columnas(_leer_csv(ruta_csv), destino)
+    return destino
+
+# Guardar resultados RFM (indexados por customer_id) en CSV y en formato columnar
+# (el CSV también se reemplaza de una vez, para que el dashboard no lo lea a medias)
+def guardar_resultados(rfm, ruta=RUTA_RESULTADOS):
+    temporal = f'{ruta}.tmp-{os.getpid()}'
+    rfm.to_csv(temporal)
+    os.replace(temporal, ruta)
+    guardar_columnas(rfm.reset_index(), ruta_columnar(ruta))
+
+# Memoria de cada columna de una tabla con los tipos por defecto de pandas y
+# con los tipos compactos con que se carga
+def informe_memoria(ruta_csv):
+    antes = _leer_csv(ruta_csv)
+    despues = leer_tabla(ruta_csv)
+    memoria_antes = antes.memory_usage(index=False, deep=True) / 2**20
+    memoria_despues = despues.memory_usage(index=False, deep=True) / 2**20
+    return pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'mb_antes': memoria_antes,
+        'tipo_despues': despues.dtypes.astype(str),
+        'mb_despues': memoria_despues
+    })
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convertir CSVs de transacciones y resultados RFM a formato columnar')
+    parser.add_argument('archivos', nargs='*', default=[RUTA_TRANSACCIONES, RUTA_RESULTADOS])
+    parser.add_argument('--memoria', action='store_true',
+                        help='solo informar la memoria de cada tabla con tipos por defecto y compactos')
+    args = parser.parse_args()
+
+    if args.memoria:
+        for ruta_csv in args.archivos:
+            informe = informe_memoria(ruta_csv)
+            antes, despues = informe['mb_antes'].sum(), informe['mb_despues'].sum()
+            print(f"\n{ruta_csv}: {antes:,.2f} MB -> {despues:,.2f} MB ({despues / antes:.0%})")
+            print(informe.round(3).to_string())
+        return
+
+    for ruta_csv in args.archivos:
+        destino = convertir_csv(ruta_csv)
+        esquema = leer_esquema(destino)
+        tipos = ', '.join(f"{c}:{i['tipo']}" for c, i in esquema['columnas'].items())
+        print(f"{ruta_csv} -> {destino} ({esquema['filas']:,} filas; {tipos})")
+
+if __name__ == '__main__':
+    main()
@@ -1,143 +1,363 @@
+import argparse
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import pandas as pd
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
-# Leer los datos
-df = pd.read_csv('transacciones_rfm.csv')
-df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-
-# Establecer la fecha de análisis (último día en los datos)
-fecha_analisis = df['transaction_date'].max()
-
-# Calcular métricas RFM por cliente
-rfm = df.groupby('customer_id').agg({
-    'transaction_date': lambda x: (fecha_analisis - x.max()).days,  # Recency
-    'transaction_id': 'count',  # Frequency
-    'total_amount': 'sum'  # Monetary
-}).rename(columns={
-    'transaction_date': 'recency',
-    'transaction_id': 'frequency',
-    'total_amount': 'monetary'
-})
-
-# Calcular quintiles para cada métrica
-r_labels = range(5, 0, -1)  # 5 es mejor (compra reciente)
-f_labels = range(1, 6)      # 5 es mejor (compra frecuente)
-m_labels = range(1, 6)      # 5 es mejor (gasta más)
-
-r_quintiles = pd.qcut(rfm['recency'], q=5, labels=r_labels)
-f_quintiles = pd.qcut(rfm['frequency'], q=5, labels=f_labels)
-m_quintiles = pd.qcut(rfm['monetary'], q=5, labels=m_labels)
-
-# Agregar scores al dataframe
-rfm['R'] = r_quintiles
-rfm['F'] = f_quintiles
-rfm['M'] = m_quintiles
-
-# Calcular RFM Score
-rfm['RFM_Score'] = rfm['R'].astype(str) + rfm['F'].astype(str) + rfm['M'].astype(str)
-
-# Clasificar clientes
-def clasificar_cliente(row):
-    if row['R'] >= 4 and row['F'] >= 4 and row['M'] >= 4:
-        return 'Champions'
-    elif row['R'] >= 3 and row['F'] >= 3 and row['M'] >= 3:
-        return 'Leales'
-    elif row['R'] >= 3 and row['F'] >= 1 and row['M'] >= 2:
-        return 'Potenciales'
-    elif row['R'] <= 2 and row['F'] <= 2 and row['M'] <= 2:
-        return 'En riesgo'
-    elif row['R'] <= 1 and row['F'] <= 1 and row['M'] <= 1:
-        return 'Perdidos'
+from almacenamiento_rfm import (cargar_categorias, cargar_columnas, columnar_actualizado,
+                                guardar_columnas, guardar_resultados, iterar_tabla, leer_tabla,
+                                leer_transacciones, ruta_columnar, valores_float64)
+
+# Reglas de segmentación: se evalúan en orden y gana la primera que se cumple.
+# Cada regla indica el rango (mínimo, máximo) permitido para R, F y M; un eje
+# que no aparece acepta cualquier score. Los clientes que no cumplen ninguna
+# regla quedan en SEGMENTO_POR_DEFECTO.
+REGLAS_SEGMENTOS = [
+    ('Champions', {'R': (4, 5), 'F': (4, 5), 'M': (4, 5)}),
+    ('Leales', {'R': (3, 5), 'F': (3, 5), 'M': (3, 5)}),
+    ('Potenciales', {'R': (3, 5), 'F': (1, 5), 'M': (2, 5)}),
+    ('En riesgo', {'R': (1, 2), 'F': (1, 2), 'M': (1, 2)}),
+    ('Perdidos', {'R': (1, 1), 'F': (1, 1), 'M': (1, 1)}),
+]
+SEGMENTO_POR_DEFECTO = 'Regular'
+
+# Compilar las reglas en una tabla 5x5x5 (R, F, M) -> código de segmento
+def compilar_reglas(reglas=REGLAS_SEGMENTOS, por_defecto=SEGMENTO_POR_DEFECTO):
+    segmentos = [nombre for nombre, _ in reglas] + [por_defecto]
+    tabla = np.full((5, 5, 5), len(reglas), dtype=np.int8)
+    asignado = np.zeros((5, 5, 5), dtype=bool)
+    scores = dict(zip('RFM', np.indices((5, 5, 5)) + 1))
+
+    for codigo, (_, condiciones) in enumerate(reglas):
+        cumple = ~asignado
+        for eje, (minimo, maximo) in condiciones.items():
+            cumple &= (scores[eje] >= minimo) & (scores[eje] <= maximo)
+        tabla[cumple] = codigo
+        asignado |= cumple
+
+    return tabla, segmentos
+
+TABLA_SEGMENTOS, NOMBRES_SEGMENTOS = compilar_reglas()
+
+# Asignar el segmento de todos los clientes con una sola indexación de la tabla
+def asignar_segmentos(r, f, m, tabla=TABLA_SEGMENTOS, segmentos=NOMBRES_SEGMENTOS):
+    codigos = tabla[np.asarray(r) - 1, np.asarray(f) - 1, np.asarray(m) - 1]
+    return pd.Categorical.from_codes(codigos, categories=segmentos).remove_unused_categories()
+
+def codificar_rfm_score(r, f, m):
+    return (np.asarray(r, dtype=np.int16) * 100 +
+            np.asarray(f, dtype=np.int16) * 10 +
+            np.asarray(m, dtype=np.int16))
+
+def formatear_rfm_score(codigos):
+    return pd.Series(codigos).astype(str)
+
+# Columnas de resultados_rfm.csv
+COLUMNAS_RESULTADOS = ['recency', 'frequency', 'monetary', 'R', 'F', 'M', 'RFM_Score', 'Segmento']
+
+NS_POR_DIA = 86_400_000_000_000
+
+# Acumulados por cliente que se pueden combinar entre lotes de transacciones
+COLUMNAS_ACUMULADAS = ['frequency', 'monetary', 'margin', 'first_purchase', 'last_purchase']
+
+# Decimales de los montos de las transacciones (centavos). Las sumas por
+# cliente se redondean a esta precisión: el error de sumar en float en otro
+# orden (por lotes, particiones o en SQL) es mucho menor que medio centavo, así
+# que todos los modos dan exactamente los mismos montos y scores
+DECIMALES_MONTOS = 2
+MONTOS_ACUMULADOS = ['monetary', 'margin']
+
+# Columnas de transacciones necesarias para el análisis por cliente
+COLUMNAS_TRANSACCIONES = ['customer_id', 'transaction_date', 'total_amount', 'margin']
+
+def cargar_transacciones(ruta='transacciones_rfm.csv'):
+    return leer_transacciones(COLUMNAS_TRANSACCIONES, ruta=ruta)
+
+# Calcular métricas por cliente en una sola pasada vectorizada: los clientes se
+# codifican como enteros y las fechas como int64, de modo que cada métrica es un
+# bincount o un máximo/mínimo por código sin llamar a Python por grupo
+def agregar_clientes(df, fecha_analisis=None):
+    codigos, clientes = pd.factorize(df['customer_id'], sort=True)
+    n_clientes = len(clientes)
+    fechas = df['transaction_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    frecuencia = np.bincount(codigos, minlength=n_clientes)
+    monetario = np.round(np.bincount(codigos, weights=valores_float64(df, 'total_amount'),
+                                     minlength=n_clientes), DECIMALES_MONTOS)
+    margen = np.round(np.bincount(codigos, weights=valores_float64(df, 'margin'),
+                                  minlength=n_clientes), DECIMALES_MONTOS)
+
+    ultima_compra = np.full(n_clientes, np.iinfo(np.int64).min)
+    np.maximum.at(ultima_compra, codigos, fechas)
+    primera_compra = np.full(n_clientes, np.iinfo(np.int64).max)
+    np.minimum.at(primera_compra, codigos, fechas)
+
+    if fecha_analisis is None:
+        fecha_analisis = ultima_compra.max()
+
+    return pd.DataFrame({
+        'recency': calcular_recencia(ultima_compra, fecha_analisis),
+        'frequency': frecuencia,
+        'monetary': monetario,
+        'margin': margen,
+        'first_purchase': primera_compra.view('datetime64[ns]'),
+        'last_purchase': ultima_compra.view('datetime64[ns]')
+    }, index=pd.Index(clientes, name='customer_id'))
+
+# Días completos entre la última compra y la fecha de análisis (igual que Timedelta.days)
+def calcular_recencia(ultima_compra, fecha_analisis):
+    ultima_compra = np.asarray(ultima_compra)
+    if ultima_compra.dtype.kind == 'M':
+        ultima_compra = ultima_compra.astype('datetime64[ns]').view(np.int64)
+    return (pd.Timestamp(fecha_analisis).value - ultima_compra) // NS_POR_DIA
+
+# Fusionar la agregación de un lote con los acumulados por cliente (los
+# clientes nuevos se agregan al final y, con ordenar=True, se reordena por ID)
+def acumular_clientes(clientes, lote_agregado, ordenar=True):
+    lote_agregado = lote_agregado[COLUMNAS_ACUMULADAS]
+    if clientes is None:
+        return lote_agregado.copy()
+
+    posiciones = clientes.index.get_indexer(lote_agregado.index)
+    existentes = posiciones >= 0
+    filas = posiciones[existentes]
+    lote_existentes = lote_agregado[existentes]
+
+    for columna in ['frequency', 'monetary', 'margin']:
+        j = clientes.columns.get_loc(columna)
+        suma = clientes.iloc[filas, j].to_numpy() + lote_existentes[columna].to_numpy()
+        clientes.iloc[filas, j] = np.round(suma, DECIMALES_MONTOS) if columna in MONTOS_ACUMULADOS else suma
+    for columna, combinar in [('first_purchase', np.minimum), ('last_purchase', np.maximum)]:
+        j = clientes.columns.get_loc(columna)
+        clientes.iloc[filas, j] = combinar(clientes.iloc[filas, j].to_numpy(),
+                                           lote_existentes[columna].to_numpy())
+
+    if not existentes.all():
+        clientes = pd.concat([clientes, lote_agregado[~existentes]])
+        if ordenar:
+            clientes = clientes.sort_index()
+    return clientes
+
+# Modo streaming: leer las transacciones en lotes acotados y acumularlas por
+# cliente, de modo que la memoria depende del número de clientes y del tamaño
+# de lote, no del número de transacciones
+def agregar_clientes_por_lotes(ruta='transacciones_rfm.csv', tamano_lote=1_000_000,
+                               fecha_analisis=None):
+    clientes = None
+    for lote in iterar_tabla(ruta, COLUMNAS_TRANSACCIONES, tamano_lote):
+        clientes = acumular_clientes(clientes, agregar_clientes(lote), ordenar=False)
+
+    return _completar_recencia(clientes.sort_index(), fecha_analisis)
+
+# Recalcular la recencia de clientes agregados por partes con la fecha de
+# análisis global (por defecto, la última compra de todos los clientes)
+def _completar_recencia(clientes, fecha_analisis=None):
+    if fecha_analisis is None:
+        fecha_analisis = clientes['last_purchase'].max()
+    recencia = calcular_recencia(clientes['last_purchase'], fecha_analisis)
+    if 'recency' in clientes.columns:
+        clientes['recency'] = recencia
+    else:
+        clientes.insert(0, 'recency', recencia)
+    return clientes
+
+# Partición de cada transacción según su cliente. Con IDs categóricos (formato
+# columnar) el código ya identifica al cliente en todos los lotes; con texto se
+# usa un hash del ID
+def _particion_clientes(clientes, n_particiones):
+    if isinstance(clientes.dtype, pd.CategoricalDtype):
+        return clientes.cat.codes.to_numpy() % n_particiones
+    return pd.util.hash_pandas_object(clientes, index=False).to_numpy() % n_particiones
+
+# Agregar las transacciones de una partición de clientes (código de customer_id
+# módulo n_particiones) desde la versión columnar de `ruta`: se lee la columna
+# de clientes mapeada en memoria y del resto solo las filas de la partición.
+# Las filas se agregan juntas y en su orden original, así que los acumulados
+# son idénticos a los del modo serial. Con `error_cuantiles` devuelve además
+# los sketches KLL de sus clientes (cuantiles_rfm.sketches_particion), que son
+# completos en la partición
+def _agregar_particion(ruta, particion, n_particiones, error_cuantiles=None):
+    directorio = ruta_columnar(ruta)
+    clientes = cargar_columnas(directorio, ['customer_id'], mmap=True)['customer_id']
+    filas = np.flatnonzero(_particion_clientes(clientes, n_particiones) == particion)
+    agregado = agregar_clientes(cargar_columnas(directorio, COLUMNAS_TRANSACCIONES, filas=filas))
+    # Devolver códigos de cliente en lugar del índice categórico para no
+    # serializar todas las categorías desde cada proceso
+    agregado.index = agregado.index.codes
+    if error_cuantiles is None:
+        return agregado
+    from cuantiles_rfm import sketches_particion
+    return agregado, sketches_particion(agregado, error_cuantiles, semilla=particion)
+
+# Modo paralelo: cada proceso agrega una partición de clientes y los resultados
+# se unen antes de calcular quintiles y segmentos globales. Con
+# `error_cuantiles` devuelve (clientes, sketches): los sketches de cada
+# partición fusionados, para los cortes aproximados de los quintiles.
+#
+# Los procesos leen la versión columnar de las transacciones. Si no existe (o
+# es más antigua que el CSV), el CSV se lee una sola vez y se guarda en formato
+# columnar en un directorio temporal: cada proceso mapea solo sus filas en
+# lugar de volver a leer el CSV completo y descartar las de otras particiones
+def agregar_clientes_en_paralelo(ruta='transacciones_rfm.csv', workers=2,
+                                 fecha_analisis=None, error_cuantiles=None):
+    if not columnar_actualizado(ruta):
+        with tempfile.TemporaryDirectory() as directorio:
+            temporal = os.path.join(directorio, os.path.basename(ruta))
+            transacciones = leer_tabla(ruta, COLUMNAS_TRANSACCIONES, compacto=False)
+            # Clientes como categoría: el código identifica la partición
+            transacciones['customer_id'] = transacciones['customer_id'].astype('category')
+            guardar_columnas(transacciones, ruta_columnar(temporal))
+            del transacciones
+            return agregar_clientes_en_paralelo(temporal, workers, fecha_analisis, error_cuantiles)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partes = list(pool.map(_agregar_particion, repeat(ruta), range(workers),
+                               repeat(workers), repeat(error_cuantiles)))
+    sketches = None
+    if error_cuantiles is not None:
+        from cuantiles_rfm import fusionar_sketches
+        partes, sketches = zip(*partes)
+        sketches = fusionar_sketches(sketches)
+    clientes = pd.concat(partes).sort_index()
+
+    tipo = cargar_categorias(ruta_columnar(ruta), 'customer_id')
+    clientes.index = pd.CategoricalIndex(
+        pd.Categorical.from_codes(clientes.index, dtype=tipo), name='customer_id')
+    clientes = _completar_recencia(clientes, fecha_analisis)
+    return clientes if error_cuantiles is None else (clientes, sketches)
+
+# Pico de memoria residente del proceso en MB (ru_maxrss está en KB en Linux)
+def memoria_pico_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Asignar scores R, F, M por quintiles y RFM_Score
+# (con `cortes` = {métrica: bordes de los bins} se usan cortes precalculados,
+# p. ej. aproximados con cuantiles_rfm, en lugar de qcut exacto)
+def puntuar_quintiles(rfm, cortes=None):
+    # Calcular quintiles para cada métrica (scores enteros 1-5)
+    # R: 5 es mejor (compra reciente); F y M: 5 es mejor (compra frecuente / gasta más)
+    if cortes is None:
+        quintil = lambda metrica: pd.qcut(rfm[metrica], q=5, labels=False)
+    else:
+        quintil = lambda metrica: pd.cut(rfm[metrica], bins=cortes[metrica], labels=False,
+                                         include_lowest=True)
+    r_quintiles = 5 - quintil('recency')
+    f_quintiles = quintil('frequency') + 1
+    m_quintiles = quintil('monetary') + 1
+
+    # Agregar scores al dataframe
+    rfm['R'] = r_quintiles.astype(np.int8)
+    rfm['F'] = f_quintiles.astype(np.int8)
+    rfm['M'] = m_quintiles.astype(np.int8)
+
+    # Calcular RFM Score como código entero (R*100 + F*10 + M); el texto se genera
+    # solo cuando se necesita con formatear_rfm_score
+    rfm['RFM_Score'] = codificar_rfm_score(rfm['R'], rfm['F'], rfm['M'])
+    return rfm
+
+# Scores por quintiles y segmento de cada cliente
+def puntuar_rfm(rfm, cortes=None):
+    rfm = puntuar_quintiles(rfm, cortes)
+
+    # Clasificar clientes con la tabla de segmentos precalculada
+    rfm['Segmento'] = asignar_segmentos(rfm['R'], rfm['F'], rfm['M'])
+    return rfm
+
+def resumir_segmentos(rfm):
+    # Mostrar resumen de segmentos
+    print("\nResumen de Segmentos de Clientes:")
+    print(rfm['Segmento'].value_counts())
+
+    # Mostrar estadísticas por segmento
+    print("\nEstadísticas por Segmento:")
+    segmento_stats = rfm.groupby('Segmento', observed=True).agg({
+        'recency': 'mean',
+        'frequency': 'mean',
+        'monetary': 'mean'
+    }).round(2)
+    print(segmento_stats)
+    return segmento_stats
+
+# Gráficas de graficas_rfm.GRAFICAS; cada una se dibuja en un proceso del pool,
+# que es el único que importa matplotlib y seaborn
+GRAFICAS_RFM = ['barras', 'radar']
+
+def dibujar_grafica(nombre, segmento_stats):
+    from graficas_rfm import GRAFICAS
+    return GRAFICAS[nombre](segmento_stats)
+
+def main():
+    parser = argparse.ArgumentParser(description='Análisis RFM de clientes')
+    parser.add_argument('--transacciones', default='transacciones_rfm.csv')
+    parser.add_argument('--streaming', action='store_true',
+                        help='leer las transacciones en lotes (no requiere cargarlas completas en memoria)')
+    parser.add_argument('--tamano-lote', type=int, default=1_000_000,
+                        help='filas por lote en modo streaming')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='procesos para agregar particiones de clientes en paralelo')
+    parser.add_argument('--sql', action='store_true',
+                        help='agregar por cliente en la base SQL embebida de motor_sql.py '
+                             '(RFM_MOTOR_SQL, por defecto sqlite); la construye si no está al día')
+    parser.add_argument('--cuantiles-aproximados', action='store_true',
+                        help='calcular los cortes de quintiles con sketches KLL en lugar de qcut')
+    parser.add_argument('--error-cuantiles', type=float, default=0.01,
+                        help='error de rango de los cuantiles aproximados')
+    parser.add_argument('--comparar-exacto', action='store_true',
+                        help='informar cuántos clientes cambian de score respecto a qcut exacto')
+    parser.add_argument('--sin-graficas', action='store_true',
+                        help='solo calcular y guardar resultados (no importa matplotlib ni seaborn)')
+    args = parser.parse_args()
+
+    # Calcular métricas RFM por cliente con fecha de análisis = última compra en los datos
+    if args.sql:
+        from motor_sql import MOTOR_SQL, actualizar_base, agregar_clientes_sql, ruta_base
+        motor = MOTOR_SQL or 'sqlite'
+        actualizar_base(args.transacciones, ruta_base(motor), motor)
+        rfm = agregar_clientes_sql(ruta=ruta_base(motor), motor=motor)
+    elif args.workers > 1:
+        rfm = agregar_clientes_en_paralelo(args.transacciones, args.workers,
+                                           error_cuantiles=args.error_cuantiles
+                                           if args.cuantiles_aproximados else None)
+        if args.cuantiles_aproximados:
+            # Sketches calculados en cada partición y fusionados
+            rfm, sketches = rfm
+    elif args.streaming:
+        rfm = agregar_clientes_por_lotes(args.transacciones, args.tamano_lote)
     else:
-        return 'Regular'
-
-rfm['Segmento'] = rfm.apply(clasificar_cliente, axis=1)
-
-# Mostrar resumen de segmentos
-print("\nResumen de Segmentos de Clientes:")
-print(rfm['Segmento'].value_counts())
-
-# Mostrar estadísticas por segmento
-print("\nEstadísticas por Segmento:")
-segmento_stats = rfm.groupby('Segmento').agg({
-    'recency': 'mean',
-    'frequency': 'mean',
-    'monetary': 'mean'
-}).round(2)
-print(segmento_stats)
-
-# Modificar la configuración del estilo
-plt.style.use('default')  # Usar estilo default de matplotlib
-sns.set_theme()  # Aplicar tema de seaborn
-sns.set_palette("husl")
-
-# Crear figura con tres subplots
-fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 6))
-
-# Preparar datos para gráficas
-plot_data = segmento_stats.reset_index()
-
-# Gráfica de Recency
-sns.barplot(x='Segmento', y='recency', data=plot_data, ax=ax1)
-ax1.set_title('Días desde última compra por Segmento')
-ax1.set_xlabel('Segmento')
-ax1.set_ylabel('Días (promedio)')
-ax1.tick_params(axis='x', rotation=45)
-
-# Gráfica de Frequency
-sns.barplot(x='Segmento', y='frequency', data=plot_data, ax=ax2)
-ax2.set_title('Frecuencia de compras por Segmento')
-ax2.set_xlabel('Segmento')
-ax2.set_ylabel('Número de compras (promedio)')
-ax2.tick_params(axis='x', rotation=45)
-
-# Gráfica de Monetary
-sns.barplot(x='Segmento', y='monetary', data=plot_data, ax=ax3)
-ax3.set_title('Valor monetario por Segmento')
-ax3.set_xlabel('Segmento')
-ax3.set_ylabel('Monto total (promedio)')
-ax3.tick_params(axis='x', rotation=45)
-
-# Ajustar layout
-plt.tight_layout()
-
-# Guardar gráfica
-plt.savefig('analisis_rfm.png')
-
-# Crear gráfica de radar (spider plot)
-
-# Normalizar datos para el gráfico de radar
-normalized_stats = segmento_stats.copy()
-for column in ['recency', 'frequency', 'monetary']:
-    normalized_stats[column] = (segmento_stats[column] - segmento_stats[column].min()) / \
-                              (segmento_stats[column].max() - segmento_stats[column].min())
-    if column == 'recency':  # Invertir recency ya que menor es mejor
-        normalized_stats[column] = 1 - normalized_stats[column]
-
-# Crear gráfica de radar
-categories = ['Recency', 'Frequency', 'Monetary']
-fig = plt.figure(figsize=(10, 10))
-ax = fig.add_subplot(111, projection='polar')
-
-angles = np.linspace(0, 2*np.pi, len(categories), endpoint=False)
-angles = np.concatenate((angles, [angles[0]]))  # Cerrar el polígono
-
-for segmento in normalized_stats.index:
-    values = normalized_stats.loc[segmento].values
-    values = np.concatenate((values, [values[0]]))
-    ax.plot(angles, values, linewidth=2, label=segmento)
-    ax.fill(angles, values, alpha=0.25)
-
-ax.set_xticks(angles[:-1])
-ax.set_xticklabels(categories)
-ax.set_title('Comparación RFM por Segmento')
-plt.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1))
-
-plt.tight_layout()
-plt.savefig('radar_rfm.png')
-
-# Guardar resultados
-rfm.to_csv('resultados_rfm.csv') 
\ No newline at end of file
+        df = cargar_transacciones(args.transacciones)
+        rfm = agregar_clientes(df)
+        del df
+
+    if args.cuantiles_aproximados:
+        from cuantiles_rfm import comparar_con_exacto, cortes_desde_sketches, sketches_rfm
+        if args.workers <= 1 or args.sql:
+            sketches = sketches_rfm(rfm, args.error_cuantiles, semilla=0)
+        cortes = cortes_desde_sketches(sketches, rfm['last_purchase'].max())
+        if args.comparar_exacto:
+            exacto = puntuar_rfm(rfm.copy())
+        rfm = puntuar_rfm(rfm, cortes)
+        if args.comparar_exacto:
+            print("\nClientes con score distinto a qcut exacto:")
+            print(comparar_con_exacto(rfm, exacto).to_string())
+    else:
+        rfm = puntuar_rfm(rfm)
+
+    segmento_stats = resumir_segmentos(rfm)
+
+    # Guardar resultados; las gráficas se dibujan mientras tanto en otros procesos
+    if args.sin_graficas:
+        guardar_resultados(rfm[COLUMNAS_RESULTADOS])
+    else:
+        with ProcessPoolExecutor(max_workers=len(GRAFICAS_RFM)) as pool:
+            graficas = [pool.submit(dibujar_grafica, nombre, segmento_stats) for nombre in GRAFICAS_RFM]
+            guardar_resultados(rfm[COLUMNAS_RESULTADOS])
+            for grafica in graficas:
+                print(f"Gráfica guardada en {grafica.result()}")
+    print(f"\nMemoria pico: {memoria_pico_mb():,.1f} MB")
+
+if __name__ == '__main__':
+    main()
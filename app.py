@@ -1,434 +1,1032 @@
+from functools import lru_cache
+
 import dash
-from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-import random
-
-# Leer los datos RFM
-rfm = pd.read_csv('resultados_rfm.csv')
-df_transacciones = pd.read_csv('transacciones_rfm.csv')
-df_transacciones['transaction_date'] = pd.to_datetime(df_transacciones['transaction_date'])
+from dash import ctx, dcc, html, dash_table
+from dash.dependencies import Input, Output, State
+from flask import Response, request
+
+from datos_dashboard import (CARGA_DIFERIDA, al_publicar, datos_actuales, iniciar_vigilancia,
+                             precalcular)
+from figuras_dashboard import estadisticas_por_segmento, figuras_resumen, resumen_clientes
+from instrumentacion import (DURACION_AGREGADOS, PERFILADOR_HABILITADO, TIPO_CONTENIDO,
+                             exponer_metricas, instrumentar_callbacks, medido, perfilador)
+from motor_sql import MOTOR_SQL
+from paquete_dashboard import paquete_vigente
+
+# pandas, plotly y los módulos de cálculo (cubo_ventas, metricas_productos,
+# tabla_clientes, historial_clientes, dispersion_clientes, trabajos_rfm,
+# historico_rfm) se importan dentro de las funciones que los usan: con un
+# paquete precalculado vigente (paquete_dashboard.py) el worker arranca y sirve
+# la primera pestaña sin importarlos, mientras carga los datos en segundo plano
+#
+# Con RFM_MOTOR_SQL (motor_sql.py) las transacciones no se cargan: las métricas
+# de productos, los totales por categoría y segmento, los límites de fechas y
+# el historial de un cliente se consultan a la base SQL en lugar de salir del
+# cubo de ventas y del índice de historial
 
 # Inicializar la aplicación Dash
-app = dash.Dash(__name__)
+# (el contenido de las pestañas se crea en callbacks, por eso se suprimen los
+# errores de componentes que aún no están en el layout)
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server  # Línea necesaria para Render
 
 # Calcular estadísticas por segmento para el resumen
-segmento_stats = rfm.groupby('Segmento').agg({
-    'recency': 'mean',
-    'frequency': 'mean',
-    'monetary': 'mean'
-}).round(2)
-
-# Crear análisis de productos
-product_analysis = df_transacciones.groupby('product_id').agg({
-    'quantity': 'sum',
-    'total_amount': 'sum',
-    'transaction_id': 'count'
-}).rename(columns={
-    'transaction_id': 'num_ventas'
-})
-
-product_analysis['precio_promedio'] = product_analysis['total_amount'] / product_analysis['quantity']
-
-# Crear gráficas
-def create_bar_chart(data, x, y, title):
-    fig = px.bar(
-        data,
-        x=x,
-        y=y,
-        title=title,
-        color=x,
-        template='plotly_white'
-    )
-    return fig
+def _estadisticas_segmentos(datos):
+    return estadisticas_por_segmento(datos.rfm)
 
-def create_radar_chart():
-    # Normalizar datos
-    normalized_stats = segmento_stats.copy()
-    for column in ['recency', 'frequency', 'monetary']:
-        normalized_stats[column] = (segmento_stats[column] - segmento_stats[column].min()) / \
-                                 (segmento_stats[column].max() - segmento_stats[column].min())
-        if column == 'recency':
-            normalized_stats[column] = 1 - normalized_stats[column]
+def estadisticas_segmentos(datos):
+    return datos.derivado('estadisticas_segmentos', _estadisticas_segmentos)
 
-    fig = go.Figure()
-    categories = ['Recency', 'Frequency', 'Monetary']
+# Cubo de ventas por día, producto, categoría y segmento (se construye una vez por versión)
+def cubo_ventas(datos):
+    from cubo_ventas import construir_cubo
+
+    return datos.derivado('cubo_ventas', lambda d: construir_cubo(d.transacciones, d.rfm))
+
+# Primer y último día con transacciones
+def limites_fechas(datos):
+    if MOTOR_SQL:
+        from motor_sql import limites_fechas as limites
+
+        return datos.derivado('limites_fechas', lambda d: limites())
+    cubo = cubo_ventas(datos)
+    return cubo['fecha_min'], cubo['fecha_max']
+
+# Rango de fechas normalizado: None en los extremos que cubren todos los datos
+def rango_fechas(datos, inicio, fin):
+    import pandas as pd
+
+    fecha_min, fecha_max = limites_fechas(datos)
+    if inicio is not None and pd.Timestamp(inicio) <= fecha_min:
+        inicio = None
+    if fin is not None and pd.Timestamp(fin) >= fecha_max:
+        fin = None
+    return inicio, fin
+
+# Totales por producto, categoría o segmento entre dos fechas
+def totales_ventas(datos, dimension, inicio, fin):
+    if MOTOR_SQL:
+        from motor_sql import totales_sql
+
+        return totales_sql(dimension, inicio, fin)
+    from cubo_ventas import totales_rango
+
+    return totales_rango(cubo_ventas(datos), dimension, inicio, fin)
+
+# Crecimiento por producto del periodo que termina en `fin` contra el anterior,
+# sin ventas anteriores a `inicio`, por largo de periodo y versión de datos
+@lru_cache(maxsize=32)
+@medido(DURACION_AGREGADOS, 'crecimiento_productos')
+def crecimiento_productos(datos, dias_periodo, inicio, fin):
+    from cubo_ventas import crecimiento_rango
+
+    return crecimiento_rango(cubo_ventas(datos), 'product_id', dias_periodo, fin, inicio)
+
+# Métricas de productos (resumen, ABC, BCG) para un rango de fechas; el
+# crecimiento BCG compara los dos últimos periodos de `dias_periodo` días del rango
+# (por defecto, DIAS_PERIODO_CRECIMIENTO), recortados al inicio del rango
+def metricas_productos(datos, inicio=None, fin=None, dias_periodo=None):
+    from metricas_productos import DIAS_PERIODO_CRECIMIENTO
+
+    if dias_periodo is None:
+        dias_periodo = DIAS_PERIODO_CRECIMIENTO
+    if inicio is None and fin is None and dias_periodo == DIAS_PERIODO_CRECIMIENTO:
+        return datos.derivado('metricas_productos',
+                              lambda d: _metricas_productos_rango(d, None, None, dias_periodo))
+    return _metricas_productos_rango(datos, inicio, fin, dias_periodo)
+
+@lru_cache(maxsize=32)
+@medido(DURACION_AGREGADOS, 'metricas_productos_rango')
+def _metricas_productos_rango(datos, inicio, fin, dias_periodo):
+    if MOTOR_SQL:
+        from motor_sql import metricas_productos_sql
+
+        return metricas_productos_sql(inicio, fin, dias_periodo)
+    from cubo_ventas import totales_rango
+    from metricas_productos import metricas_desde_agregado
+
+    return metricas_desde_agregado(totales_rango(cubo_ventas(datos), 'product_id', inicio, fin),
+                                   crecimiento_productos(datos, dias_periodo, inicio, fin))
 
-    for segmento in normalized_stats.index:
-        fig.add_trace(go.Scatterpolar(
-            r=normalized_stats.loc[segmento],
-            theta=categories,
-            fill='toself',
-            name=segmento
-        ))
+# Selector de rango de fechas para las pestañas de productos
+def selector_fechas(id_selector, datos):
+    fecha_min, fecha_max = limites_fechas(datos)
+    return html.Div([
+        html.H4('Rango de fechas'),
+        dcc.DatePickerRange(
+            id=id_selector,
+            min_date_allowed=fecha_min.date(),
+            max_date_allowed=fecha_max.date(),
+            start_date=fecha_min.date(),
+            end_date=fecha_max.date(),
+            display_format='YYYY-MM-DD'
+        )
+    ], style={'margin': '10px'})
 
+PERIODOS_CRECIMIENTO = [30, 90, 180, 365]
+
+# Selector del largo de los periodos que compara el crecimiento BCG
+def selector_periodo():
+    from metricas_productos import DIAS_PERIODO_CRECIMIENTO
+
+    return html.Div([
+        html.H4('Periodo de crecimiento'),
+        dcc.Dropdown(
+            id='periodo-crecimiento',
+            options=[{'label': f'{dias} días', 'value': dias} for dias in PERIODOS_CRECIMIENTO],
+            value=DIAS_PERIODO_CRECIMIENTO,
+            clearable=False,
+            style={'width': '200px'}
+        )
+    ], style={'margin': '10px'})
+
+# Figuras del resumen RFM (las mismas que dibuja dashboard_rfm.py)
+def _figuras_rfm(datos):
+    return figuras_resumen(estadisticas_segmentos(datos))
+
+def figuras_rfm(datos):
+    return datos.derivado('figuras_rfm', _figuras_rfm)
+
+def resumen_rfm(datos):
+    return resumen_clientes(datos.rfm)
+
+# Recency y monetary de cada cliente ordenados por recency, para agrupar por rango
+def indice_dispersion(datos):
+    from dispersion_clientes import indexar_dispersion
+
+    return datos.derivado('indice_dispersion', lambda d: indexar_dispersion(d.rfm, 'recency', 'monetary'))
+
+def indice_distribucion(datos):
+    from dispersion_clientes import indexar_dispersion
+
+    return datos.derivado('indice_distribucion', lambda d: indexar_dispersion(d.rfm, 'monetary', 'recency'))
+
+# Dispersión monetary vs. recency de los clientes del rango visible: con muchos
+# clientes, una marca por celda de la rejilla con el color del segmento que
+# predomina y tamaño según cuántos clientes tiene
+@lru_cache(maxsize=32)
+@medido(DURACION_AGREGADOS, 'figura_dispersion')
+def figura_dispersion(datos, rango_x, rango_y):
+    import numpy as np
+    import plotly.graph_objects as go
+    from dispersion_clientes import rejilla_clientes
+
+    series, agrupado = rejilla_clientes(indice_dispersion(datos), rango_x, rango_y)
+    maximo = max((serie['clientes'].max() for serie in series.values()), default=1)
+    fig = go.Figure()
+    for segmento, serie in series.items():
+        if agrupado:
+            fig.add_trace(go.Scatter(
+                x=serie['x'], y=serie['y'], mode='markers', name=segmento,
+                marker=dict(size=4 + 16 * np.sqrt(serie['clientes'] / maximo), opacity=0.7),
+                customdata=serie['clientes'],
+                hovertemplate='recency ≈ %{x:.1f}<br>monetary ≈ %{y:,.2f}<br>%{customdata:,} clientes en la zona'
+            ))
+        else:
+            fig.add_trace(go.Scatter(
+                x=serie['x'], y=serie['y'], mode='markers', name=segmento,
+                marker=dict(size=6, opacity=0.7), text=serie['ids'],
+                hovertemplate='%{text}<br>recency %{x:.1f}<br>monetary %{y:,.2f}'
+            ))
     fig.update_layout(
-        polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-        showlegend=True,
-        title='Comparación RFM por Segmento'
+        title='Monetary vs. Recency por Cliente' + (' (agrupado por zona)' if agrupado else ''),
+        xaxis=dict(title='Días desde última compra', range=rango_x),
+        yaxis=dict(title='Valor total ($)', range=rango_y),
+        template='plotly_white', uirevision='dispersion'
     )
     return fig
 
-# Agregar cálculos para análisis ABC
-def calculate_abc_analysis(df):
-    # Análisis por producto
-    product_metrics = df.groupby('product_id').agg({
-        'total_amount': 'sum',
-        'margin': 'sum',
-        'quantity': 'sum'
-    }).reset_index()
-    
-    # Calcular porcentajes acumulados
-    product_metrics = product_metrics.sort_values('total_amount', ascending=False)
-    product_metrics['porcentaje_ventas'] = product_metrics['total_amount'] / product_metrics['total_amount'].sum() * 100
-    product_metrics['porcentaje_acumulado'] = product_metrics['porcentaje_ventas'].cumsum()
-    
-    # Asignar clasificación ABC
-    product_metrics['clasificacion_abc'] = product_metrics['porcentaje_acumulado'].apply(
-        lambda x: 'A' if x <= 80 else ('B' if x <= 95 else 'C')
-    )
-    
-    return product_metrics
-
-# Cálculos para matriz BCG
-def calculate_bcg_analysis(df):
-    # Calcular métricas por producto
-    product_metrics = df.groupby('product_id').agg({
-        'total_amount': 'sum',
-        'margin': 'sum',
-        'quantity': 'sum'
-    }).reset_index()
-    
-    # Calcular participación de mercado relativa
-    total_market = product_metrics['total_amount'].sum()
-    product_metrics['market_share'] = product_metrics['total_amount'] / total_market
-    
-    # Calcular tasa de crecimiento (simulada pero más realista)
-    # Usamos una distribución que garantiza diferentes categorías
-    n_products = len(product_metrics)
-    growth_rates = []
-    for i in range(n_products):
-        if i < n_products * 0.2:  # Estrellas
-            growth_rates.append(random.uniform(20, 40))  # Alto crecimiento
-        elif i < n_products * 0.4:  # Vacas
-            growth_rates.append(random.uniform(-10, 5))  # Bajo crecimiento
-        elif i < n_products * 0.7:  # Interrogantes
-            growth_rates.append(random.uniform(20, 35))  # Alto crecimiento
-        else:  # Perros
-            growth_rates.append(random.uniform(-20, 0))  # Crecimiento negativo
-    
-    product_metrics['growth_rate'] = growth_rates
-    
-    # Ajustar umbrales para clasificación
-    product_metrics['bcg_category'] = product_metrics.apply(
-        lambda x: 'Estrella' if x['market_share'] >= 0.03 and x['growth_rate'] >= 20
-        else ('Vaca' if x['market_share'] >= 0.03 and x['growth_rate'] < 10
-        else ('Interrogante' if x['market_share'] < 0.03 and x['growth_rate'] >= 20
-        else 'Perro')), axis=1
+# Histograma de monetary por segmento, agrupado en el servidor para el rango visible
+@lru_cache(maxsize=32)
+@medido(DURACION_AGREGADOS, 'figura_distribucion')
+def figura_distribucion(datos, rango_x):
+    import plotly.graph_objects as go
+    from dispersion_clientes import distribucion_clientes
+
+    bordes, conteos = distribucion_clientes(indice_distribucion(datos), rango_x)
+    fig = go.Figure([
+        go.Bar(x=(bordes[:-1] + bordes[1:]) / 2, y=conteo, width=bordes[1] - bordes[0], name=segmento)
+        for segmento, conteo in conteos.items()
+    ])
+    fig.update_layout(
+        title='Distribución del Valor Total por Cliente', barmode='stack',
+        xaxis=dict(title='Valor total ($)', range=rango_x), yaxis=dict(title='Clientes'),
+        template='plotly_white', uirevision='distribucion'
     )
-    
-    return product_metrics
+    return fig
 
-# Diseño del dashboard
-app.layout = html.Div([
-    html.H1('Dashboard de Análisis de Ventas', style={'textAlign': 'center'}),
-    
-    dcc.Tabs([
-        # Pestaña de Análisis RFM
-        dcc.Tab(label='Análisis RFM', children=[
+# Cada pestaña se construye solo cuando se selecciona por primera vez
+
+# Pestaña de Análisis RFM
+def layout_rfm(datos):
+    resumen = resumen_rfm(datos)
+    figuras = figuras_rfm(datos)
+    return html.Div([
+        # Selector de segmento y tabla
+        html.Div([
+            html.H3('Seleccionar Segmento'),
+            dcc.Dropdown(
+                id='segment-selector',
+                options=[{'label': seg, 'value': seg} for seg in resumen['segmentos']],
+                value='Champions',
+                style={'width': '50%', 'margin': '10px auto'}
+            ),
             html.Div([
-                # Selector de segmento y tabla
-                html.Div([
-                    html.H3('Seleccionar Segmento'),
-                    dcc.Dropdown(
-                        id='segment-selector',
-                        options=[{'label': seg, 'value': seg} for seg in rfm['Segmento'].unique()],
-                        value='Champions',
-                        style={'width': '50%', 'margin': '10px auto'}
-                    ),
-                    html.Div([
-                        html.H3('Clientes del Segmento'),
-                        dash_table.DataTable(
-                            id='customer-table',
-                            columns=[
-                                {'name': 'ID Cliente', 'id': 'customer_id'},
-                                {'name': 'Días desde última compra', 'id': 'recency'},
-                                {'name': 'Frecuencia de compras', 'id': 'frequency'},
-                                {'name': 'Valor total ($)', 'id': 'monetary'}
-                            ],
-                            style_table={'overflowX': 'auto'},
-                            style_cell={'textAlign': 'left', 'padding': '10px', 'minWidth': '100px'},
-                            style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
-                            style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
-                            page_size=10
-                        )
-                    ], style={'margin': '20px 0'})
-                ], style={'margin': '20px', 'textAlign': 'center'}),
-
-                # Resumen de métricas RFM
-                html.Div([
-                    html.H3('Resumen de Segmentos'),
-                    html.Div([
-                        html.Div([
-                            html.H4('Total de Clientes'),
-                            html.H2(f"{len(rfm):,}")
-                        ], className='metric-card'),
-                        html.Div([
-                            html.H4('Valor Total'),
-                            html.H2(f"${rfm['monetary'].sum():,.2f}")
-                        ], className='metric-card'),
-                        html.Div([
-                            html.H4('Promedio por Cliente'),
-                            html.H2(f"${rfm['monetary'].mean():,.2f}")
-                        ], className='metric-card')
-                    ], style={'display': 'flex', 'justifyContent': 'space-around'})
-                ]),
-
-                # Gráficas RFM
-                html.Div([
-                    dcc.Graph(
-                        figure=create_bar_chart(
-                            segmento_stats.reset_index(),
-                            'Segmento',
-                            'monetary',
-                            'Valor Monetario por Segmento'
-                        ),
-                        style={'width': '50%'}
-                    ),
-                    dcc.Graph(
-                        figure=create_radar_chart(),
-                        style={'width': '50%'}
-                    )
-                ], style={'display': 'flex'}),
+                html.H3('Clientes del Segmento'),
+                dash_table.DataTable(
+                    id='customer-table',
+                    columns=[
+                        {'name': 'ID Cliente', 'id': 'customer_id'},
+                        {'name': 'Días desde última compra', 'id': 'recency'},
+                        {'name': 'Frecuencia de compras', 'id': 'frequency'},
+                        {'name': 'Valor total ($)', 'id': 'monetary'}
+                    ],
+                    style_table={'overflowX': 'auto'},
+                    style_cell={'textAlign': 'left', 'padding': '10px', 'minWidth': '100px'},
+                    style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+                    style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
+                    # Paginación, orden y filtro en el servidor: solo viaja la página visible
+                    page_action='custom',
+                    page_current=0,
+                    page_size=10,
+                    sort_action='custom',
+                    sort_mode='single',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query=''
+                )
+            ], style={'margin': '20px 0'}),
 
-                html.Div([
-                    dcc.Graph(
-                        figure=create_bar_chart(
-                            segmento_stats.reset_index(),
-                            'Segmento',
-                            'frequency',
-                            'Frecuencia de Compras por Segmento'
-                        ),
-                        style={'width': '50%'}
-                    ),
-                    dcc.Graph(
-                        figure=create_bar_chart(
-                            segmento_stats.reset_index(),
-                            'Segmento',
-                            'recency',
-                            'Días desde Última Compra por Segmento'
-                        ),
-                        style={'width': '50%'}
-                    )
-                ], style={'display': 'flex'}),
-
-                # Tabla de estadísticas RFM
-                html.Div([
-                    html.H3('Estadísticas Detalladas por Segmento'),
-                    dcc.Graph(
-                        figure=go.Figure(data=[
-                            go.Table(
-                                header=dict(values=['Segmento', 'Recency (días)', 'Frequency (compras)', 'Monetary ($)'],
-                                          fill_color='paleturquoise',
-                                          align='left'),
-                                cells=dict(values=[
-                                    segmento_stats.index,
-                                    segmento_stats['recency'].round(1),
-                                    segmento_stats['frequency'].round(1),
-                                    segmento_stats['monetary'].round(2)
-                                ],
-                                fill_color='lavender',
-                                align='left'))
-                        ])
-                    )
-                ])
-            ])
-        ]),
-        
-        # Nueva Pestaña de Análisis de Productos
-        dcc.Tab(label='Análisis de Productos', children=[
+            # Historial de compras del cliente seleccionado en la tabla
+            html.Div(id='historial-cliente', children=panel_historial(None, None))
+        ], style={'margin': '20px', 'textAlign': 'center'}),
+
+        # Resumen de métricas RFM
+        html.Div([
+            html.H3('Resumen de Segmentos'),
             html.Div([
-                # Métricas principales de productos
                 html.Div([
-                    html.H3('Resumen de Productos'),
-                    html.Div([
-                        html.Div([
-                            html.H4('Total Productos'),
-                            html.H2(f"{len(product_analysis):,}")
-                        ], className='metric-card'),
-                        html.Div([
-                            html.H4('Total Unidades Vendidas'),
-                            html.H2(f"{product_analysis['quantity'].sum():,}")
-                        ], className='metric-card'),
-                        html.Div([
-                            html.H4('Venta Total'),
-                            html.H2(f"${product_analysis['total_amount'].sum():,.2f}")
-                        ], className='metric-card')
-                    ], style={'display': 'flex', 'justifyContent': 'space-around'})
-                ]),
-
-                # Gráficas de productos
+                    html.H4('Total de Clientes'),
+                    html.H2(f"{resumen['clientes']:,}")
+                ], className='metric-card'),
                 html.Div([
-                    dcc.Graph(
-                        figure=px.bar(
-                            product_analysis.nlargest(10, 'total_amount').reset_index(),
-                            x='product_id',
-                            y='total_amount',
-                            title='Top 10 Productos por Ventas Totales'
-                        ),
-                        style={'width': '50%'}
-                    ),
-                    dcc.Graph(
-                        figure=px.bar(
-                            product_analysis.nlargest(10, 'quantity').reset_index(),
-                            x='product_id',
-                            y='quantity',
-                            title='Top 10 Productos por Unidades Vendidas'
-                        ),
-                        style={'width': '50%'}
-                    )
-                ], style={'display': 'flex'}),
-
-                # Tabla de productos
+                    html.H4('Valor Total'),
+                    html.H2(f"${resumen['valor_total']:,.2f}")
+                ], className='metric-card'),
                 html.Div([
-                    html.H3('Detalles de Productos'),
-                    dash_table.DataTable(
-                        id='product-table',
-                        columns=[
-                            {'name': 'ID Producto', 'id': 'product_id'},
-                            {'name': 'Unidades Vendidas', 'id': 'quantity'},
-                            {'name': 'Número de Ventas', 'id': 'num_ventas'},
-                            {'name': 'Venta Total ($)', 'id': 'total_amount'},
-                            {'name': 'Precio Promedio ($)', 'id': 'precio_promedio'}
-                        ],
-                        data=product_analysis.reset_index().round(2).to_dict('records'),
-                        style_table={'overflowX': 'auto'},
-                        style_cell={'textAlign': 'left', 'padding': '10px'},
-                        style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
-                        style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
-                        page_size=10,
-                        sort_action='native'
-                    )
-                ])
-            ])
+                    html.H4('Promedio por Cliente'),
+                    html.H2(f"${resumen['promedio']:,.2f}")
+                ], className='metric-card')
+            ], style={'display': 'flex', 'justifyContent': 'space-around'})
+        ]),
+
+        # Gráficas RFM
+        html.Div([
+            dcc.Graph(figure=figuras['monetary'], style={'width': '50%'}),
+            dcc.Graph(figure=figuras['radar'], style={'width': '50%'})
+        ], style={'display': 'flex'}),
+
+        html.Div([
+            dcc.Graph(figure=figuras['frequency'], style={'width': '50%'}),
+            dcc.Graph(figure=figuras['recency'], style={'width': '50%'})
+        ], style={'display': 'flex'}),
+
+        # Tabla de estadísticas RFM
+        html.Div([
+            html.H3('Estadísticas Detalladas por Segmento'),
+            dcc.Graph(figure=figuras['tabla_segmentos'])
         ]),
-        
-        # Nueva Pestaña de Análisis ABC/BCG
-        dcc.Tab(label='Análisis ABC/BCG', children=[
+
+        # Clientes individuales, agrupados en el servidor según el zoom
+        html.Div([
+            html.H3('Clientes por Recency y Monetary'),
+            dcc.Graph(id='dispersion-clientes', figure=figura_dispersion(datos, None, None)),
+            dcc.Store(id='dispersion-rangos', data={'x': None, 'y': None}),
+            dcc.Graph(id='distribucion-monetary', figure=figura_distribucion(datos, None))
+        ])
+    ])
+
+# Pestaña de Análisis de Productos
+def layout_productos(datos):
+    return html.Div([
+        selector_fechas('rango-productos', datos),
+        html.Div(id='productos-contenido', children=contenido_productos(datos, None, None))
+    ])
+
+def contenido_productos(datos, inicio, fin):
+    import plotly.express as px
+
+    product_analysis = metricas_productos(datos, inicio, fin)['resumen']
+    ventas_categoria = totales_ventas(datos, 'category', inicio, fin).reset_index()
+    ventas_segmento = totales_ventas(datos, 'Segmento', inicio, fin).reset_index()
+    return html.Div([
+        # Métricas principales de productos
+        html.Div([
+            html.H3('Resumen de Productos'),
             html.Div([
-                # Resumen ABC
                 html.Div([
-                    html.H3('Análisis ABC'),
-                    dcc.Graph(
-                        figure=px.pie(
-                            calculate_abc_analysis(df_transacciones),
-                            names='clasificacion_abc',
-                            values='total_amount',
-                            title='Distribución de Ventas por Clasificación ABC'
-                        )
-                    )
-                ]),
-                
-                # Matriz BCG
+                    html.H4('Total Productos'),
+                    html.H2(f"{len(product_analysis):,}")
+                ], className='metric-card'),
                 html.Div([
-                    html.H3('Matriz BCG'),
-                    dcc.Graph(
-                        figure=px.scatter(
-                            calculate_bcg_analysis(df_transacciones),
-                            x='market_share',
-                            y='growth_rate',
-                            size='total_amount',
-                            color='bcg_category',
-                            hover_data=['product_id'],
-                            title='Matriz BCG'
-                        )
-                    )
-                ]),
-                
-                # Tabla detallada (actualizada)
+                    html.H4('Total Unidades Vendidas'),
+                    html.H2(f"{product_analysis['quantity'].sum():,}")
+                ], className='metric-card'),
                 html.Div([
-                    html.H3('Detalles por Producto'),
-                    dash_table.DataTable(
-                        id='abc-bcg-table',
-                        columns=[
-                            {'name': 'Producto', 'id': 'product_id'},
-                            {'name': 'Ventas Totales ($)', 'id': 'total_amount', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
-                            {'name': 'Margen ($)', 'id': 'margin', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
-                            {'name': 'Participación (%)', 'id': 'market_share', 'type': 'numeric', 'format': {'specifier': '.2%'}},
-                            {'name': 'Crecimiento (%)', 'id': 'growth_rate', 'type': 'numeric', 'format': {'specifier': '.1f'}},
-                            {'name': 'Clasificación ABC', 'id': 'clasificacion_abc'},
-                            {'name': 'Categoría BCG', 'id': 'bcg_category'}
-                        ],
-                        data=pd.merge(
-                            calculate_abc_analysis(df_transacciones),
-                            calculate_bcg_analysis(df_transacciones),
-                            on='product_id',
-                            suffixes=('_abc', '')
-                        ).round({
-                            'total_amount': 2,
-                            'margin': 2,
-                            'market_share': 4,
-                            'growth_rate': 1
-                        }).to_dict('records'),
-                        style_table={'overflowX': 'auto'},
-                        style_cell={'textAlign': 'left', 'padding': '10px'},
-                        style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
-                        style_data_conditional=[
-                            {
-                                'if': {'row_index': 'odd'},
-                                'backgroundColor': 'rgb(248, 248, 248)'
-                            },
-                            {
-                                'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Estrella"'},
-                                'backgroundColor': '#ffeb3b',
-                                'fontWeight': 'bold'
-                            },
-                            {
-                                'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Vaca"'},
-                                'backgroundColor': '#4caf50',
-                                'color': 'white'
-                            },
-                            {
-                                'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Interrogante"'},
-                                'backgroundColor': '#2196f3',
-                                'color': 'white'
-                            },
-                            {
-                                'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Perro"'},
-                                'backgroundColor': '#f44336',
-                                'color': 'white'
-                            }
-                        ],
-                        page_size=10,
-                        sort_action='native'
-                    )
-                ])
-            ])
+                    html.H4('Venta Total'),
+                    html.H2(f"${product_analysis['total_amount'].sum():,.2f}")
+                ], className='metric-card')
+            ], style={'display': 'flex', 'justifyContent': 'space-around'})
+        ]),
+
+        # Gráficas de productos
+        html.Div([
+            dcc.Graph(
+                figure=px.bar(
+                    product_analysis.nlargest(10, 'total_amount').reset_index(),
+                    x='product_id',
+                    y='total_amount',
+                    title='Top 10 Productos por Ventas Totales'
+                ),
+                style={'width': '50%'}
+            ),
+            dcc.Graph(
+                figure=px.bar(
+                    product_analysis.nlargest(10, 'quantity').reset_index(),
+                    x='product_id',
+                    y='quantity',
+                    title='Top 10 Productos por Unidades Vendidas'
+                ),
+                style={'width': '50%'}
+            )
+        ], style={'display': 'flex'}),
+
+        # Ventas por categoría y por segmento de cliente
+        html.Div([
+            dcc.Graph(
+                figure=px.bar(
+                    ventas_categoria,
+                    x='category',
+                    y='total_amount',
+                    title='Ventas por Categoría'
+                ),
+                style={'width': '50%'}
+            ),
+            dcc.Graph(
+                figure=px.bar(
+                    ventas_segmento,
+                    x='Segmento',
+                    y='total_amount',
+                    title='Ventas por Segmento de Cliente'
+                ),
+                style={'width': '50%'}
+            )
+        ], style={'display': 'flex'}),
+
+        # Tabla de productos
+        html.Div([
+            html.H3('Detalles de Productos'),
+            dash_table.DataTable(
+                id='product-table',
+                columns=[
+                    {'name': 'ID Producto', 'id': 'product_id'},
+                    {'name': 'Unidades Vendidas', 'id': 'quantity'},
+                    {'name': 'Número de Ventas', 'id': 'num_ventas'},
+                    {'name': 'Venta Total ($)', 'id': 'total_amount'},
+                    {'name': 'Precio Promedio ($)', 'id': 'precio_promedio'}
+                ],
+                data=product_analysis.reset_index().round(2).to_dict('records'),
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'left', 'padding': '10px'},
+                style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+                style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
+                page_size=10,
+                sort_action='native'
+            )
+        ])
+    ])
+
+# Matriz BCG. Los productos nuevos (sin ventas en el periodo anterior) no
+# tienen tasa de crecimiento pero cuentan como de alto crecimiento: se dibujan
+# con otro marcador en una línea por encima del mayor crecimiento
+def figura_bcg(bcg, dias_periodo):
+    import plotly.express as px
+
+    nuevo = bcg['growth_rate'].isna()
+    techo = max(bcg['growth_rate'].max() if not nuevo.all() else 0, 20)
+    linea_nuevos = techo + max(abs(techo) * 0.1, 10)
+    # En el hover se muestra el crecimiento real, no la posición de la línea
+    puntos = bcg.assign(growth_rate=bcg['growth_rate'].fillna(linea_nuevos),
+                        crecimiento=bcg['growth_rate'].round(1).astype(object).where(~nuevo, 'nuevo'),
+                        producto=nuevo.map({True: 'Nuevo', False: 'Con periodo anterior'}))
+    fig = px.scatter(
+        puntos,
+        x='market_share',
+        y='growth_rate',
+        size='total_amount',
+        color='bcg_category',
+        symbol='producto',
+        symbol_map={'Con periodo anterior': 'circle', 'Nuevo': 'star'},
+        hover_data={'product_id': True, 'crecimiento': True, 'growth_rate': False},
+        title=f'Matriz BCG (crecimiento: últimos {dias_periodo} días del rango vs. {dias_periodo} anteriores)'
+    )
+    if nuevo.any():
+        fig.add_hline(y=linea_nuevos, line_dash='dot', line_color='gray',
+                      annotation_text=f'Productos nuevos ({int(nuevo.sum())}, sin ventas en el periodo anterior)',
+                      annotation_position='top left')
+    return fig
+
+# Pestaña de Análisis ABC/BCG
+def layout_abc_bcg(datos):
+    return html.Div([
+        html.Div([
+            selector_fechas('rango-abc-bcg', datos),
+            selector_periodo()
+        ], style={'display': 'flex'}),
+        html.Div(id='abc-bcg-contenido', children=contenido_abc_bcg(datos, None, None))
+    ])
+
+def contenido_abc_bcg(datos, inicio, fin, dias_periodo=None):
+    import plotly.express as px
+    from metricas_productos import DIAS_PERIODO_CRECIMIENTO
+
+    dias_periodo = dias_periodo or DIAS_PERIODO_CRECIMIENTO
+    metricas = metricas_productos(datos, inicio, fin, dias_periodo)
+    return html.Div([
+        # Resumen ABC
+        html.Div([
+            html.H3('Análisis ABC'),
+            dcc.Graph(
+                figure=px.pie(
+                    metricas['abc'],
+                    names='clasificacion_abc',
+                    values='total_amount',
+                    title='Distribución de Ventas por Clasificación ABC'
+                )
+            )
+        ]),
+
+        # Matriz BCG
+        html.Div([
+            html.H3('Matriz BCG'),
+            dcc.Graph(figure=figura_bcg(metricas['bcg'], dias_periodo))
+        ]),
+
+        # Tabla detallada (actualizada)
+        html.Div([
+            html.H3('Detalles por Producto'),
+            dash_table.DataTable(
+                id='abc-bcg-table',
+                columns=[
+                    {'name': 'Producto', 'id': 'product_id'},
+                    {'name': 'Ventas Totales ($)', 'id': 'total_amount', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
+                    {'name': 'Margen ($)', 'id': 'margin', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
+                    {'name': 'Participación (%)', 'id': 'market_share', 'type': 'numeric', 'format': {'specifier': '.2%'}},
+                    {'name': 'Crecimiento (%)', 'id': 'growth_rate', 'type': 'numeric', 'format': {'specifier': '.1f'}},
+                    {'name': 'Clasificación ABC', 'id': 'clasificacion_abc'},
+                    {'name': 'Categoría BCG', 'id': 'bcg_category'}
+                ],
+                data=metricas['abc_bcg'].round({
+                    'total_amount': 2,
+                    'margin': 2,
+                    'market_share': 4,
+                    'growth_rate': 1
+                }).to_dict('records'),
+                style_table={'overflowX': 'auto'},
+                style_cell={'textAlign': 'left', 'padding': '10px'},
+                style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+                style_data_conditional=[
+                    {
+                        'if': {'row_index': 'odd'},
+                        'backgroundColor': 'rgb(248, 248, 248)'
+                    },
+                    {
+                        'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Estrella"'},
+                        'backgroundColor': '#ffeb3b',
+                        'fontWeight': 'bold'
+                    },
+                    {
+                        'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Vaca"'},
+                        'backgroundColor': '#4caf50',
+                        'color': 'white'
+                    },
+                    {
+                        'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Interrogante"'},
+                        'backgroundColor': '#2196f3',
+                        'color': 'white'
+                    },
+                    {
+                        'if': {'column_id': 'bcg_category', 'filter_query': '{bcg_category} = "Perro"'},
+                        'backgroundColor': '#f44336',
+                        'color': 'white'
+                    }
+                ],
+                page_size=10,
+                sort_action='native'
+            )
         ])
     ])
+
+# Pestaña de recálculo del análisis RFM con otros parámetros (en segundo plano,
+# con trabajos_rfm); el estado del trabajo se consulta con un intervalo
+def layout_recalculo(datos):
+    fecha_min, fecha_max = limites_fechas(datos)
+    return html.Div([
+        html.Div([
+            html.Div([
+                html.H4('Fecha de análisis'),
+                dcc.DatePickerSingle(
+                    id='recalculo-fecha',
+                    min_date_allowed=fecha_min.date(),
+                    max_date_allowed=fecha_max.date(),
+                    date=fecha_max.date(),
+                    display_format='YYYY-MM-DD'
+                )
+            ], style={'margin': '10px'}),
+            html.Div([
+                html.H4('Score mínimo Champions (R, F y M)'),
+                dcc.Dropdown(id='recalculo-minimo-champions', options=[1, 2, 3, 4, 5], value=4,
+                             clearable=False, style={'width': '120px'})
+            ], style={'margin': '10px'}),
+            html.Div([
+                html.H4('Score mínimo Leales (R, F y M)'),
+                dcc.Dropdown(id='recalculo-minimo-leales', options=[1, 2, 3, 4, 5], value=3,
+                             clearable=False, style={'width': '120px'})
+            ], style={'margin': '10px'}),
+            html.Button('Recalcular', id='recalculo-enviar', n_clicks=0,
+                        style={'margin': '10px', 'alignSelf': 'flex-end'})
+        ], style={'display': 'flex'}),
+        dcc.Store(id='recalculo-trabajo'),
+        dcc.Interval(id='recalculo-intervalo', interval=1000, disabled=True),
+        html.Div(id='recalculo-estado', style={'margin': '10px'}),
+        html.Div(id='recalculo-resultado')
+    ])
+
+# Instantáneas de historico_rfm.py calculadas con las transacciones que se
+# sirven (None si no hay); se vuelven a leer si el archivo cambia
+def historico_rfm(datos):
+    import os
+
+    from historico_rfm import RUTA_HISTORICO
+
+    try:
+        mtime = os.stat(os.path.join(RUTA_HISTORICO, 'historico.json')).st_mtime_ns
+    except OSError:
+        return None
+    return _historico_rfm(datos, mtime)
+
+@lru_cache(maxsize=2)
+def _historico_rfm(datos, mtime):
+    from historico_rfm import cargar_historico
+
+    return cargar_historico(version=datos.version[1])
+
+# Pestaña de migración entre segmentos: clientes por segmento en cada corte y
+# matriz de transición entre dos cortes, desde las instantáneas guardadas
+def layout_migracion(datos):
+    import plotly.express as px
+    from historico_rfm import tamanos_segmentos
+
+    historico = historico_rfm(datos)
+    if historico is None:
+        return html.Div([
+            html.H3('Migración entre Segmentos'),
+            html.P('No hay instantáneas históricas para estos datos. Genérelas con: '
+                   'python historico_rfm.py')
+        ], style={'margin': '20px'})
+
+    cortes = [corte.strftime('%Y-%m-%d') for corte in historico['cortes']]
+    opciones = [{'label': corte, 'value': posicion} for posicion, corte in enumerate(cortes)]
+    tamanos = tamanos_segmentos(historico)
+    return html.Div([
+        dcc.Graph(figure=px.line(
+            tamanos.reset_index().melt(id_vars='corte', var_name='Segmento', value_name='clientes'),
+            x='corte', y='clientes', color='Segmento', markers=True,
+            title='Clientes por Segmento en cada Fecha de Corte'
+        )),
+        html.Div([
+            html.Div([
+                html.H4('Desde'),
+                dcc.Dropdown(id='migracion-desde', options=opciones, value=max(len(cortes) - 2, 0),
+                             clearable=False, style={'width': '200px'})
+            ], style={'margin': '10px'}),
+            html.Div([
+                html.H4('Hasta'),
+                dcc.Dropdown(id='migracion-hasta', options=opciones, value=len(cortes) - 1,
+                             clearable=False, style={'width': '200px'})
+            ], style={'margin': '10px'})
+        ], style={'display': 'flex'}),
+        html.Div(id='migracion-contenido',
+                 children=contenido_migracion(datos, max(len(cortes) - 2, 0), len(cortes) - 1))
+    ])
+
+def contenido_migracion(datos, desde, hasta):
+    import plotly.express as px
+    from historico_rfm import matriz_transicion
+
+    historico = historico_rfm(datos)
+    if historico is None:
+        return html.P('Las instantáneas históricas ya no corresponden a estos datos.')
+    conteo = matriz_transicion(historico, desde, hasta)
+    # Proporción de cada segmento de origen que termina en cada segmento de destino
+    proporcion = conteo.div(conteo.sum(axis=1).replace(0, 1), axis=0)
+    fechas = [historico['cortes'][posicion].strftime('%Y-%m-%d') for posicion in (desde, hasta)]
+    return html.Div([
+        dcc.Graph(figure=px.imshow(
+            proporcion, text_auto='.0%', aspect='auto', color_continuous_scale='Blues',
+            labels={'x': f'Segmento al {fechas[1]}', 'y': f'Segmento al {fechas[0]}', 'color': 'Proporción'},
+            title=f'Migración entre Segmentos ({fechas[0]} → {fechas[1]})'
+        )),
+        html.H3('Clientes por Segmento de Origen y Destino'),
+        dash_table.DataTable(
+            id='migracion-tabla',
+            columns=[{'name': 'Desde / Hasta', 'id': 'desde'}] +
+                    [{'name': segmento, 'id': segmento} for segmento in conteo.columns],
+            data=conteo.reset_index().to_dict('records'),
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '10px'},
+            style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+            style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}]
+        )
+    ], style={'margin': '20px'})
+
+CONSTRUCTORES_PESTANAS = {
+    'rfm': layout_rfm,
+    'productos': layout_productos,
+    'abc_bcg': layout_abc_bcg,
+    'recalculo': layout_recalculo,
+    'migracion': layout_migracion
+}
+# Pestañas que dependen de archivos generados aparte de los datos (no van al
+# paquete precalculado, que solo se invalida con la versión de los datos)
+PESTANAS_SIN_PAQUETE = {'migracion'}
+PESTANA_INICIAL = 'rfm'
+
+# Contenido (figuras y tablas) por pestaña y versión de datos; las visitas
+# repetidas a una pestaña se sirven desde esta caché LRU acotada
+@lru_cache(maxsize=16)
+@medido(DURACION_AGREGADOS, 'contenido_pestana')
+def contenido_pestana(pestana, datos):
+    return CONSTRUCTORES_PESTANAS[pestana](datos)
+
+# Diseño del dashboard
+app.layout = html.Div([
+    html.H1('Dashboard de Análisis de Ventas', style={'textAlign': 'center'}),
+
+    dcc.Tabs(id='tabs', value=PESTANA_INICIAL, children=[
+        dcc.Tab(label='Análisis RFM', value='rfm'),
+        dcc.Tab(label='Análisis de Productos', value='productos'),
+        dcc.Tab(label='Análisis ABC/BCG', value='abc_bcg'),
+        dcc.Tab(label='Recalcular RFM', value='recalculo'),
+        dcc.Tab(label='Migración de Segmentos', value='migracion')
+    ]),
+    html.Div(id='tab-content')
 ])
 
+@app.callback(
+    Output('tab-content', 'children'),
+    Input('tabs', 'value')
+)
+def render_tab(pestana):
+    # Contenido ya serializado del paquete precalculado, si es de la versión
+    # de datos que se sirve (no hace falta cargar los datos ni importar plotly)
+    paquete = paquete_vigente()
+    if paquete is not None and pestana in paquete.pestanas:
+        return paquete.pestanas[pestana]
+    if pestana in PESTANAS_SIN_PAQUETE:
+        return CONSTRUCTORES_PESTANAS[pestana](datos_actuales())
+    return contenido_pestana(pestana, datos_actuales())
+
+CONSTRUCTORES_CONTENIDO_RANGO = {
+    'productos': contenido_productos,
+    'abc_bcg': contenido_abc_bcg
+}
+
+# Contenido de una pestaña de productos para un rango de fechas; los totales
+# salen del cubo de ventas (o de la base SQL), sin volver a agrupar las
+# transacciones en memoria
+@lru_cache(maxsize=32)
+@medido(DURACION_AGREGADOS, 'contenido_rango')
+def contenido_rango(pestana, datos, inicio, fin, *opciones):
+    return CONSTRUCTORES_CONTENIDO_RANGO[pestana](datos, inicio, fin, *opciones)
+
+@app.callback(
+    Output('productos-contenido', 'children'),
+    Input('rango-productos', 'start_date'),
+    Input('rango-productos', 'end_date'),
+    prevent_initial_call=True
+)
+def update_productos(start_date, end_date):
+    datos = datos_actuales()
+    return contenido_rango('productos', datos, *rango_fechas(datos, start_date, end_date))
+
+@app.callback(
+    Output('abc-bcg-contenido', 'children'),
+    Input('rango-abc-bcg', 'start_date'),
+    Input('rango-abc-bcg', 'end_date'),
+    Input('periodo-crecimiento', 'value'),
+    prevent_initial_call=True
+)
+def update_abc_bcg(start_date, end_date, dias_periodo):
+    datos = datos_actuales()
+    return contenido_rango('abc_bcg', datos, *rango_fechas(datos, start_date, end_date), dias_periodo)
+
+# Resumen por segmento de un recálculo terminado, junto a los clientes de cada
+# segmento en los resultados que se sirven
+def resultado_recalculo(trabajo, datos):
+    clientes_actuales = datos.rfm['Segmento'].astype(str).value_counts()
+    filas = [dict(fila, clientes_actuales=int(clientes_actuales.get(fila['Segmento'], 0)))
+             for fila in trabajo['resumen']['segmentos']]
+    return html.Div([
+        html.H3(f"Segmentos recalculados ({trabajo['resumen']['clientes']:,} clientes)"),
+        dash_table.DataTable(
+            id='recalculo-tabla',
+            columns=[
+                {'name': 'Segmento', 'id': 'Segmento'},
+                {'name': 'Clientes', 'id': 'clientes'},
+                {'name': 'Clientes (actual)', 'id': 'clientes_actuales'},
+                {'name': 'Recency (días)', 'id': 'recency'},
+                {'name': 'Frequency (compras)', 'id': 'frequency'},
+                {'name': 'Monetary ($)', 'id': 'monetary'}
+            ],
+            data=filas,
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '10px'},
+            style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+            style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}]
+        )
+    ], style={'margin': '20px'})
+
+# Enviar un recálculo (vuelve enseguida) y consultar su estado cada segundo
+# hasta que termina; con los mismos parámetros y datos el resultado ya está
+@app.callback(
+    Output('recalculo-trabajo', 'data'),
+    Output('recalculo-estado', 'children'),
+    Output('recalculo-resultado', 'children'),
+    Output('recalculo-intervalo', 'disabled'),
+    Input('recalculo-enviar', 'n_clicks'),
+    Input('recalculo-intervalo', 'n_intervals'),
+    State('recalculo-fecha', 'date'),
+    State('recalculo-minimo-champions', 'value'),
+    State('recalculo-minimo-leales', 'value'),
+    State('recalculo-trabajo', 'data'),
+    prevent_initial_call=True
+)
+def update_recalculo(n_clicks, n_intervals, fecha, minimo_champions, minimo_leales, id_trabajo):
+    from trabajos_rfm import ERROR, TERMINADO, enviar, estado_trabajo, reglas_con_minimos
+
+    if ctx.triggered_id == 'recalculo-enviar':
+        id_trabajo = enviar({'fecha_analisis': fecha,
+                             'reglas': reglas_con_minimos(minimo_champions, minimo_leales)})
+    trabajo = estado_trabajo(id_trabajo) if id_trabajo is not None else None
+    if trabajo is None:
+        return None, '', '', True
+
+    if trabajo['estado'] == TERMINADO:
+        return id_trabajo, f"Trabajo {id_trabajo}: terminado", resultado_recalculo(trabajo, datos_actuales()), True
+    if trabajo['estado'] == ERROR:
+        return id_trabajo, f"Trabajo {id_trabajo}: error ({trabajo['mensaje']})", '', True
+    return (id_trabajo, f"Trabajo {id_trabajo}: {trabajo['mensaje'] or trabajo['estado']} "
+                        f"({trabajo['progreso']:.0%})", '', False)
+
+@app.callback(
+    Output('migracion-contenido', 'children'),
+    Input('migracion-desde', 'value'),
+    Input('migracion-hasta', 'value'),
+    prevent_initial_call=True
+)
+def update_migracion(desde, hasta):
+    return contenido_migracion(datos_actuales(), desde, hasta)
+
+# Posiciones de clientes de cada segmento preordenadas por cada columna
+def indices_tabla_clientes(datos):
+    from tabla_clientes import indexar_segmentos
+
+    return datos.derivado('indices_tabla_clientes', lambda d: indexar_segmentos(d.rfm))
+
+# Filas visibles para un segmento, orden y filtro; al paginar dentro de la
+# misma consulta cada página es solo un slice
+@lru_cache(maxsize=64)
+@medido(DURACION_AGREGADOS, 'posiciones_tabla_clientes')
+def posiciones_tabla_clientes(datos, segmento, orden, filtro):
+    from tabla_clientes import ordenar_y_filtrar
+
+    sort_by = [{'column_id': columna, 'direction': direccion} for columna, direccion in orden]
+    return ordenar_y_filtrar(datos.rfm, indices_tabla_clientes(datos), segmento, sort_by, filtro)
+
 # Agregar callback para actualizar la tabla
 @app.callback(
     Output('customer-table', 'data'),
-    Input('segment-selector', 'value')
+    Output('customer-table', 'page_count'),
+    Output('customer-table', 'page_current'),
+    Input('segment-selector', 'value'),
+    Input('customer-table', 'page_current'),
+    Input('customer-table', 'page_size'),
+    Input('customer-table', 'sort_by'),
+    Input('customer-table', 'filter_query')
 )
-def update_table(selected_segment):
+def update_table(selected_segment, page_current, page_size, sort_by, filter_query):
+    from tabla_clientes import pagina
+
     if selected_segment is None:
-        return []
-    
-    filtered_df = rfm[rfm['Segmento'] == selected_segment].copy()
-    filtered_df = filtered_df.round({
-        'recency': 1,
-        'frequency': 0,
-        'monetary': 2
-    })
-    
-    return filtered_df.to_dict('records')
+        return [], 0, 0
+
+    # Un cambio de segmento, orden o filtro vuelve a la primera página
+    if ctx.triggered_id != 'customer-table' or 'customer-table.page_current' not in ctx.triggered_prop_ids:
+        page_current = 0
+
+    datos = datos_actuales()
+    orden = tuple((s['column_id'], s['direction']) for s in sort_by or [])
+    posiciones = posiciones_tabla_clientes(datos, selected_segment, orden, filter_query or '')
+    page_count = max(1, -(-len(posiciones) // page_size))
+    return pagina(datos.rfm, posiciones, page_current, page_size), page_count, page_current
+
+# Al hacer zoom (o restablecerlo) se vuelve a agrupar solo el rango visible; el
+# rango del eje que el evento no cambia se conserva
+@app.callback(
+    Output('dispersion-clientes', 'figure'),
+    Output('dispersion-rangos', 'data'),
+    Input('dispersion-clientes', 'relayoutData'),
+    State('dispersion-rangos', 'data'),
+    prevent_initial_call=True
+)
+def update_dispersion(relayout, rangos):
+    from dispersion_clientes import rango_relayout
+
+    rangos = rangos or {}
+    rango_x = rango_relayout(relayout, 'xaxis', rangos.get('x') and tuple(rangos['x']))
+    rango_y = rango_relayout(relayout, 'yaxis', rangos.get('y') and tuple(rangos['y']))
+    return figura_dispersion(datos_actuales(), rango_x, rango_y), {'x': rango_x, 'y': rango_y}
+
+@app.callback(
+    Output('distribucion-monetary', 'figure'),
+    Input('distribucion-monetary', 'relayoutData'),
+    prevent_initial_call=True
+)
+def update_distribucion(relayout):
+    from dispersion_clientes import rango_relayout
+
+    if not relayout or not any(clave.startswith('xaxis.') for clave in relayout):
+        return dash.no_update
+    return figura_distribucion(datos_actuales(), rango_relayout(relayout, 'xaxis'))
+
+# Transacciones ordenadas por cliente con el inicio de cada uno
+def indice_historial(datos):
+    from historial_clientes import indexar_transacciones
+
+    return datos.derivado('indice_historial', lambda d: indexar_transacciones(d.transacciones))
+
+# Compras de un cliente (un slice del índice, sin recorrer las transacciones;
+# con la base SQL, una búsqueda en su índice de clientes)
+@lru_cache(maxsize=64)
+@medido(DURACION_AGREGADOS, 'historial_cliente')
+def historial_cliente(datos, cliente):
+    if MOTOR_SQL:
+        from motor_sql import historial_cliente_sql
+
+        return historial_cliente_sql(cliente)
+    from historial_clientes import historial_cliente as historial
+
+    return historial(datos.transacciones, indice_historial(datos), cliente)
+
+def panel_historial(cliente, historial):
+    import pandas as pd
+    from almacenamiento_rfm import valores_float64
+
+    if cliente is None:
+        return html.P('Seleccione un cliente de la tabla para ver su historial de compras.')
+    if historial is None or len(historial) == 0:
+        return html.P(f'El cliente {cliente} no tiene transacciones.')
+
+    filas = historial.iloc[::-1].copy()  # La compra más reciente primero
+    filas['transaction_date'] = filas['transaction_date'].dt.strftime('%Y-%m-%d')
+    for columna in filas.columns:
+        if isinstance(filas[columna].dtype, pd.CategoricalDtype):
+            filas[columna] = filas[columna].astype(str)
+        elif columna in ('total_amount', 'margin'):
+            filas[columna] = valores_float64(filas, columna)
+    return html.Div([
+        html.H3(f'Historial de Compras de {cliente}'),
+        html.Div([
+            html.Div([
+                html.H4('Compras'),
+                html.H2(f"{len(historial):,}")
+            ], className='metric-card'),
+            html.Div([
+                html.H4('Monto Total'),
+                html.H2(f"${filas['total_amount'].sum():,.2f}")
+            ], className='metric-card'),
+            html.Div([
+                html.H4('Última Compra'),
+                html.H2(filas['transaction_date'].iloc[0])
+            ], className='metric-card')
+        ], style={'display': 'flex', 'justifyContent': 'space-around'}),
+        dash_table.DataTable(
+            id='historial-table',
+            columns=[
+                {'name': 'Fecha', 'id': 'transaction_date'},
+                {'name': 'Producto', 'id': 'product_id'},
+                {'name': 'Categoría', 'id': 'category'},
+                {'name': 'Unidades', 'id': 'quantity'},
+                {'name': 'Monto ($)', 'id': 'total_amount', 'type': 'numeric', 'format': {'specifier': ',.2f'}},
+                {'name': 'Margen ($)', 'id': 'margin', 'type': 'numeric', 'format': {'specifier': ',.2f'}}
+            ],
+            data=filas.round({'total_amount': 2, 'margin': 2}).to_dict('records'),
+            style_table={'overflowX': 'auto'},
+            style_cell={'textAlign': 'left', 'padding': '10px'},
+            style_header={'backgroundColor': 'paleturquoise', 'fontWeight': 'bold'},
+            style_data_conditional=[{'if': {'row_index': 'odd'}, 'backgroundColor': 'rgb(248, 248, 248)'}],
+            page_size=10,
+            sort_action='native'
+        )
+    ], style={'margin': '20px 0'})
+
+# Historial del cliente de la celda activa (la fila es relativa a la página visible)
+@app.callback(
+    Output('historial-cliente', 'children'),
+    Input('customer-table', 'active_cell'),
+    State('customer-table', 'data'),
+    prevent_initial_call=True
+)
+def update_historial(active_cell, data):
+    if not active_cell or not data or active_cell['row'] >= len(data):
+        return panel_historial(None, None)
+    cliente = data[active_cell['row']]['customer_id']
+    return panel_historial(cliente, historial_cliente(datos_actuales(), cliente))
+
+# Agregados de una versión nueva de los datos: se calculan antes de publicarla
+@precalcular
+def precalcular_agregados(datos):
+    # Las tablas del paquete precalculado de esta versión no se vuelven a calcular
+    paquete = paquete_vigente(datos.version)
+    if paquete is not None:
+        datos.derivado('estadisticas_segmentos', lambda d: paquete.tabla('estadisticas_segmentos'))
+        datos.derivado('metricas_productos', lambda d: paquete.tablas('metricas_productos'))
+    estadisticas_segmentos(datos)
+    if not MOTOR_SQL:
+        cubo_ventas(datos)
+        indice_historial(datos)
+    metricas_productos(datos)
+    indices_tabla_clientes(datos)
+    indice_dispersion(datos)
+    indice_distribucion(datos)
+
+# Las cachés de contenido retienen la instantánea usada como clave: al publicar
+# una versión nueva se vacían para liberar la anterior
+@al_publicar
+def vaciar_caches(datos):
+    contenido_pestana.cache_clear()
+    contenido_rango.cache_clear()
+    _metricas_productos_rango.cache_clear()
+    crecimiento_productos.cache_clear()
+    posiciones_tabla_clientes.cache_clear()
+    historial_cliente.cache_clear()
+    _historico_rfm.cache_clear()
+    figura_dispersion.cache_clear()
+    figura_distribucion.cache_clear()
+
+# Versión de los datos que está sirviendo este proceso y memoria (MB) de cada
+# frame cargado (las transacciones en None con la base SQL)
+@server.route('/version-datos')
+def version_datos():
+    from almacenamiento_rfm import memoria_mb
+
+    datos = datos_actuales()
+    return {
+        'version': list(datos.version),
+        'memoria_mb': datos.derivado('memoria_mb', lambda d: {
+            'rfm': round(memoria_mb(d.rfm), 2),
+            'transacciones': None if d.transacciones is None else round(memoria_mb(d.transacciones), 2)})
+    }
+
+# Latencia y tamaño de respuesta de cada callback, en /metrics junto con la
+# carga de datos y los agregados (formato de texto de Prometheus)
+instrumentar_callbacks(app)
+
+@server.route('/metrics')
+def metricas():
+    return Response(exponer_metricas(), content_type=TIPO_CONTENIDO)
+
+# Perfilador por muestreo de este worker (solo con RFM_PERFILADOR=1):
+# /perfil/iniciar?intervalo=0.005&duracion=60 lo enciende y /perfil devuelve
+# las pilas acumuladas (con ?detener=1, además lo apaga)
+if PERFILADOR_HABILITADO:
+    @server.route('/perfil/iniciar')
+    def iniciar_perfil():
+        iniciado = perfilador.iniciar(float(request.args.get('intervalo', 0.005)),
+                                      float(request.args.get('duracion', 60)))
+        return {'iniciado': iniciado, 'activo': perfilador.activo}
+
+    @server.route('/perfil')
+    def pilas_perfil():
+        if request.args.get('detener') == '1':
+            perfilador.detener()
+        return Response(perfilador.pilas_plegadas(), mimetype='text/plain',
+                        headers={'X-Muestras': str(perfilador.muestras)})
+
+# Recargar los datos cuando se regeneran los archivos, sin reiniciar el servidor
+# (con un paquete vigente, la primera carga se hace en segundo plano)
+iniciar_vigilancia(en_segundo_plano=CARGA_DIFERIDA and paquete_vigente() is not None)
 
 # Agregar estilos CSS
 app.index_string = '''
@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analisis_rfm import agregar_clientes  # noqa: E402
+
+# Compara la agregación por cliente original (groupby con lambda por grupo)
+# con el kernel vectorizado de analisis_rfm.agregar_clientes.
+#
+# Uso: python benchmarks/bench_agregacion.py --transacciones 10000000 --clientes 1000000
+
+def generar_transacciones(n_transacciones, n_clientes, semilla=42):
+    rng = np.random.default_rng(semilla)
+    inicio = np.datetime64('2023-01-01T09:30:00', 'ns')
+    dias = rng.integers(0, 731, size=n_transacciones).astype('timedelta64[D]')
+    clientes = np.array([f'CUST_{i:07d}' for i in range(n_clientes)], dtype=object)
+    monto = np.round(rng.uniform(100, 5000, size=n_transacciones), 2)
+    return pd.DataFrame({
+        'transaction_id': np.arange(n_transacciones),
+        'customer_id': clientes[rng.integers(0, n_clientes, size=n_transacciones)],
+        'transaction_date': inicio + dias,
+        'total_amount': monto,
+        'margin': np.round(monto * rng.uniform(0.2, 0.6, size=n_transacciones), 2)
+    })
+
+def agregacion_original(df, fecha_analisis):
+    return df.groupby('customer_id').agg({
+        'transaction_date': lambda x: (fecha_analisis - x.max()).days,
+        'transaction_id': 'count',
+        'total_amount': 'sum'
+    }).rename(columns={
+        'transaction_date': 'recency',
+        'transaction_id': 'frequency',
+        'total_amount': 'monetary'
+    })
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark de la agregación RFM por cliente')
+    parser.add_argument('--transacciones', type=int, default=10_000_000)
+    parser.add_argument('--clientes', type=int, default=1_000_000)
+    parser.add_argument('--sin-original', action='store_true',
+                        help='no ejecutar la agregación original (lenta con muchos clientes)')
+    args = parser.parse_args()
+
+    df = generar_transacciones(args.transacciones, args.clientes)
+    fecha_analisis = df['transaction_date'].max()
+    print(f"{len(df):,} transacciones, {df['customer_id'].nunique():,} clientes")
+
+    nuevo, t_nuevo = cronometrar(agregar_clientes, df, fecha_analisis)
+    print(f"agregar_clientes (vectorizado): {t_nuevo:8.2f} s")
+
+    if not args.sin_original:
+        original, t_original = cronometrar(agregacion_original, df, fecha_analisis)
+        print(f"groupby con lambda (original): {t_original:8.2f} s")
+        print(f"aceleración: {t_original / t_nuevo:.1f}x")
+
+        pd.testing.assert_series_equal(nuevo['recency'], original['recency'], check_dtype=False)
+        pd.testing.assert_series_equal(nuevo['frequency'], original['frequency'], check_dtype=False)
+        pd.testing.assert_series_equal(nuevo['monetary'], original['monetary'], check_dtype=False)
+        print("resultados idénticos")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from analisis_rfm import memoria_pico_mb  # noqa: E402
+
+# Benchmark de punta a punta por niveles de volumen de datos.
+#
+# Para cada nivel se generan transacciones con generate_rfm_data.py (o se
+# reutilizan de --datos) y, en un proceso nuevo por nivel, se mide cada etapa
+# por separado: lectura del CSV, parseo de fechas, agregación por cliente,
+# quintiles (qcut), segmentación, métricas de productos/ABC/BCG, cubo de ventas,
+# carga del dashboard, construcción de figuras por pestaña y latencia del
+# callback update_table a través del servidor. Después de cada etapa se anota
+# el pico de memoria del proceso. Los resultados se guardan en JSON y se pueden
+# comparar contra una base guardada (--base): una etapa más lenta que la base
+# por encima de la tolerancia cuenta como regresión (código de salida 1).
+#
+# Uso: python benchmarks/bench_completo.py --niveles 10k,100k,1M --salida actual.json
+#      python benchmarks/bench_completo.py --niveles 10k,100k,1M --base actual.json
+
+NIVELES = ['10k', '100k', '1M', '10M', '100M']
+FECHA_FIN = '2025-01-01'
+REPETICIONES_TABLA = 20
+
+def transacciones_nivel(nivel):
+    factor = {'k': 1_000, 'M': 1_000_000}[nivel[-1]]
+    return int(float(nivel[:-1]) * factor)
+
+# Clientes y productos de cada nivel (más transacciones, más clientes y catálogo)
+def dimensiones_nivel(n_transacciones):
+    return {
+        'clientes': max(1_000, n_transacciones // 10),
+        'productos': max(50, min(5_000, n_transacciones // 20_000))
+    }
+
+class Cronometro:
+    def __init__(self):
+        self.etapas = {}
+
+    def medir(self, etapa, funcion, *args, **kwargs):
+        inicio = time.perf_counter()
+        resultado = funcion(*args, **kwargs)
+        self.etapas[etapa] = {
+            'segundos': time.perf_counter() - inicio,
+            'memoria_pico_mb': memoria_pico_mb()
+        }
+        return resultado
+
+def preparar_datos(nivel, directorio):
+    from generate_rfm_data import generar
+
+    ruta = os.path.join(directorio, nivel, 'transacciones_rfm.csv')
+    if os.path.exists(ruta):
+        return ruta, None
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    n_transacciones = transacciones_nivel(nivel)
+    inicio = time.perf_counter()
+    dimensiones = dimensiones_nivel(n_transacciones)
+    generar(ruta, n_transacciones, dimensiones['clientes'], dimensiones['productos'], fecha_fin=FECHA_FIN)
+    return ruta, time.perf_counter() - inicio
+
+# Latencia de update_table vía POST a /_dash-update-component (incluye la
+# serialización de la respuesta, como en el navegador)
+def latencia_update_table(cliente, segmento, pagina=0, sort_by=(), filtro='', disparador='segment-selector.value'):
+    salidas = ['data', 'page_count', 'page_current']
+    cuerpo = {
+        'output': '..' + '...'.join(f'customer-table.{p}' for p in salidas) + '..',
+        'outputs': [{'id': 'customer-table', 'property': p} for p in salidas],
+        'inputs': [
+            {'id': 'segment-selector', 'property': 'value', 'value': segmento},
+            {'id': 'customer-table', 'property': 'page_current', 'value': pagina},
+            {'id': 'customer-table', 'property': 'page_size', 'value': 10},
+            {'id': 'customer-table', 'property': 'sort_by', 'value': list(sort_by)},
+            {'id': 'customer-table', 'property': 'filter_query', 'value': filtro}
+        ],
+        'changedPropIds': [disparador],
+        'state': []
+    }
+    tiempos = []
+    for _ in range(REPETICIONES_TABLA):
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/_dash-update-component', json=cuerpo)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f'update_table respondió {respuesta.status_code}')
+    return {'primera_ms': tiempos[0], 'mediana_ms': statistics.median(tiempos[1:])}
+
+# Todas las etapas de un nivel (se ejecuta en un proceso nuevo por nivel)
+def ejecutar_nivel(ruta):
+    import pandas as pd
+    from plotly.utils import PlotlyJSONEncoder
+
+    from almacenamiento_rfm import guardar_resultados
+    from analisis_rfm import (COLUMNAS_RESULTADOS, COLUMNAS_TRANSACCIONES, agregar_clientes,
+                              asignar_segmentos, puntuar_quintiles)
+    from cubo_ventas import construir_cubo
+    from datos_dashboard import COLUMNAS_TRANSACCIONES as COLUMNAS_DASHBOARD
+    from metricas_productos import calcular_metricas_productos
+
+    crono = Cronometro()
+    columnas = list(dict.fromkeys(COLUMNAS_TRANSACCIONES + COLUMNAS_DASHBOARD))
+    df = crono.medir('carga_csv', pd.read_csv, ruta, usecols=columnas)
+    df['transaction_date'] = crono.medir('parseo_fechas', pd.to_datetime, df['transaction_date'])
+
+    rfm = crono.medir('agregacion_clientes', agregar_clientes, df[COLUMNAS_TRANSACCIONES])
+    rfm = crono.medir('quintiles_qcut', puntuar_quintiles, rfm)
+    rfm['Segmento'] = crono.medir('segmentacion', asignar_segmentos, rfm['R'], rfm['F'], rfm['M'])
+    crono.medir('metricas_productos', calcular_metricas_productos, df)
+    crono.medir('cubo_ventas', construir_cubo, df, rfm.reset_index())
+    crono.medir('guardar_resultados', guardar_resultados, rfm[COLUMNAS_RESULTADOS],
+                os.path.join(os.path.dirname(ruta), 'resultados_rfm.csv'))
+    del df, rfm
+
+    # Dashboard: carga de datos y agregados al importar app, figuras por pestaña
+    # (construcción y serialización) y latencia de la tabla de clientes
+    os.chdir(os.path.dirname(ruta))
+    os.environ['RFM_INTERVALO_RECARGA'] = '0'
+    app = crono.medir('carga_dashboard', __import__, 'app')
+    datos = app.datos_actuales()
+    for pestana in app.CONSTRUCTORES_PESTANAS:
+        crono.medir(f'figuras_{pestana}', lambda p: json.dumps(
+            app.CONSTRUCTORES_PESTANAS[p](datos), cls=PlotlyJSONEncoder), pestana)
+
+    cliente = app.server.test_client()
+    segmento = str(datos.rfm['Segmento'].value_counts().idxmax())
+    tabla = {
+        'cambio_segmento': latencia_update_table(cliente, segmento),
+        'cambio_pagina': latencia_update_table(cliente, segmento, pagina=5,
+                                               disparador='customer-table.page_current'),
+        'orden': latencia_update_table(cliente, segmento,
+                                       sort_by=[{'column_id': 'monetary', 'direction': 'desc'}],
+                                       disparador='customer-table.sort_by'),
+        'filtro': latencia_update_table(cliente, segmento, filtro='{recency} s< 30',
+                                        disparador='customer-table.filter_query')
+    }
+    return {'etapas': crono.etapas, 'update_table': tabla, 'memoria_pico_mb': memoria_pico_mb()}
+
+def medir_nivel(nivel, directorio):
+    ruta, t_generacion = preparar_datos(nivel, directorio)
+    with tempfile.NamedTemporaryFile(suffix='.json') as salida:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--ejecutar', ruta,
+                        '--salida', salida.name], check=True)
+        with open(salida.name) as f:
+            resultado = json.load(f)
+    n_transacciones = transacciones_nivel(nivel)
+    resultado.update(transacciones=n_transacciones, generacion_segundos=t_generacion,
+                     **dimensiones_nivel(n_transacciones))
+    return resultado
+
+def entorno():
+    import numpy as np
+    import pandas as pd
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+
+def imprimir_nivel(nivel, resultado):
+    print(f"\n{nivel}: {resultado['transacciones']:,} transacciones, {resultado['clientes']:,} clientes, "
+          f"{resultado['productos']:,} productos")
+    for etapa, medida in resultado['etapas'].items():
+        print(f"  {etapa:22s} {medida['segundos']:9.3f} s  pico {medida['memoria_pico_mb']:9.1f} MB")
+    for consulta, medida in resultado['update_table'].items():
+        print(f"  update_table {consulta:15s} primera {medida['primera_ms']:8.1f} ms  "
+              f"mediana {medida['mediana_ms']:8.1f} ms")
+
+# Comparar contra una base: cociente actual / base de cada etapa
+def comparar(resultados, base, tolerancia):
+    regresiones = []
+    print(f"\nComparación con la base (tolerancia {tolerancia:.0%}):")
+    for nivel, resultado in resultados['niveles'].items():
+        if nivel not in base['niveles']:
+            continue
+        anterior = base['niveles'][nivel]
+        medidas = {etapa: (m['segundos'], anterior['etapas'].get(etapa, {}).get('segundos'))
+                   for etapa, m in resultado['etapas'].items()}
+        medidas.update({f'update_table.{c}': (m['mediana_ms'], anterior['update_table'].get(c, {}).get('mediana_ms'))
+                        for c, m in resultado['update_table'].items()})
+        medidas['memoria_pico_mb'] = (resultado['memoria_pico_mb'], anterior.get('memoria_pico_mb'))
+        for medida, (actual, previo) in medidas.items():
+            if not previo:
+                continue
+            cociente = actual / previo
+            marca = ''
+            if cociente > 1 + tolerancia:
+                marca = '  REGRESIÓN'
+                regresiones.append(f'{nivel} {medida}')
+            print(f"  {nivel:5s} {medida:30s} {cociente:6.2f}x{marca}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de punta a punta por niveles de datos')
+    parser.add_argument('--niveles', default='10k,100k,1M',
+                        help=f"niveles separados por comas (disponibles: {','.join(NIVELES)})")
+    parser.add_argument('--datos', default=None,
+                        help='directorio donde generar y reutilizar los datos de cada nivel')
+    parser.add_argument('--salida', default='bench_resultados.json')
+    parser.add_argument('--base', default=None, help='JSON de una ejecución anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    parser.add_argument('--ejecutar', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ejecutar is not None:
+        resultado = ejecutar_nivel(args.ejecutar)
+        with open(args.salida, 'w') as f:
+            json.dump(resultado, f)
+        return
+
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = args.datos or temporal
+        resultados = {'entorno': entorno(), 'niveles': {}}
+        for nivel in args.niveles.split(','):
+            resultados['niveles'][nivel] = medir_nivel(nivel, directorio)
+            imprimir_nivel(nivel, resultados['niveles'][nivel])
+
+    with open(args.salida, 'w') as f:
+        json.dump(resultados, f, indent=2)
+    print(f"\nResultados en {args.salida}")
+
+    if args.base is not None:
+        with open(args.base) as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.tolerancia)
+        if regresiones:
+            print(f"\nRegresiones: {', '.join(regresiones)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
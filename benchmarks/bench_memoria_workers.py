@@ -0,0 +1,150 @@
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from almacenamiento_rfm import guardar_columnas, guardar_resultados  # noqa: E402
+from analisis_rfm import COLUMNAS_RESULTADOS, agregar_clientes, puntuar_rfm  # noqa: E402
+from bench_agregacion import generar_transacciones  # noqa: E402
+
+# Memoria por worker de `gunicorn app:server` con cada modo de carga de datos:
+#   - copias: cada worker lee y guarda su propia copia (comportamiento por defecto)
+#   - compartido: RFM_DATOS_COMPARTIDOS=1, los workers mapean la misma copia
+#   - compartido+preload: además gunicorn --preload (la carga inicial y sus
+#     agregados se hacen una vez en el proceso maestro antes del fork)
+#
+# Para cada worker se informa RSS, PSS (memoria compartida repartida entre
+# quienes la usan) y USS (memoria única del worker: lo que se libera al
+# terminarlo), leídos de /proc/<pid>/smaps_rollup (Linux).
+#
+# Uso: python benchmarks/bench_memoria_workers.py --workers 4 [--transacciones 5000000]
+
+MODOS = {
+    'copias': ({}, []),
+    'compartido': ({'RFM_DATOS_COMPARTIDOS': '1'}, []),
+    'compartido+preload': ({'RFM_DATOS_COMPARTIDOS': '1', 'RFM_CARGA_DIFERIDA': '0'}, ['--preload'])
+}
+
+def memoria_proceso(pid):
+    campos = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return {
+        'rss': campos['Rss'],
+        'pss': campos['Pss'],
+        'uss': campos['Private_Clean'] + campos['Private_Dirty']
+    }
+
+def workers_de(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(hijo) for hijo in f.read().split()]
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+# Tiempo de CPU (s) consumido por un proceso
+def tiempo_cpu(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+# Esperar a que los n workers estén ociosos (ya cargaron los datos): respondió
+# alguno y ninguno consumió CPU en el último segundo
+def esperar_workers(proceso, puerto, n_workers, limite=600):
+    fin = time.time() + limite
+    anterior = None
+    while time.time() < fin:
+        time.sleep(1)
+        if proceso.poll() is not None:
+            raise RuntimeError('gunicorn terminó antes de arrancar')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{puerto}/version-datos', timeout=5).read()
+            workers = workers_de(proceso.pid)
+            cpu = {pid: tiempo_cpu(pid) for pid in workers}
+        except OSError:
+            continue
+        if (len(workers) == n_workers and anterior is not None and anterior.keys() == cpu.keys()
+                and all(cpu[pid] - anterior[pid] < 0.05 for pid in workers)):
+            return workers
+        anterior = cpu
+    raise RuntimeError('los workers no terminaron de cargar los datos a tiempo')
+
+def medir_modo(modo, n_workers, directorio):
+    variables, opciones = MODOS[modo]
+    puerto = puerto_libre()
+    entorno = dict(os.environ, PYTHONPATH=RAIZ, RFM_INTERVALO_RECARGA='0', **variables)
+    if 'RFM_DATOS_COMPARTIDOS' in variables:
+        entorno['RFM_DIRECTORIO_COMPARTIDO'] = os.path.join(directorio, 'compartido')
+    proceso = subprocess.Popen(
+        ['gunicorn', '-w', str(n_workers), '-b', f'127.0.0.1:{puerto}', *opciones, 'app:server'],
+        cwd=directorio, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        workers = esperar_workers(proceso, puerto, n_workers)
+        memorias = [memoria_proceso(pid) for pid in workers]
+        maestro = memoria_proceso(proceso.pid)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    print(f"\n{modo} ({n_workers} workers)")
+    print(f"{'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+    for pid, memoria in zip(workers, memorias):
+        print(f"{pid:8d} {memoria['rss']:9.1f} {memoria['pss']:9.1f} {memoria['uss']:9.1f}")
+    print(f"{'maestro':>8} {maestro['rss']:9.1f} {maestro['pss']:9.1f} {maestro['uss']:9.1f}")
+    total = sum(m['pss'] for m in memorias) + maestro['pss']
+    print(f"USS medio por worker: {np.mean([m['uss'] for m in memorias]):.1f} MB; "
+          f"PSS total: {total:.1f} MB")
+
+# Datos sintéticos del tamaño pedido, en el formato que lee app.py
+def generar_datos(directorio, n_transacciones, n_clientes, n_productos=500, semilla=42):
+    rng = np.random.default_rng(semilla)
+    df = generar_transacciones(n_transacciones, n_clientes, semilla)
+    df['product_id'] = rng.integers(0, n_productos, size=n_transacciones)
+    df['product_id'] = ('PROD_' + df['product_id'].astype(str)).astype('category')
+    df['category'] = pd.Categorical.from_codes(rng.integers(0, 3, size=n_transacciones), ['A', 'B', 'C'])
+    df['quantity'] = rng.integers(1, 10, size=n_transacciones)
+    df['customer_id'] = df['customer_id'].astype('category')
+    guardar_columnas(df, os.path.join(directorio, 'transacciones_rfm.columnas'))
+
+    rfm = puntuar_rfm(agregar_clientes(df))
+    rfm.index = rfm.index.astype(str)
+    guardar_resultados(rfm[COLUMNAS_RESULTADOS], os.path.join(directorio, 'resultados_rfm.csv'))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Memoria única por worker de gunicorn según el modo de carga de datos')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--modos', default=','.join(MODOS),
+                        help='modos a medir separados por comas')
+    parser.add_argument('--transacciones', type=int, default=None,
+                        help='generar datos sintéticos de este tamaño (por defecto, los del repo)')
+    parser.add_argument('--clientes', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        if args.transacciones is None:
+            for archivo in ('transacciones_rfm.csv', 'resultados_rfm.csv'):
+                os.symlink(os.path.join(RAIZ, archivo), os.path.join(directorio, archivo))
+        else:
+            generar_datos(directorio, args.transacciones, args.clientes)
+            print(f"{args.transacciones:,} transacciones, {args.clientes:,} clientes")
+
+        for modo in args.modos.split(','):
+            medir_modo(modo, args.workers, directorio)
+
+if __name__ == '__main__':
+    main()
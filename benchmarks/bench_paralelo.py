@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacenamiento_rfm import guardar_columnas  # noqa: E402
+from analisis_rfm import (agregar_clientes, agregar_clientes_en_paralelo,  # noqa: E402
+                          cargar_transacciones)
+from bench_agregacion import generar_transacciones  # noqa: E402
+
+# Escalamiento de la agregación RFM particionada por cliente según el número de
+# procesos, comparada con la agregación serial en memoria.
+#
+# Uso: python benchmarks/bench_paralelo.py --transacciones 20000000 --workers 1,2,4,8,16,32
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark de escalamiento de la agregación RFM en paralelo')
+    parser.add_argument('--transacciones', type=int, default=10_000_000)
+    parser.add_argument('--clientes', type=int, default=1_000_000)
+    parser.add_argument('--workers', default='1,2,4,8',
+                        help='lista de cantidades de procesos separadas por comas')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        # Datos en formato columnar: cada proceso los lee mapeados en memoria
+        ruta = os.path.join(directorio, 'transacciones_rfm.csv')
+        df = generar_transacciones(args.transacciones, args.clientes)
+        df['customer_id'] = df['customer_id'].astype('category')
+        guardar_columnas(df, os.path.join(directorio, 'transacciones_rfm.columnas'))
+        del df
+        print(f"{args.transacciones:,} transacciones, {args.clientes:,} clientes, "
+              f"{os.cpu_count()} CPUs")
+
+        inicio = time.perf_counter()
+        serial = agregar_clientes(cargar_transacciones(ruta))
+        t_serial = time.perf_counter() - inicio
+        print(f"serial:      {t_serial:8.2f} s")
+
+        for workers in [int(w) for w in args.workers.split(',')]:
+            inicio = time.perf_counter()
+            paralelo = agregar_clientes_en_paralelo(ruta, workers)
+            t_paralelo = time.perf_counter() - inicio
+            pd.testing.assert_frame_equal(paralelo, serial, check_index_type=False)
+            print(f"{workers:3d} workers: {t_paralelo:8.2f} s  "
+                  f"aceleración {t_serial / t_paralelo:5.2f}x  "
+                  f"eficiencia {t_serial / t_paralelo / workers:6.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Tiempo hasta el primer render del dashboard (lado servidor): importar app.py
+# (arranque del worker), serializar el layout inicial, ejecutar el callback de
+# la pestaña por defecto y, por último, esperar a que los datos estén cargados
+# (la primera petición que necesita los datos, p. ej. la tabla de clientes).
+#
+# Se mide en un proceso nuevo por modo:
+#   - sin paquete: se cargan los datos y se calculan los agregados al arrancar
+#   - con paquete: con el paquete precalculado de paquete_dashboard.py (se
+#     construye antes en un archivo temporal); la pestaña sale del paquete y
+#     los datos se cargan en segundo plano
+# También se informa si pandas o plotly quedaron importados al arrancar.
+#
+# Uso: python benchmarks/bench_primer_render.py [--modos sin_paquete,con_paquete] [--salida r.json]
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ['pandas', 'plotly.express', 'plotly.graph_objects']
+
+def medir():
+    os.chdir(RAIZ)
+    sys.path.insert(0, RAIZ)
+    resultado = {}
+
+    inicio = time.perf_counter()
+    import app
+    resultado['import_app'] = time.perf_counter() - inicio
+    resultado['importados_al_arrancar'] = [m for m in MODULOS_PESADOS if m in sys.modules]
+
+    from plotly.utils import PlotlyJSONEncoder
+    inicio = time.perf_counter()
+    layout = json.dumps(app.app.layout, cls=PlotlyJSONEncoder)
+    resultado['layout_inicial'] = time.perf_counter() - inicio
+    resultado['layout_kb'] = len(layout) / 1024
+
+    inicio = time.perf_counter()
+    contenido = json.dumps(app.render_tab(app.PESTANA_INICIAL), cls=PlotlyJSONEncoder)
+    resultado['pestana_inicial'] = time.perf_counter() - inicio
+    resultado['pestana_kb'] = len(contenido) / 1024
+    resultado['primer_render'] = resultado['import_app'] + resultado['layout_inicial'] + resultado['pestana_inicial']
+
+    inicio = time.perf_counter()
+    app.datos_actuales()
+    resultado['datos_listos'] = resultado['primer_render'] + time.perf_counter() - inicio
+    return resultado
+
+def medir_modo(modo, directorio):
+    entorno = dict(os.environ, RFM_INTERVALO_RECARGA='0',
+                   RFM_PAQUETE=os.path.join(directorio, 'paquete_dashboard.json'))
+    if modo == 'con_paquete':
+        subprocess.run([sys.executable, os.path.join(RAIZ, 'paquete_dashboard.py')], cwd=RAIZ,
+                       env=entorno, check=True, stdout=subprocess.DEVNULL)
+    salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--medir'], cwd=RAIZ,
+                            env=entorno, check=True, capture_output=True, text=True).stdout
+    return json.loads(salida.splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de arranque y primer render del dashboard')
+    parser.add_argument('--modos', default='sin_paquete,con_paquete')
+    parser.add_argument('--salida', default=None, help='guardar los resultados en JSON')
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir()))
+        return
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for modo in args.modos.split(','):
+            r = resultados[modo] = medir_modo(modo, directorio)
+            print(f"\n{modo}")
+            print(f"  import app:          {r['import_app']:7.3f} s  "
+                  f"(importados: {', '.join(r['importados_al_arrancar']) or 'ninguno'})")
+            print(f"  layout inicial:      {r['layout_inicial']:7.3f} s  {r['layout_kb']:9.1f} KB")
+            print(f"  pestaña inicial:     {r['pestana_inicial']:7.3f} s  {r['pestana_kb']:9.1f} KB")
+            print(f"  total primer render: {r['primer_render']:7.3f} s")
+            print(f"  datos cargados:      {r['datos_listos']:7.3f} s")
+
+    if args.salida is not None:
+        with open(args.salida, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Cuantiles aproximados con un sketch KLL (Karnin, Lang, Liberty 2016).
+#
+# El sketch guarda una jerarquía de compactadores: los elementos del nivel h
+# pesan 2**h. Cuando un nivel supera su capacidad se ordena y se promueve uno
+# de cada dos elementos (con desplazamiento aleatorio) al nivel siguiente. Dos
+# sketches se fusionan concatenando nivel a nivel y compactando, así que los
+# cortes de quintiles se pueden calcular a partir de particiones de clientes
+# sin ordenar todos los valores juntos: en analisis_rfm.py --workers cada
+# proceso resume sus clientes (completos) y los sketches se fusionan.
+#
+# La recencia depende de la fecha de análisis global, que una partición no
+# conoce: las particiones resumen la última compra y los cortes de recencia se
+# derivan de los suyos al final (la recencia decrece con la última compra, así
+# que el cuantil p de una es el 1 - p de la otra). La última compra se resume
+# en segundos truncados, que float64 representa sin pérdida (en ns no): así
+# los extremos derivados siguen cubriendo la recencia mínima y la máxima.
+
+METRICAS_RFM = ['recency', 'frequency', 'monetary']
+QUINTILES = [0.2, 0.4, 0.6, 0.8]
+NS_POR_SEGUNDO = 10 ** 9
+
+# Tamaño k del compactador superior para un error de rango normalizado dado
+# (aproximación empírica de Apache DataSketches, ~99% de confianza)
+def k_para_error(error):
+    return max(8, math.ceil((2.296 / error) ** (1 / 0.9723)))
+
+class SketchKLL:
+    def __init__(self, error=0.01, semilla=None):
+        self.k = k_para_error(error)
+        self.error = error
+        self.rng = np.random.default_rng(semilla)
+        self.niveles = [np.empty(0)]
+        self.n = 0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def _capacidad(self, nivel):
+        profundidad = len(self.niveles) - nivel - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** profundidad))
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveles):
+            elementos = self.niveles[nivel]
+            if len(elementos) > self._capacidad(nivel):
+                if nivel + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0))
+                elementos = np.sort(elementos)
+                # Con cantidad impar, el último elemento se queda en su nivel
+                resto = elementos[len(elementos) - len(elementos) % 2:]
+                promovidos = elementos[self.rng.integers(2):len(elementos) - len(resto):2]
+                self.niveles[nivel] = resto
+                self.niveles[nivel + 1] = np.concatenate([self.niveles[nivel + 1], promovidos])
+            nivel += 1
+
+    def actualizar(self, valores):
+        valores = np.asarray(valores, dtype=np.float64)
+        if len(valores) == 0:
+            return self
+        self.n += len(valores)
+        self.minimo = min(self.minimo, valores.min())
+        self.maximo = max(self.maximo, valores.max())
+        self.niveles[0] = np.concatenate([self.niveles[0], valores])
+        self._compactar()
+        return self
+
+    def fusionar(self, otro):
+        while len(self.niveles) < len(otro.niveles):
+            self.niveles.append(np.empty(0))
+        for nivel, elementos in enumerate(otro.niveles):
+            self.niveles[nivel] = np.concatenate([self.niveles[nivel], elementos])
+        self.n += otro.n
+        self.minimo = min(self.minimo, otro.minimo)
+        self.maximo = max(self.maximo, otro.maximo)
+        self._compactar()
+        return self
+
+    # Con lado='right' se toma el elemento siguiente en los empates de rango
+    # (el cuantil 1 - p de una métrica invertida coincide así con el p de la original)
+    def cuantiles(self, probabilidades, lado='left'):
+        valores = np.concatenate(self.niveles)
+        pesos = np.concatenate([np.full(len(e), 2.0 ** h) for h, e in enumerate(self.niveles)])
+        orden = np.argsort(valores, kind='stable')
+        valores, acumulado = valores[orden], np.cumsum(pesos[orden])
+        posiciones = np.searchsorted(acumulado, np.asarray(probabilidades) * acumulado[-1], side=lado)
+        return valores[np.minimum(posiciones, len(valores) - 1)]
+
+    def cortes(self, probabilidades=QUINTILES, lado='left'):
+        # Los extremos son exactos para que ningún valor quede fuera de los bins
+        return np.concatenate([[self.minimo], self.cuantiles(probabilidades, lado), [self.maximo]])
+
+def sketches_rfm(rfm, error=0.01, semilla=None):
+    return {metrica: SketchKLL(error, semilla).actualizar(rfm[metrica].to_numpy())
+            for metrica in METRICAS_RFM}
+
+# Sketches de una partición de clientes completos (last_purchase en lugar de recency)
+def sketches_particion(clientes, error=0.01, semilla=None):
+    ultima_compra = clientes['last_purchase'].to_numpy(dtype='datetime64[ns]').view(np.int64) // NS_POR_SEGUNDO
+    return {
+        'last_purchase': SketchKLL(error, semilla).actualizar(ultima_compra),
+        'frequency': SketchKLL(error, semilla).actualizar(clientes['frequency'].to_numpy()),
+        'monetary': SketchKLL(error, semilla).actualizar(clientes['monetary'].to_numpy())
+    }
+
+def fusionar_sketches(lista_sketches):
+    fusionados = None
+    for sketches in lista_sketches:
+        if fusionados is None:
+            fusionados = sketches
+        else:
+            for metrica, sketch in fusionados.items():
+                sketch.fusionar(sketches[metrica])
+    return fusionados
+
+# Cortes por métrica; con un sketch de last_purchase los de recency se derivan
+# de sus cortes y de la fecha de análisis
+def cortes_desde_sketches(sketches, fecha_analisis=None):
+    cortes = {metrica: sketch.cortes() for metrica, sketch in sketches.items() if metrica != 'last_purchase'}
+    if 'last_purchase' in sketches:
+        from analisis_rfm import calcular_recencia
+
+        ultima_compra = sketches['last_purchase'].cortes(lado='right')[::-1].astype(np.int64) * NS_POR_SEGUNDO
+        cortes['recency'] = calcular_recencia(ultima_compra, fecha_analisis).astype(np.float64)
+    return cortes
+
+# Comparar los scores obtenidos con cortes aproximados contra qcut exacto
+def comparar_con_exacto(rfm_aproximado, rfm_exacto):
+    cambios = {eje: int((rfm_aproximado[eje] != rfm_exacto[eje]).sum()) for eje in 'RFM'}
+    cambios['Segmento'] = int((rfm_aproximado['Segmento'].astype(str) !=
+                               rfm_exacto['Segmento'].astype(str)).sum())
+    cambios['clientes'] = len(rfm_exacto)
+    return pd.Series(cambios)
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from almacenamiento_rfm import valores_float64
+from metricas_productos import ingresos_por_periodo, tasa_crecimiento
+
+# Cubo de ventas precalculado para filtrar por rango de fechas.
+#
+# Las transacciones se agregan una sola vez por (día, producto, categoría,
+# segmento del cliente) con monto, margen, unidades y número de ventas; las
+# celdas quedan ordenadas por día. Por cada dimensión se guardan además las
+# sumas acumuladas por mes, así que los totales de un rango son la diferencia
+# de dos filas acumuladas (meses completos) más las celdas diarias de los
+# extremos del rango. El costo de una consulta depende de la cantidad de
+# productos y de días sueltos, no del volumen de transacciones.
+
+MEDIDAS = ['total_amount', 'margin', 'quantity', 'num_ventas']
+DIMENSIONES = ['product_id', 'category', 'Segmento']
+SIN_DATO = 'Sin dato'
+
+# Códigos enteros y etiquetas de una columna; los valores faltantes (o clientes
+# sin segmento) van a una etiqueta SIN_DATO al final
+def _codificar(valores):
+    if not isinstance(valores.dtype, pd.CategoricalDtype):
+        valores = valores.astype('category')
+    codigos = valores.cat.codes.to_numpy().astype(np.int64)
+    etiquetas = valores.cat.categories.astype(str)
+    if (codigos < 0).any():
+        codigos[codigos < 0] = len(etiquetas)
+        etiquetas = etiquetas.append(pd.Index([SIN_DATO]))
+    return codigos, etiquetas
+
+# Segmento RFM de cada transacción según su cliente (las categorías de clientes
+# se cruzan una vez con los resultados, no transacción por transacción)
+def _segmento_transacciones(clientes, rfm):
+    if not isinstance(clientes.dtype, pd.CategoricalDtype):
+        clientes = clientes.astype('category')
+    posicion = pd.Index(np.asarray(rfm['customer_id'], dtype=object)).get_indexer(
+        clientes.cat.categories.astype(object))
+    segmentos = np.asarray(rfm['Segmento'], dtype=object)
+    por_categoria = np.append(np.where(posicion >= 0, segmentos[posicion], None), None)
+    return pd.Series(por_categoria[clientes.cat.codes.to_numpy()])
+
+def _dia(fecha):
+    return np.datetime64(pd.Timestamp(fecha), 'D').astype(np.int64)
+
+def construir_cubo(transacciones, rfm):
+    dias = transacciones['transaction_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    dia0 = int(dias.min())
+    n_dias = int(dias.max()) - dia0 + 1
+
+    columnas = {
+        'product_id': transacciones['product_id'],
+        'category': transacciones['category'] if 'category' in transacciones.columns
+                    else pd.Series(np.full(len(transacciones), None)),
+        'Segmento': _segmento_transacciones(transacciones['customer_id'], rfm)
+    }
+    codigos, etiquetas = {}, {}
+    for dimension in DIMENSIONES:
+        codigos[dimension], etiquetas[dimension] = _codificar(columnas[dimension])
+
+    # Una clave entera por celda (día, producto, categoría, segmento); ordenar
+    # las claves deja las celdas ordenadas por día
+    clave = dias - dia0
+    for dimension in DIMENSIONES:
+        clave = clave * len(etiquetas[dimension]) + codigos[dimension]
+    claves, celda = np.unique(clave, return_inverse=True)
+    medidas = np.column_stack([
+        np.bincount(celda, weights=valores_float64(transacciones, 'total_amount'), minlength=len(claves)),
+        np.bincount(celda, weights=valores_float64(transacciones, 'margin'), minlength=len(claves)),
+        np.bincount(celda, weights=transacciones['quantity'].to_numpy(), minlength=len(claves)),
+        np.bincount(celda, minlength=len(claves)).astype(np.float64)
+    ])
+
+    codigos_celdas = {}
+    for dimension in reversed(DIMENSIONES):
+        claves, codigos_celdas[dimension] = np.divmod(claves, len(etiquetas[dimension]))
+    dia_celda = claves
+
+    # Inicio (en días desde dia0) de cada mes cubierto, más el fin del cubo
+    meses = np.arange(np.datetime64(dia0, 'D').astype('datetime64[M]'),
+                      np.datetime64(dia0 + n_dias - 1, 'D').astype('datetime64[M]') + 1)
+    inicio_mes = np.append(np.maximum(meses.astype('datetime64[D]').astype(np.int64) - dia0, 0), n_dias)
+    mes_celda = np.searchsorted(inicio_mes, dia_celda, side='right') - 1
+
+    acumulado_mensual = {}
+    for dimension in DIMENSIONES:
+        n = len(etiquetas[dimension])
+        posicion = mes_celda * n + codigos_celdas[dimension]
+        suma = np.stack([np.bincount(posicion, weights=medidas[:, j], minlength=len(meses) * n)
+                         for j in range(len(MEDIDAS))], axis=-1).reshape(len(meses), n, len(MEDIDAS))
+        acumulado_mensual[dimension] = np.concatenate([np.zeros((1, n, len(MEDIDAS))),
+                                                       np.cumsum(suma, axis=0)])
+
+    return {
+        'dia0': dia0,
+        'n_dias': n_dias,
+        'fecha_min': pd.Timestamp(np.datetime64(dia0, 'D')),
+        'fecha_max': pd.Timestamp(np.datetime64(dia0 + n_dias - 1, 'D')),
+        'inicio_dia': np.searchsorted(dia_celda, np.arange(n_dias + 1)),
+        'inicio_mes': inicio_mes,
+        'dia': dia_celda,
+        'codigos': codigos_celdas,
+        'etiquetas': etiquetas,
+        'medidas': medidas,
+        'acumulado_mensual': acumulado_mensual
+    }
+
+# Sumas por dimensión de las celdas de los días [desde, hasta)
+def _sumar_dias(cubo, dimension, desde, hasta):
+    filas = slice(cubo['inicio_dia'][desde], cubo['inicio_dia'][hasta])
+    codigos, medidas = cubo['codigos'][dimension][filas], cubo['medidas'][filas]
+    n = len(cubo['etiquetas'][dimension])
+    return np.stack([np.bincount(codigos, weights=medidas[:, j], minlength=n)
+                     for j in range(len(MEDIDAS))], axis=-1)
+
+# Totales por dimensión entre dos fechas (inclusive; None = sin límite)
+def totales_rango(cubo, dimension, inicio=None, fin=None):
+    desde = 0 if inicio is None else int(np.clip(_dia(inicio) - cubo['dia0'], 0, cubo['n_dias']))
+    hasta = cubo['n_dias'] if fin is None else int(np.clip(_dia(fin) - cubo['dia0'] + 1, 0, cubo['n_dias']))
+    hasta = max(desde, hasta)
+
+    # Meses completos dentro del rango: [primer_mes, ultimo_mes)
+    inicio_mes = cubo['inicio_mes']
+    primer_mes = np.searchsorted(inicio_mes, desde, side='left')
+    ultimo_mes = np.searchsorted(inicio_mes, hasta, side='right') - 1
+    if primer_mes < ultimo_mes:
+        acumulado = cubo['acumulado_mensual'][dimension]
+        suma = (acumulado[ultimo_mes] - acumulado[primer_mes]
+                + _sumar_dias(cubo, dimension, desde, inicio_mes[primer_mes])
+                + _sumar_dias(cubo, dimension, inicio_mes[ultimo_mes], hasta))
+    else:
+        suma = _sumar_dias(cubo, dimension, desde, hasta)
+
+    totales = pd.DataFrame(suma, index=cubo['etiquetas'][dimension].rename(dimension), columns=MEDIDAS)
+    totales[['quantity', 'num_ventas']] = totales[['quantity', 'num_ventas']].round().astype(np.int64)
+    return totales[totales['num_ventas'] > 0]
+
+# Crecimiento (%) por dimensión del periodo de `dias_periodo` días que termina
+# en `fin` (por defecto, el último día con datos) respecto del periodo anterior.
+# Con `inicio` los periodos no cuentan ventas anteriores a esa fecha: si el
+# rango es más corto que dos periodos, el anterior queda recortado (o vacío)
+def crecimiento_rango(cubo, dimension, dias_periodo, fin=None, inicio=None):
+    ultimo = cubo['n_dias'] - 1
+    if fin is not None:
+        ultimo = int(np.clip(_dia(fin) - cubo['dia0'], 0, cubo['n_dias'] - 1))
+    primer = None if inicio is None else _dia(inicio) - cubo['dia0']
+    etiquetas = cubo['etiquetas'][dimension]
+    ingresos = ingresos_por_periodo(cubo['dia'], cubo['codigos'][dimension], cubo['medidas'][:, 0],
+                                    len(etiquetas), ultimo, dias_periodo, primer_dia=primer)
+    return tasa_crecimiento(ingresos, etiquetas.rename(dimension))
@@ -0,0 +1,218 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from instrumentacion import DURACION_AGREGADOS, DURACION_CARGA, cronometrar
+from motor_sql import MOTOR_SQL
+from rutas_datos import RUTA_RESULTADOS, RUTA_TRANSACCIONES, version_tabla
+
+# Datos del dashboard con recarga en caliente.
+#
+# Los frames cargados y sus agregados derivados forman una instantánea
+# (DatosDashboard) identificada por la versión de los archivos de origen. Un
+# hilo vigía compara periódicamente esa versión con la de disco; cuando cambia
+# y se mantiene igual entre dos revisiones (los archivos ya no se están
+# escribiendo), carga la instantánea nueva en segundo plano, precalcula sus
+# agregados y solo entonces la publica reemplazando una única referencia. Cada
+# callback toma la instantánea activa una vez y trabaja solo con ella, así que
+# nunca mezcla datos de dos versiones.
+#
+# Con RFM_DATOS_COMPARTIDOS=1 las tablas se materializan una vez en
+# RFM_DIRECTORIO_COMPARTIDO (por defecto /dev/shm) y cada proceso las mapea en
+# memoria sin copiarlas, así que los workers de gunicorn comparten las mismas
+# páginas en lugar de tener cada uno su copia. Con `gunicorn --preload` también
+# los agregados de la carga inicial quedan compartidos (copy-on-write).
+#
+# almacenamiento_rfm (y con él pandas) se importa recién al leer los datos:
+# con iniciar_vigilancia(en_segundo_plano=True) el proceso puede empezar a
+# atender peticiones (p. ej. desde el paquete precalculado) mientras la primera
+# carga se hace en el hilo vigía.
+#
+# RFM_INTERVALO_RECARGA (segundos, por defecto 30; 0 desactiva la vigilancia)
+# RFM_CARGA_DIFERIDA=0 hace siempre la primera carga antes de atender peticiones
+# (p. ej. con gunicorn --preload, para que la haga el proceso maestro)
+#
+# Con RFM_MOTOR_SQL (motor_sql.py) las transacciones no se cargan en memoria:
+# la carga deja al día la base SQL (y los segmentos de los clientes) y la
+# instantánea tiene transacciones=None; los agregados se consultan a la base.
+
+# De las transacciones solo se cargan las columnas que usan el análisis de
+# productos y el cubo de ventas
+COLUMNAS_TRANSACCIONES = ['transaction_date', 'customer_id', 'product_id', 'category',
+                          'quantity', 'total_amount', 'margin']
+INTERVALO_RECARGA = float(os.environ.get('RFM_INTERVALO_RECARGA', 30))
+CARGA_DIFERIDA = os.environ.get('RFM_CARGA_DIFERIDA', '1') == '1'
+DATOS_COMPARTIDOS = os.environ.get('RFM_DATOS_COMPARTIDOS') == '1'
+DIRECTORIO_COMPARTIDO = os.environ.get(
+    'RFM_DIRECTORIO_COMPARTIDO', '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+class DatosDashboard:
+    def __init__(self, version, rfm, transacciones):
+        self.version = version
+        self.rfm = rfm
+        self.transacciones = transacciones
+        self._derivados = {}
+
+    # Las cachés pueden usar la instantánea como clave: se identifica por su versión
+    def __hash__(self):
+        return hash(self.version)
+
+    def __eq__(self, otro):
+        return isinstance(otro, DatosDashboard) and self.version == otro.version
+
+    # Agregado derivado de esta instantánea, calculado una sola vez; se descarta
+    # junto con ella cuando se publica una versión nueva
+    def derivado(self, clave, funcion):
+        if clave not in self._derivados:
+            with cronometrar(DURACION_AGREGADOS, clave):
+                self._derivados[clave] = funcion(self)
+        return self._derivados[clave]
+
+def version_fuentes():
+    return (version_tabla(RUTA_RESULTADOS), version_tabla(RUTA_TRANSACCIONES))
+
+def _leer(ruta_csv, columnas=None):
+    from almacenamiento_rfm import leer_tabla, leer_tabla_compartida
+
+    if DATOS_COMPARTIDOS:
+        return leer_tabla_compartida(ruta_csv, DIRECTORIO_COMPARTIDO, columnas)
+    return leer_tabla(ruta_csv, columnas)
+
+# Cargar una instantánea; devuelve None si los archivos cambiaron durante la carga
+def cargar_datos():
+    version = version_fuentes()
+    with cronometrar(DURACION_CARGA, 'lectura'):
+        rfm = _leer(RUTA_RESULTADOS)
+        transacciones = None if MOTOR_SQL else _leer(RUTA_TRANSACCIONES, COLUMNAS_TRANSACCIONES)
+    if MOTOR_SQL:
+        from motor_sql import actualizar_base, actualizar_segmentos
+
+        with cronometrar(DURACION_CARGA, 'base_sql'):
+            actualizar_base()
+            actualizar_segmentos(rfm, version[0])
+    if version_fuentes() != version:
+        return None
+    return DatosDashboard(version, rfm, transacciones)
+
+_actual = None
+_bloqueo = threading.Lock()
+_precalculos = []
+_al_publicar = []
+_vigilancia = {'hilo': None, 'intervalo': None, 'en_segundo_plano': False}
+
+# Registrar una función que se ejecuta sobre cada instantánea nueva antes de publicarla
+def precalcular(funcion):
+    _precalculos.append(funcion)
+    return funcion
+
+# Registrar una función que se ejecuta después de publicar una instantánea nueva
+def al_publicar(funcion):
+    _al_publicar.append(funcion)
+    return funcion
+
+def datos_actuales():
+    if _actual is None:
+        recargar(primera_carga=True)
+    return _actual
+
+def version_activa():
+    return datos_actuales().version
+
+# Versión que se está sirviendo o, si todavía no se cargó nada, la de disco
+# (sin esperar a la carga)
+def version_disponible():
+    if _actual is not None:
+        return _actual.version
+    return version_fuentes()
+
+# Cargar los datos de disco y publicarlos si son de otra versión. Devuelve True
+# si se publicó una instantánea nueva. Con primera_carga=True no hace nada si
+# otro hilo ya publicó una instantánea mientras se esperaba el bloqueo
+def recargar(primera_carga=False):
+    global _actual
+    with _bloqueo:
+        if primera_carga and _actual is not None:
+            return False
+        datos = cargar_datos()
+        while datos is None and _actual is None:
+            # Primera carga: no hay nada que servir mientras tanto, reintentar
+            datos = cargar_datos()
+        if datos is None or datos == _actual:
+            return False
+
+        with cronometrar(DURACION_CARGA, 'precalculo'):
+            for funcion in _precalculos:
+                funcion(datos)
+        _actual = datos
+        for funcion in _al_publicar:
+            funcion(datos)
+    return True
+
+# Las copias compartidas de versiones anteriores ya no se necesitan
+@al_publicar
+def limpiar_versiones_anteriores(datos):
+    if DATOS_COMPARTIDOS:
+        from almacenamiento_rfm import limpiar_compartidas, ruta_compartida
+
+        for ruta_csv, columnas in ((RUTA_RESULTADOS, None), (RUTA_TRANSACCIONES, COLUMNAS_TRANSACCIONES)):
+            limpiar_compartidas(ruta_csv, DIRECTORIO_COMPARTIDO,
+                                ruta_compartida(ruta_csv, DIRECTORIO_COMPARTIDO, columnas))
+
+def _vigilar(intervalo):
+    try:
+        datos_actuales()
+    except Exception as error:
+        # Se vuelve a intentar en la primera petición que necesite los datos
+        print(f"No se pudieron cargar los datos: {error!r}")
+    if intervalo <= 0:
+        return
+
+    vista = None
+    while True:
+        time.sleep(intervalo)
+        try:
+            version = version_fuentes()
+            if version == _actual.version:
+                vista = None
+            elif version != vista:
+                # Esperar una revisión más: si no vuelve a cambiar, ya se terminó de escribir
+                vista = version
+            elif recargar():
+                print(f"Datos recargados (versión {_actual.version})")
+        except Exception as error:
+            # Archivos a medio reemplazar o ilegibles: se sigue sirviendo la versión activa
+            print(f"No se pudieron recargar los datos: {error!r}")
+
+# Procesos lanzados por multiprocessing (p. ej. el pool de trabajos_rfm, que al
+# arrancar vuelve a importar el módulo principal, app.py incluido): no atienden
+# peticiones, así que no cargan datos ni arrancan el vigía
+def _proceso_de_pool():
+    return multiprocessing.current_process().name != 'MainProcess'
+
+# Cargar los datos (si no se cargaron aún) y arrancar el hilo vigía; con
+# en_segundo_plano=True la primera carga también la hace el hilo vigía
+def iniciar_vigilancia(intervalo=INTERVALO_RECARGA, en_segundo_plano=False):
+    if _proceso_de_pool():
+        return
+    if not en_segundo_plano:
+        datos_actuales()
+    _vigilancia['intervalo'] = intervalo
+    _vigilancia['en_segundo_plano'] = en_segundo_plano
+    if _vigilancia['hilo'] is not None or (intervalo <= 0 and _actual is not None):
+        return
+    hilo = threading.Thread(target=_vigilar, args=(intervalo,), name='recarga-datos', daemon=True)
+    hilo.start()
+    _vigilancia['hilo'] = hilo
+
+# Los hilos no sobreviven a fork (p. ej. gunicorn --preload): cada worker
+# arranca su propio vigía
+def _reiniciar_tras_fork():
+    global _bloqueo
+    _bloqueo = threading.Lock()
+    if _vigilancia['hilo'] is not None:
+        _vigilancia['hilo'] = None
+        iniciar_vigilancia(_vigilancia['intervalo'], _vigilancia['en_segundo_plano'])
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Gráficas a nivel de cliente con agregación en el servidor.
+#
+# En lugar de mandar un punto por cliente, los clientes del rango visible se
+# agrupan en una rejilla de RESOLUCION x RESOLUCION celdas (o en RESOLUCION
+# intervalos por segmento para las distribuciones) y solo viajan las celdas con
+# clientes, así que el tamaño de la figura no depende de la cantidad de filas
+# de resultados_rfm.csv. Si en el rango hay pocos clientes (MAX_PUNTOS) se
+# mandan los puntos tal cual. Al hacer zoom se vuelve a agrupar solo el rango
+# visible, con la misma resolución, y el detalle aumenta.
+#
+# Los clientes se ordenan una vez por el eje x: el rango en x es un slice
+# (searchsorted) y solo ese tramo se filtra por y y se agrupa.
+
+RESOLUCION = 60
+MAX_PUNTOS = 5000
+
+# Columnas x e y de cada cliente, con su segmento, ordenadas por x
+def indexar_dispersion(rfm, x, y):
+    codigos, segmentos = pd.factorize(rfm['Segmento'].astype(str), sort=True)
+    valores_x = rfm[x].to_numpy(dtype=np.float64)
+    orden = np.argsort(valores_x, kind='stable')
+    return {
+        'x': valores_x[orden],
+        'y': rfm[y].to_numpy(dtype=np.float64)[orden],
+        'segmento': codigos[orden],
+        'segmentos': list(segmentos),
+        'clientes': rfm['customer_id'].to_numpy()[orden]
+    }
+
+# Clientes (en orden del índice) dentro del rango de cada eje (None = todo el eje)
+def _en_rango(indice, rango_x, rango_y):
+    desde, hasta = 0, len(indice['x'])
+    if rango_x is not None:
+        desde = np.searchsorted(indice['x'], rango_x[0], side='left')
+        hasta = np.searchsorted(indice['x'], rango_x[1], side='right')
+    tramo = slice(desde, hasta)
+    x, y, segmento = indice['x'][tramo], indice['y'][tramo], indice['segmento'][tramo]
+    posiciones = np.arange(desde, hasta)
+    if rango_y is not None:
+        mascara = (y >= rango_y[0]) & (y <= rango_y[1])
+        x, y, segmento, posiciones = x[mascara], y[mascara], segmento[mascara], posiciones[mascara]
+    return x, y, segmento, posiciones
+
+def _bordes(valores, rango, resolucion):
+    minimo, maximo = rango if rango is not None else (valores.min(), valores.max())
+    if maximo <= minimo:
+        maximo = minimo + 1
+    return np.linspace(minimo, maximo, resolucion + 1)
+
+def _intervalo(valores, bordes):
+    return np.clip(np.searchsorted(bordes, valores, side='right') - 1, 0, len(bordes) - 2)
+
+# Por segmento: puntos exactos (pocos clientes en el rango) o centros de las
+# celdas donde predomina, con su cantidad de clientes. Devuelve
+# ({segmento: {...}}, agrupado)
+def rejilla_clientes(indice, rango_x=None, rango_y=None, resolucion=RESOLUCION):
+    x, y, segmento, posiciones = _en_rango(indice, rango_x, rango_y)
+    n_segmentos = len(indice['segmentos'])
+
+    if len(x) <= MAX_PUNTOS:
+        series = {}
+        for codigo, nombre in enumerate(indice['segmentos']):
+            mascara = segmento == codigo
+            if mascara.any():
+                series[nombre] = {'x': x[mascara], 'y': y[mascara],
+                                  'clientes': np.ones(mascara.sum(), dtype=np.int64),
+                                  'ids': indice['clientes'][posiciones[mascara]]}
+        return series, False
+
+    bordes_x, bordes_y = _bordes(x, rango_x, resolucion), _bordes(y, rango_y, resolucion)
+    celda = (segmento * resolucion + _intervalo(x, bordes_x)) * resolucion + _intervalo(y, bordes_y)
+    conteo = np.bincount(celda, minlength=n_segmentos * resolucion * resolucion).reshape(
+        n_segmentos, resolucion, resolucion)
+    centros_x, centros_y = (bordes_x[:-1] + bordes_x[1:]) / 2, (bordes_y[:-1] + bordes_y[1:]) / 2
+
+    # Una marca por celda, del segmento con más clientes en ella: la figura
+    # tiene a lo sumo resolucion x resolucion marcas, haya los segmentos que haya
+    total, predominante = conteo.sum(axis=0), conteo.argmax(axis=0)
+    series = {}
+    for codigo, nombre in enumerate(indice['segmentos']):
+        i, j = np.nonzero((total > 0) & (predominante == codigo))
+        if len(i):
+            series[nombre] = {'x': centros_x[i], 'y': centros_y[j], 'clientes': total[i, j], 'ids': None}
+    return series, True
+
+# Clientes por intervalo del eje x y por segmento (histograma agrupado en el servidor)
+def distribucion_clientes(indice, rango_x=None, resolucion=RESOLUCION):
+    x, _, segmento, _ = _en_rango(indice, rango_x, None)
+    bordes = _bordes(x, rango_x, resolucion) if len(x) else np.linspace(0, 1, resolucion + 1)
+    n_segmentos = len(indice['segmentos'])
+    conteo = np.bincount(segmento * resolucion + _intervalo(x, bordes),
+                         minlength=n_segmentos * resolucion).reshape(n_segmentos, resolucion)
+    return bordes, {nombre: conteo[codigo] for codigo, nombre in enumerate(indice['segmentos'])
+                    if conteo[codigo].any()}
+
+# Rango visible de un eje después de un relayout: None si se restableció el
+# zoom, `anterior` si el evento no cambia ese eje (p. ej. zoom solo en x)
+def rango_relayout(relayout, eje, anterior=None):
+    if not relayout:
+        return anterior
+    if relayout.get(f'{eje}.autorange'):
+        return None
+    if f'{eje}.range[0]' in relayout:
+        return (float(relayout[f'{eje}.range[0]']), float(relayout[f'{eje}.range[1]']))
+    if f'{eje}.range' in relayout:
+        return tuple(float(valor) for valor in relayout[f'{eje}.range'])
+    return anterior
@@ -0,0 +1,94 @@
+# Resumen por segmento y figuras de la pestaña RFM, compartidos por app.py y
+# dashboard_rfm.py. Sin efectos al importarlo: plotly se importa dentro de cada
+# función, así que dashboard_rfm.py puede usarlo sin cargar app.py.
+
+# Promedios de recency, frequency y monetary por segmento
+def estadisticas_por_segmento(rfm):
+    segmento_stats = rfm.groupby('Segmento', observed=True).agg({
+        'recency': 'mean',
+        'frequency': 'mean',
+        'monetary': 'mean'
+    }).round(2)
+    # Índice como texto: el segmento puede venir como categórico del formato columnar
+    segmento_stats.index = segmento_stats.index.astype(str)
+    return segmento_stats.sort_index()
+
+def resumen_clientes(rfm):
+    return {
+        'clientes': len(rfm),
+        'valor_total': float(rfm['monetary'].sum()),
+        'promedio': float(rfm['monetary'].mean()),
+        'segmentos': [str(segmento) for segmento in rfm['Segmento'].unique()]
+    }
+
+def create_bar_chart(data, x, y, title):
+    import plotly.express as px
+
+    fig = px.bar(
+        data,
+        x=x,
+        y=y,
+        title=title,
+        color=x,
+        template='plotly_white'
+    )
+    return fig
+
+def create_radar_chart(segmento_stats):
+    import plotly.graph_objects as go
+
+    # Normalizar datos
+    normalized_stats = segmento_stats.copy()
+    for column in ['recency', 'frequency', 'monetary']:
+        normalized_stats[column] = (segmento_stats[column] - segmento_stats[column].min()) / \
+                                 (segmento_stats[column].max() - segmento_stats[column].min())
+        if column == 'recency':
+            normalized_stats[column] = 1 - normalized_stats[column]
+
+    fig = go.Figure()
+    categories = ['Recency', 'Frequency', 'Monetary']
+
+    for segmento in normalized_stats.index:
+        fig.add_trace(go.Scatterpolar(
+            r=normalized_stats.loc[segmento],
+            theta=categories,
+            fill='toself',
+            name=segmento
+        ))
+
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+        showlegend=True,
+        title='Comparación RFM por Segmento'
+    )
+    return fig
+
+def create_segment_table(segmento_stats):
+    import plotly.graph_objects as go
+
+    return go.Figure(data=[
+        go.Table(
+            header=dict(values=['Segmento', 'Recency (días)', 'Frequency (compras)', 'Monetary ($)'],
+                      fill_color='paleturquoise',
+                      align='left'),
+            cells=dict(values=[
+                segmento_stats.index,
+                segmento_stats['recency'].round(1),
+                segmento_stats['frequency'].round(1),
+                segmento_stats['monetary'].round(2)
+            ],
+            fill_color='lavender',
+            align='left'))
+    ])
+
+def figuras_resumen(segmento_stats):
+    return {
+        'monetary': create_bar_chart(segmento_stats.reset_index(), 'Segmento', 'monetary',
+                                     'Valor Monetario por Segmento'),
+        'radar': create_radar_chart(segmento_stats),
+        'frequency': create_bar_chart(segmento_stats.reset_index(), 'Segmento', 'frequency',
+                                      'Frecuencia de Compras por Segmento'),
+        'recency': create_bar_chart(segmento_stats.reset_index(), 'Segmento', 'recency',
+                                    'Días desde Última Compra por Segmento'),
+        'tabla_segmentos': create_segment_table(segmento_stats)
+    }
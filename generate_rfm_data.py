@@ -1,87 +1,190 @@
-import pandas as pd
+import argparse
+from datetime import datetime
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
-
-# Configurar semilla para reproducibilidad
-np.random.seed(42)
-
-# Generar datos base
-n_transactions = 10000
-n_customers = 1000
-n_products = 50
-
-# Crear IDs de clientes
-customer_ids = [f'CUST_{str(i).zfill(4)}' for i in range(n_customers)]
-
-# Definir categorías de productos
-product_categories = ['A', 'B', 'C']
-
-# Crear lista de productos con precios y categorías
-products = {}
-for i in range(n_products):
-    prod_id = f'PROD_{str(i).zfill(3)}'
-    
-    # Asignar diferentes rangos de precios según la categoría deseada
-    if i < n_products * 0.2:  # 20% Estrellas
-        precio = round(random.uniform(2000, 5000), 2)  # Productos premium
-        market_weight = 2.5  # Mayor peso para asegurar alta participación
-    elif i < n_products * 0.4:  # 20% Vacas
-        precio = round(random.uniform(1000, 3000), 2)  # Productos establecidos
-        market_weight = 2.0  # Peso alto para asegurar alta participación
-    elif i < n_products * 0.7:  # 30% Interrogantes
-        precio = round(random.uniform(500, 2000), 2)  # Productos nuevos
-        market_weight = 0.5  # Peso bajo
-    else:  # 30% Perros
-        precio = round(random.uniform(100, 1000), 2)  # Productos económicos
-        market_weight = 0.3  # Peso muy bajo
-    
-    costo = round(precio * random.uniform(0.4, 0.8), 2)
-    products[prod_id] = {
+import pandas as pd
+
+from almacenamiento_rfm import EscritorColumnas, ruta_columnar
+
+# Generador de transacciones sintéticas para el análisis RFM.
+#
+# Todo se genera con la API Generator de NumPy y por lotes: las fechas salen
+# de un reparto multinomial de las transacciones entre los días (así el archivo
+# queda ordenado por fecha sin ordenar nada), y cada lote usa su propio
+# generador derivado de la semilla y del número de lote, de modo que la memoria
+# no depende del total y la misma semilla (con el mismo tamaño de lote y fecha
+# final) reproduce exactamente el mismo archivo.
+#
+# Uso: python generate_rfm_data.py [--transacciones 100000000 --clientes 1000000
+#      --productos 5000 --formato columnas --fecha-fin 2025-01-01]
+
+CATEGORIAS = ['A', 'B', 'C']
+COLUMNAS = ['transaction_id', 'customer_id', 'transaction_date', 'product_id', 'quantity',
+            'unit_price', 'unit_cost', 'category', 'total_amount', 'total_cost', 'margin']
+
+# Proporción de productos, rango de precios y peso de mercado de cada tipo
+TIPOS_PRODUCTO = [
+    (0.2, (2000, 5000), 2.5),  # Estrellas: productos premium, alta participación
+    (0.2, (1000, 3000), 2.0),  # Vacas: productos establecidos, alta participación
+    (0.3, (500, 2000), 0.5),   # Interrogantes: productos nuevos, peso bajo
+    (0.3, (100, 1000), 0.3)    # Perros: productos económicos, peso muy bajo
+]
+
+# Generadores independientes por propósito (y por lote) a partir de una semilla
+def generador(semilla, *clave):
+    return np.random.default_rng(np.random.SeedSequence(semilla, spawn_key=clave))
+
+# IDs con prefijo y número con ceros a la izquierda, como bytes de ancho fijo
+def formatear_ids(prefijo, numeros, ancho):
+    potencias = 10 ** np.arange(ancho - 1, -1, -1, dtype=np.int64)
+    digitos = (np.asarray(numeros, dtype=np.int64)[:, None] // potencias % 10 + ord('0')).astype(np.uint8)
+    inicio = np.broadcast_to(np.frombuffer(prefijo.encode(), dtype=np.uint8), (len(digitos), len(prefijo)))
+    return np.ascontiguousarray(np.hstack([inicio, digitos])).view(f'S{len(prefijo) + ancho}').ravel()
+
+def ancho_ids(cantidad, minimo):
+    return max(minimo, len(str(max(cantidad - 1, 0))))
+
+# Precio, costo, categoría y peso de mercado por producto
+def generar_productos(n_productos, semilla):
+    rng = generador(semilla, 0)
+    limites = np.cumsum([proporcion for proporcion, _, _ in TIPOS_PRODUCTO])[:-1]
+    tipo = np.searchsorted(limites * n_productos, np.arange(n_productos), side='right')
+    minimo = np.array([rango[0] for _, rango, _ in TIPOS_PRODUCTO])[tipo]
+    maximo = np.array([rango[1] for _, rango, _ in TIPOS_PRODUCTO])[tipo]
+
+    precio = np.round(rng.uniform(minimo, maximo), 2)
+    return {
         'precio': precio,
-        'costo': costo,
-        'categoria': random.choice(product_categories),
-        'market_weight': market_weight
+        'costo': np.round(precio * rng.uniform(0.4, 0.8, size=n_productos), 2),
+        'categoria': rng.integers(0, len(CATEGORIAS), size=n_productos),
+        'peso': np.array([peso for _, _, peso in TIPOS_PRODUCTO])[tipo]
     }
 
-# Modificar la generación de transacciones para reflejar participación de mercado
-weighted_products = [(k, v['market_weight']) for k, v in products.items()]
-product_ids, weights = zip(*weighted_products)
-
-# Generar fechas aleatorias en los últimos 2 años
-end_date = datetime.now()
-start_date = end_date - timedelta(days=730)
-dates = [
-    start_date + timedelta(
-        days=random.randint(0, 730)
-    ) for _ in range(n_transactions)
-]
+# Transacciones por día (acumuladas) en los dias + 1 días del periodo
+def transacciones_por_dia(n_transacciones, dias, semilla):
+    rng = generador(semilla, 1)
+    return np.cumsum(rng.multinomial(n_transacciones, np.full(dias + 1, 1 / (dias + 1))))
+
+# Lote de transacciones [inicio, fin): códigos de cliente, producto y categoría
+# y valores numéricos
+def generar_lote(inicio, fin, numero_lote, productos, acumulado_dias, n_clientes, fecha_inicio,
+                 semilla):
+    rng = generador(semilla, 2, numero_lote)
+    n = fin - inicio
+    producto = rng.choice(len(productos['peso']), size=n, p=productos['peso'] / productos['peso'].sum())
+    cantidad = rng.integers(1, 10, size=n)
+    precio, costo = productos['precio'][producto], productos['costo'][producto]
+    total_amount, total_cost = cantidad * precio, cantidad * costo
+
+    dias = np.searchsorted(acumulado_dias, np.arange(inicio, fin), side='right')
+    return {
+        'transaction_id': np.arange(inicio, fin),
+        'customer_id': rng.integers(0, n_clientes, size=n),
+        'transaction_date': fecha_inicio + dias.astype('timedelta64[D]'),
+        'product_id': producto,
+        'quantity': cantidad.astype(np.int8),
+        'unit_price': precio,
+        'unit_cost': costo,
+        'category': productos['categoria'][producto],
+        'total_amount': total_amount,
+        'total_cost': total_cost,
+        'margin': total_amount - total_cost
+    }
+
+def lote_como_dataframe(lote, anchos):
+    df = pd.DataFrame(lote, columns=COLUMNAS)
+    df['transaction_id'] = formatear_ids('TRX_', lote['transaction_id'], anchos['transaction_id']).astype(str)
+    df['customer_id'] = formatear_ids('CUST_', lote['customer_id'], anchos['customer_id']).astype(str)
+    df['product_id'] = formatear_ids('PROD_', lote['product_id'], anchos['product_id']).astype(str)
+    df['category'] = np.array(CATEGORIAS)[lote['category']]
+    return df
+
+# Esquema de la salida columnar: IDs de clientes, productos y categorías como
+# categóricos (el catálogo se conoce de antemano) y transaction_id como texto
+def columnas_salida(n_transacciones, n_clientes, n_productos, anchos):
+    def categorica(categorias):
+        return {'tipo': 'categoria', 'categorias': categorias,
+                'dtype': np.int8 if len(categorias) <= 127 else np.int16 if len(categorias) <= 32767
+                else np.int32}
+    return {
+        'transaction_id': {'tipo': 'texto', 'dtype': f"S{4 + anchos['transaction_id']}"},
+        'customer_id': categorica(formatear_ids('CUST_', np.arange(n_clientes), anchos['customer_id'])
+                                  .astype(str)),
+        'transaction_date': {'tipo': 'fecha', 'dtype': 'datetime64[ns]'},
+        'product_id': categorica(formatear_ids('PROD_', np.arange(n_productos), anchos['product_id'])
+                                 .astype(str)),
+        'quantity': {'tipo': 'entero', 'dtype': np.int8},
+        'unit_price': {'tipo': 'decimal', 'decimales': None, 'dtype': np.float64},
+        'unit_cost': {'tipo': 'decimal', 'decimales': None, 'dtype': np.float64},
+        'category': categorica(np.array(CATEGORIAS)),
+        'total_amount': {'tipo': 'decimal', 'decimales': None, 'dtype': np.float64},
+        'total_cost': {'tipo': 'decimal', 'decimales': None, 'dtype': np.float64},
+        'margin': {'tipo': 'decimal', 'decimales': None, 'dtype': np.float64}
+    }
+
+def generar(ruta, n_transacciones, n_clientes, n_productos, dias=730, fecha_fin=None,
+            formato='csv', tamano_lote=1_000_000, semilla=42):
+    fecha_fin = pd.Timestamp(datetime.now() if fecha_fin is None else fecha_fin)
+    fecha_inicio = np.datetime64(fecha_fin - pd.Timedelta(days=dias), 'ns')
+    productos = generar_productos(n_productos, semilla)
+    acumulado_dias = transacciones_por_dia(n_transacciones, dias, semilla)
+    anchos = {
+        'transaction_id': ancho_ids(n_transacciones, 5),
+        'customer_id': ancho_ids(n_clientes, 4),
+        'product_id': ancho_ids(n_productos, 3)
+    }
+
+    escritor = None
+    if formato == 'columnas':
+        ruta = ruta_columnar(ruta)
+        escritor = EscritorColumnas(ruta, n_transacciones,
+                                    columnas_salida(n_transacciones, n_clientes, n_productos, anchos))
+    else:
+        archivo = open(ruta, 'w', newline='')
+
+    primero = None
+    for numero_lote, inicio in enumerate(range(0, n_transacciones, tamano_lote)):
+        fin = min(inicio + tamano_lote, n_transacciones)
+        lote = generar_lote(inicio, fin, numero_lote, productos, acumulado_dias, n_clientes,
+                            fecha_inicio, semilla)
+        if escritor is not None:
+            lote['transaction_id'] = formatear_ids('TRX_', lote['transaction_id'], anchos['transaction_id'])
+            escritor.escribir(lote)
+        else:
+            df = lote_como_dataframe(lote, anchos)
+            df.to_csv(archivo, header=numero_lote == 0, index=False)
+            if primero is None:
+                primero = df.head().copy()
+            del df
+        del lote
+
+    if escritor is not None:
+        escritor.cerrar()
+    else:
+        archivo.close()
+    return ruta, primero
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar transacciones sintéticas para el análisis RFM')
+    parser.add_argument('--transacciones', type=int, default=10_000)
+    parser.add_argument('--clientes', type=int, default=1_000)
+    parser.add_argument('--productos', type=int, default=50)
+    parser.add_argument('--dias', type=int, default=730, help='días cubiertos hasta la fecha final')
+    parser.add_argument('--fecha-fin', default=None,
+                        help='fecha de la última transacción (por defecto, ahora; fijarla para '
+                             'reproducir un archivo exactamente)')
+    parser.add_argument('--formato', choices=['csv', 'columnas'], default='csv')
+    parser.add_argument('--salida', default='transacciones_rfm.csv')
+    parser.add_argument('--tamano-lote', type=int, default=1_000_000)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    ruta, primero = generar(args.salida, args.transacciones, args.clientes, args.productos,
+                            args.dias, args.fecha_fin, args.formato, args.tamano_lote, args.semilla)
+    print(f"{args.transacciones:,} transacciones -> {ruta}")
+    if primero is not None:
+        # Mostrar las primeras filas
+        print(primero)
 
-# Crear el dataset con selección ponderada de productos
-data = {
-    'transaction_id': [f'TRX_{str(i).zfill(5)}' for i in range(n_transactions)],
-    'customer_id': random.choices(customer_ids, k=n_transactions),
-    'transaction_date': dates,
-    'product_id': random.choices(product_ids, weights=weights, k=n_transactions),
-    'quantity': np.random.randint(1, 10, size=n_transactions)
-}
-
-# Convertir a DataFrame
-df = pd.DataFrame(data)
-
-# Agregar precio, costo y categoría
-df['unit_price'] = df['product_id'].map(lambda x: products[x]['precio'])
-df['unit_cost'] = df['product_id'].map(lambda x: products[x]['costo'])
-df['category'] = df['product_id'].map(lambda x: products[x]['categoria'])
-df['total_amount'] = df['quantity'] * df['unit_price']
-df['total_cost'] = df['quantity'] * df['unit_cost']
-df['margin'] = df['total_amount'] - df['total_cost']
-
-# Ordenar por fecha
-df = df.sort_values('transaction_date')
-
-# Guardar a CSV
-df.to_csv('transacciones_rfm.csv', index=False)
-
-# Mostrar las primeras filas
-print(df.head()) 
\ No newline at end of file
+if __name__ == '__main__':
+    main()
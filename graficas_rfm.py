@@ -0,0 +1,101 @@
+import matplotlib
+matplotlib.use('Agg')  # Sin pantalla: las gráficas solo se guardan a archivo
+import matplotlib.pyplot as plt
+import seaborn as sns
+import numpy as np
+
+# Gráficas del análisis RFM (barras y radar por segmento).
+#
+# Separadas de analisis_rfm.py para que el cálculo no importe matplotlib ni
+# seaborn. Cada gráfica se dibuja a partir del resumen por segmento (unas pocas
+# filas), así que analisis_rfm.py las dibuja en procesos aparte (que son los
+# únicos que importan este módulo) mientras guarda los resultados.
+
+# Gráficas de barras de recency, frequency y monetary promedio por segmento
+def graficar_barras(segmento_stats, ruta='analisis_rfm.png'):
+    # Modificar la configuración del estilo
+    plt.style.use('default')  # Usar estilo default de matplotlib
+    sns.set_theme()  # Aplicar tema de seaborn
+    sns.set_palette("husl")
+
+    # Crear figura con tres subplots
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(20, 6))
+
+    # Preparar datos para gráficas
+    plot_data = segmento_stats.reset_index()
+
+    # Gráfica de Recency
+    sns.barplot(x='Segmento', y='recency', data=plot_data, ax=ax1)
+    ax1.set_title('Días desde última compra por Segmento')
+    ax1.set_xlabel('Segmento')
+    ax1.set_ylabel('Días (promedio)')
+    ax1.tick_params(axis='x', rotation=45)
+
+    # Gráfica de Frequency
+    sns.barplot(x='Segmento', y='frequency', data=plot_data, ax=ax2)
+    ax2.set_title('Frecuencia de compras por Segmento')
+    ax2.set_xlabel('Segmento')
+    ax2.set_ylabel('Número de compras (promedio)')
+    ax2.tick_params(axis='x', rotation=45)
+
+    # Gráfica de Monetary
+    sns.barplot(x='Segmento', y='monetary', data=plot_data, ax=ax3)
+    ax3.set_title('Valor monetario por Segmento')
+    ax3.set_xlabel('Segmento')
+    ax3.set_ylabel('Monto total (promedio)')
+    ax3.tick_params(axis='x', rotation=45)
+
+    # Ajustar layout
+    plt.tight_layout()
+
+    # Guardar gráfica
+    plt.savefig(ruta)
+    plt.close(fig)
+    return ruta
+
+# Gráfica de radar (spider plot) con los promedios normalizados por segmento
+def graficar_radar(segmento_stats, ruta='radar_rfm.png'):
+    plt.style.use('default')
+    sns.set_theme()
+    sns.set_palette("husl")
+
+    # Normalizar datos para el gráfico de radar
+    normalized_stats = segmento_stats.copy()
+    for column in ['recency', 'frequency', 'monetary']:
+        normalized_stats[column] = (segmento_stats[column] - segmento_stats[column].min()) / \
+                                  (segmento_stats[column].max() - segmento_stats[column].min())
+        if column == 'recency':  # Invertir recency ya que menor es mejor
+            normalized_stats[column] = 1 - normalized_stats[column]
+
+    # Crear gráfica de radar
+    categories = ['Recency', 'Frequency', 'Monetary']
+    fig = plt.figure(figsize=(10, 10))
+    ax = fig.add_subplot(111, projection='polar')
+
+    angles = np.linspace(0, 2*np.pi, len(categories), endpoint=False)
+    angles = np.concatenate((angles, [angles[0]]))  # Cerrar el polígono
+
+    for segmento in normalized_stats.index:
+        values = normalized_stats.loc[segmento].values
+        values = np.concatenate((values, [values[0]]))
+        ax.plot(angles, values, linewidth=2, label=segmento)
+        ax.fill(angles, values, alpha=0.25)
+
+    ax.set_xticks(angles[:-1])
+    ax.set_xticklabels(categories)
+    ax.set_title('Comparación RFM por Segmento')
+    plt.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1))
+
+    plt.tight_layout()
+    plt.savefig(ruta)
+    plt.close(fig)
+    return ruta
+
+GRAFICAS = {
+    'barras': graficar_barras,
+    'radar': graficar_radar
+}
+
+# Generar las gráficas de barras y de radar por segmento
+def graficar_segmentos(segmento_stats):
+    return [graficar(segmento_stats) for graficar in GRAFICAS.values()]
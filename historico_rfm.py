@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento_rfm import _reemplazar_directorio, leer_transacciones, valores_float64
+from analisis_rfm import (COLUMNAS_TRANSACCIONES, NOMBRES_SEGMENTOS, TABLA_SEGMENTOS,
+                          calcular_recencia, memoria_pico_mb, puntuar_quintiles)
+from rutas_datos import RUTA_TRANSACCIONES, version_tabla
+
+# Instantáneas históricas de RFM y migración entre segmentos.
+#
+# Los scores se calculan en muchas fechas de corte con una sola pasada por las
+# transacciones ordenadas por fecha: entre un corte y el siguiente solo se
+# agregan las transacciones de ese tramo a los acumulados por cliente (compras,
+# monto, última compra), y en cada corte se puntúan los clientes con compras
+# hasta ese día igual que analisis_rfm.py con esa fecha de análisis. El costo
+# es O(transacciones + cortes x clientes), en lugar de repetir el análisis
+# completo por cada fecha.
+#
+# Las instantáneas se guardan en RUTA_HISTORICO como matrices (corte x cliente)
+# de int8: R, F, M y código de segmento (-1 = el cliente aún no había comprado).
+# Las matrices de transición entre dos cortes salen de esas matrices, sin
+# volver a las transacciones.
+#
+# Uso: python historico_rfm.py [--frecuencia M] [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+
+RUTA_HISTORICO = os.environ.get('RFM_HISTORICO', 'historico_rfm')
+MATRICES = ['R', 'F', 'M', 'segmento']
+SIN_SEGMENTO = -1
+NUEVOS = 'Nuevos'
+
+# Últimos días de cada periodo (por defecto, cada mes) con datos
+def fechas_corte(fecha_min, fecha_max, frecuencia='M'):
+    fecha_min, fecha_max = pd.Timestamp(fecha_min).normalize(), pd.Timestamp(fecha_max).normalize()
+    cortes = pd.period_range(fecha_min, fecha_max, freq=frecuencia).end_time.normalize()
+    # El último periodo puede estar incompleto: su corte es la última fecha con datos
+    return cortes.where(cortes <= fecha_max, fecha_max).unique()
+
+# Quintiles de los clientes activos en un corte; al principio de la historia
+# (pocos clientes o métricas repetidas) qcut puede no tener 5 bordes distintos
+# y se usan los bordes únicos
+def _puntuar(activos):
+    try:
+        return puntuar_quintiles(activos)
+    except ValueError:
+        cortes = {}
+        for metrica in ('recency', 'frequency', 'monetary'):
+            bordes = np.unique(np.quantile(activos[metrica], np.linspace(0, 1, 6)))
+            cortes[metrica] = bordes if len(bordes) > 1 else np.array([bordes[0], bordes[0] + 1])
+        return puntuar_quintiles(activos, cortes)
+
+# Scores y segmentos de cada cliente en cada fecha de corte (inclusive). Devuelve
+# las matrices int8 (corte x cliente) de MATRICES con los clientes y los cortes
+def calcular_historico(transacciones, cortes, tabla=TABLA_SEGMENTOS):
+    codigos, clientes = pd.factorize(transacciones['customer_id'], sort=True)
+    fechas = transacciones['transaction_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    orden = np.argsort(fechas, kind='stable')
+    fechas, codigos = fechas[orden], codigos[orden]
+    montos = valores_float64(transacciones, 'total_amount')[orden]
+    del orden
+
+    n_clientes = len(clientes)
+    cortes = pd.DatetimeIndex(cortes)
+    # Cada corte incluye todo su día: las transacciones anteriores a la
+    # medianoche siguiente, que es también la referencia de la recencia
+    limites_corte = (cortes.normalize() + pd.Timedelta(days=1)).asi8
+    fin_tramo = np.searchsorted(fechas, limites_corte, side='left')
+
+    frecuencia = np.zeros(n_clientes, dtype=np.int64)
+    monetario = np.zeros(n_clientes, dtype=np.float64)
+    ultima_compra = np.full(n_clientes, np.iinfo(np.int64).min)
+    matrices = {nombre: np.zeros((len(cortes), n_clientes), dtype=np.int8) for nombre in MATRICES}
+    matrices['segmento'][:] = SIN_SEGMENTO
+
+    inicio = 0
+    for k, fin in enumerate(fin_tramo):
+        tramo = codigos[inicio:fin]
+        frecuencia += np.bincount(tramo, minlength=n_clientes)
+        monetario += np.bincount(tramo, weights=montos[inicio:fin], minlength=n_clientes)
+        # Las fechas del tramo están ordenadas: la última aparición de cada cliente es su última compra
+        ultimos, posicion = np.unique(tramo[::-1], return_index=True)
+        ultima_compra[ultimos] = fechas[inicio:fin][::-1][posicion]
+        inicio = fin
+
+        activos = np.flatnonzero(frecuencia)
+        if len(activos) == 0:
+            continue
+        rfm = _puntuar(pd.DataFrame({
+            'recency': calcular_recencia(ultima_compra[activos], limites_corte[k]),
+            'frequency': frecuencia[activos],
+            'monetary': monetario[activos]
+        }))
+        for eje in 'RFM':
+            matrices[eje][k, activos] = rfm[eje].to_numpy()
+        matrices['segmento'][k, activos] = tabla[rfm['R'] - 1, rfm['F'] - 1, rfm['M'] - 1]
+
+    return {
+        'cortes': cortes,
+        'clientes': pd.Index(clientes.astype(str), name='customer_id'),
+        'segmentos': list(NOMBRES_SEGMENTOS),
+        **matrices
+    }
+
+def guardar_historico(historico, ruta=RUTA_HISTORICO, version=None):
+    temporal = f'{ruta}.tmp-{os.getpid()}'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    for nombre in MATRICES:
+        np.save(os.path.join(temporal, f'{nombre}.npy'), historico[nombre])
+    np.save(os.path.join(temporal, 'clientes.npy'), historico['clientes'].to_numpy(dtype=str))
+    with open(os.path.join(temporal, 'historico.json'), 'w') as f:
+        json.dump({
+            'cortes': [corte.strftime('%Y-%m-%d') for corte in historico['cortes']],
+            'segmentos': historico['segmentos'],
+            'version_transacciones': version
+        }, f, indent=2)
+    _reemplazar_directorio(temporal, ruta)
+
+# Instantáneas guardadas (las matrices mapeadas en memoria); None si no existen
+# o, con `version`, si se calcularon con otras transacciones
+def cargar_historico(ruta=RUTA_HISTORICO, version=None):
+    try:
+        with open(os.path.join(ruta, 'historico.json')) as f:
+            descripcion = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if version is not None and descripcion['version_transacciones'] != version:
+        return None
+    historico = {nombre: np.load(os.path.join(ruta, f'{nombre}.npy'), mmap_mode='r') for nombre in MATRICES}
+    historico.update({
+        'cortes': pd.DatetimeIndex(descripcion['cortes']),
+        'clientes': pd.Index(np.load(os.path.join(ruta, 'clientes.npy')).astype(object), name='customer_id'),
+        'segmentos': descripcion['segmentos']
+    })
+    return historico
+
+# Clientes por segmento en cada corte (corte x segmento)
+def tamanos_segmentos(historico):
+    segmentos = historico['segmentos']
+    conteo = np.stack([np.bincount(fila[fila >= 0], minlength=len(segmentos)) for fila in historico['segmento']])
+    return pd.DataFrame(conteo, index=historico['cortes'].rename('corte'), columns=segmentos)
+
+# Clientes que pasan de cada segmento en el corte `desde` a cada segmento en el
+# corte `hasta` (posiciones en historico['cortes']); la fila NUEVOS son los que
+# aún no habían comprado en `desde`
+def matriz_transicion(historico, desde, hasta):
+    segmentos = historico['segmentos']
+    n = len(segmentos) + 1
+    origen = historico['segmento'][desde].astype(np.int64) + 1
+    destino = historico['segmento'][hasta].astype(np.int64) + 1
+    # Con compras en `hasta` (en `desde` también las tenía o es nuevo)
+    activos = destino > 0
+    conteo = np.bincount(origen[activos] * n + destino[activos], minlength=n * n).reshape(n, n)
+    return pd.DataFrame(conteo[:, 1:], index=pd.Index([NUEVOS] + segmentos, name='desde'),
+                        columns=pd.Index(segmentos, name='hasta'))
+
+def main():
+    parser = argparse.ArgumentParser(description='Instantáneas históricas de RFM por fecha de corte')
+    parser.add_argument('--transacciones', default=RUTA_TRANSACCIONES)
+    parser.add_argument('--salida', default=RUTA_HISTORICO)
+    parser.add_argument('--frecuencia', default='M', help='periodo entre cortes (M = mensual, W = semanal, Q...)')
+    parser.add_argument('--desde', default=None, help='primer corte (por defecto, la primera compra)')
+    parser.add_argument('--hasta', default=None, help='último corte (por defecto, la última compra)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    version = version_tabla(args.transacciones)
+    transacciones = leer_transacciones(COLUMNAS_TRANSACCIONES, ruta=args.transacciones)
+    fechas = transacciones['transaction_date']
+    cortes = fechas_corte(args.desde or fechas.min(), args.hasta or fechas.max(), args.frecuencia)
+    historico = calcular_historico(transacciones, cortes)
+    del transacciones
+    guardar_historico(historico, args.salida, version)
+
+    print(f"{len(cortes)} cortes x {len(historico['clientes']):,} clientes en {args.salida} "
+          f"({sum(historico[nombre].nbytes for nombre in MATRICES) / 2**20:,.1f} MB) "
+          f"en {time.perf_counter() - inicio:.2f} s")
+    print("\nClientes por segmento en los últimos cortes:")
+    print(tamanos_segmentos(historico).tail().to_string())
+    if len(cortes) > 1:
+        print(f"\nTransiciones {cortes[-2].date()} -> {cortes[-1].date()}:")
+        print(matriz_transicion(historico, len(cortes) - 2, len(cortes) - 1).to_string())
+    print(f"\nMemoria pico: {memoria_pico_mb():,.1f} MB")
+
+if __name__ == '__main__':
+    main()
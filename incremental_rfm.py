@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import io
+import os
+import pickle
+
+import pandas as pd
+
+from almacenamiento_rfm import guardar_resultados
+from analisis_rfm import (COLUMNAS_ACUMULADAS, COLUMNAS_RESULTADOS, acumular_clientes,
+                          agregar_clientes, calcular_recencia, puntuar_rfm,
+                          resumir_segmentos)
+
+# Actualización incremental de resultados_rfm.csv a partir del log de
+# transacciones (solo se agregan filas al final de transacciones_rfm.csv).
+#
+# El estado persistido guarda por cliente la primera y última compra, número de
+# compras, monto y margen acumulados, más los scores de la última puntuación y
+# el byte del log hasta donde ya se procesó. Cada ejecución lee solo las filas
+# nuevas, las agrega y las fusiona con el estado en O(lote). Para detectar un
+# log reemplazado (aunque sea del mismo tamaño o más largo) se guardan también
+# el inodo del archivo y un hash de sus primeros bytes.
+#
+# Si no hay transacciones nuevas ni cambia la fecha de análisis no se reescribe
+# resultados_rfm.csv: su fecha de modificación es la versión de los datos del
+# dashboard, que recargaría todo sin necesidad.
+#
+# Uso: python incremental_rfm.py [--fecha-analisis AAAA-MM-DD]
+
+RUTA_ESTADO = 'estado_rfm.pkl'
+
+# Bytes del principio del log que identifican su contenido
+LONGITUD_FIRMA = 1 << 16
+
+def estado_vacio():
+    return {
+        'clientes': None,
+        'offset': 0,
+        'tamano_log': 0,
+        'inodo_log': None,
+        'firma_log': None,
+        'fecha_analisis': None
+    }
+
+# (longitud, hash) de los primeros bytes ya procesados del log
+def firma_log(ruta, longitud):
+    with open(ruta, 'rb') as f:
+        return longitud, hashlib.sha256(f.read(longitud)).hexdigest()
+
+# El log es otro archivo o su contenido ya procesado cambió (los estados
+# anteriores sin inodo ni firma solo se comparan por tamaño)
+def log_reemplazado(ruta, estado):
+    if os.path.getsize(ruta) < estado['tamano_log']:
+        return True
+    if estado.get('inodo_log') is not None and os.stat(ruta).st_ino != estado['inodo_log']:
+        return True
+    firma = estado.get('firma_log')
+    return firma is not None and firma_log(ruta, firma[0]) != firma
+
+def cargar_estado(ruta=RUTA_ESTADO):
+    if not os.path.exists(ruta):
+        return estado_vacio()
+    with open(ruta, 'rb') as f:
+        return pickle.load(f)
+
+def guardar_estado(estado, ruta=RUTA_ESTADO):
+    # Escribir a un archivo temporal y renombrar para no dejar un estado a medias
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as f:
+        pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, ruta)
+
+# Leer las transacciones agregadas al log desde el byte `desde`
+def leer_nuevas_transacciones(ruta, desde=0):
+    with open(ruta, 'rb') as f:
+        columnas = f.readline().decode().strip().split(',')
+        desde = max(desde, f.tell())
+        f.seek(desde)
+        datos = f.read()
+
+    # Ignorar una última línea incompleta (el log se puede estar escribiendo)
+    fin = datos.rfind(b'\n') + 1
+    if fin == 0:
+        return pd.DataFrame(columns=columnas), desde
+
+    lote = pd.read_csv(io.BytesIO(datos[:fin]), header=None, names=columnas)
+    lote['transaction_date'] = pd.to_datetime(lote['transaction_date'])
+    return lote, desde + fin
+
+# Devuelve los resultados actualizados o None si no hay nada que guardar
+def actualizar(ruta_transacciones='transacciones_rfm.csv', ruta_estado=RUTA_ESTADO,
+               fecha_analisis=None):
+    estado = cargar_estado(ruta_estado)
+
+    # Si el log se truncó o reemplazó, reconstruir el estado desde cero
+    if log_reemplazado(ruta_transacciones, estado):
+        print("El log de transacciones no es el procesado; se reconstruye el estado")
+        estado = estado_vacio()
+    tamano_log = os.path.getsize(ruta_transacciones)
+
+    lote, offset = leer_nuevas_transacciones(ruta_transacciones, estado['offset'])
+    print(f"Transacciones nuevas: {len(lote):,}")
+
+    clientes = estado['clientes']
+    columnas_acumuladas = None if clientes is None else clientes[COLUMNAS_ACUMULADAS]
+    if len(lote) > 0:
+        columnas_acumuladas = acumular_clientes(columnas_acumuladas, agregar_clientes(lote))
+    if columnas_acumuladas is None:
+        print("No hay transacciones para analizar")
+        return None
+
+    if fecha_analisis is None:
+        fecha_analisis = columnas_acumuladas['last_purchase'].max()
+    fecha_analisis = pd.Timestamp(fecha_analisis)
+
+    if len(lote) > 0:
+        # Cambiaron los acumulados: recalcular quintiles y segmentos (O(clientes),
+        # sin volver a leer transacciones)
+        rfm = columnas_acumuladas.copy()
+        rfm.insert(0, 'recency', calcular_recencia(rfm['last_purchase'], fecha_analisis))
+        rfm = puntuar_rfm(rfm)
+    elif fecha_analisis != estado['fecha_analisis']:
+        # Solo avanzó la fecha de análisis: la recencia de todos se desplaza en la
+        # misma cantidad, así que los quintiles y scores no cambian
+        rfm = clientes
+        rfm['recency'] = calcular_recencia(rfm['last_purchase'], fecha_analisis)
+    else:
+        # Nada que guardar: los resultados en disco ya son estos
+        print("Sin cambios desde la última actualización")
+        return None
+
+    estado.update({
+        'clientes': rfm,
+        'offset': offset,
+        'tamano_log': tamano_log,
+        'inodo_log': os.stat(ruta_transacciones).st_ino,
+        'firma_log': firma_log(ruta_transacciones, min(offset, LONGITUD_FIRMA)),
+        'fecha_analisis': fecha_analisis
+    })
+    guardar_estado(estado, ruta_estado)
+    return rfm
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Actualización incremental de resultados RFM')
+    parser.add_argument('--transacciones', default='transacciones_rfm.csv')
+    parser.add_argument('--estado', default=RUTA_ESTADO)
+    parser.add_argument('--resultados', default='resultados_rfm.csv')
+    parser.add_argument('--fecha-analisis', default=None,
+                        help='fecha de análisis (por defecto, la última compra registrada)')
+    args = parser.parse_args()
+
+    rfm = actualizar(args.transacciones, args.estado, args.fecha_analisis)
+    if rfm is not None:
+        resumir_segmentos(rfm)
+        guardar_resultados(rfm[COLUMNAS_RESULTADOS], args.resultados)
+
+if __name__ == '__main__':
+    main()
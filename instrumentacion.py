@@ -0,0 +1,202 @@
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentación del dashboard: histogramas de latencia y tamaño en formato de
+# texto de Prometheus y un perfilador por muestreo que se activa en caliente.
+#
+# Se mide el tiempo y el tamaño de respuesta de cada callback de Dash (por
+# nombre de la función del callback), la carga de cada versión de los datos y
+# cada agregado que se recalcula (derivados de una instantánea y consultas por
+# rango que no estaban en caché). Las métricas son del proceso: con varios
+# workers de gunicorn cada uno expone las suyas en /metrics.
+#
+# El perfilador toma cada `intervalo` segundos la pila de todos los hilos del
+# proceso (sys._current_frames) y acumula cuántas veces se vio cada pila, en el
+# formato "plegado" (marco;marco;marco conteo) que leen flamegraph.pl y
+# speedscope. Sus rutas solo se registran con RFM_PERFILADOR=1.
+
+LIMITES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LIMITES_BYTES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+PERFILADOR_HABILITADO = os.environ.get('RFM_PERFILADOR') == '1'
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+_metricas = []
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas, limites):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.limites = limites
+        # Por combinación de etiquetas: observaciones por intervalo (el último
+        # es +Inf) y suma de los valores
+        self._series = {}
+        self._bloqueo = threading.Lock()
+        _metricas.append(self)
+
+    def observar(self, valor, *valores_etiquetas):
+        intervalo = bisect.bisect_left(self.limites, valor)
+        with self._bloqueo:
+            serie = self._series.get(valores_etiquetas)
+            if serie is None:
+                serie = self._series[valores_etiquetas] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][intervalo] += 1
+            serie[1] += valor
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._bloqueo:
+            series = [(valores, list(conteos), suma) for valores, (conteos, suma) in self._series.items()]
+        for valores, conteos, suma in sorted(series):
+            etiquetas = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.etiquetas, valores))
+            separador = ',' if etiquetas else ''
+            acumulado = 0
+            for limite, conteo in zip((*self.limites, '+Inf'), conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{etiquetas}{separador}le="{limite}"}} {acumulado}')
+            sufijo = f'{{{etiquetas}}}' if etiquetas else ''
+            lineas.append(f'{self.nombre}_sum{sufijo} {suma!r}')
+            lineas.append(f'{self.nombre}_count{sufijo} {acumulado}')
+        return lineas
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+DURACION_CALLBACKS = Histograma(
+    'rfm_callback_duracion_segundos', 'Tiempo de respuesta de cada callback de Dash',
+    ('callback',), LIMITES_SEGUNDOS)
+TAMANO_CALLBACKS = Histograma(
+    'rfm_callback_respuesta_bytes', 'Tamaño de la respuesta de cada callback de Dash',
+    ('callback',), LIMITES_BYTES)
+DURACION_CARGA = Histograma(
+    'rfm_carga_datos_duracion_segundos', 'Tiempo de carga de una versión de los datos por etapa',
+    ('etapa',), LIMITES_SEGUNDOS)
+DURACION_AGREGADOS = Histograma(
+    'rfm_agregado_duracion_segundos', 'Tiempo de cálculo de cada agregado no cacheado',
+    ('agregado',), LIMITES_SEGUNDOS)
+
+# Texto de todas las métricas para /metrics
+def exponer_metricas():
+    lineas = []
+    for metrica in _metricas:
+        lineas.extend(metrica.exponer())
+    return '\n'.join(lineas) + '\n'
+
+@contextmanager
+def cronometrar(histograma, *valores_etiquetas):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, *valores_etiquetas)
+
+# Decorador: registrar la duración de cada llamada (debajo de lru_cache solo
+# mide los cálculos, no los aciertos de caché)
+def medido(histograma, *valores_etiquetas):
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with cronometrar(histograma, *valores_etiquetas):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+# Medir los callbacks de una app Dash desde el servidor Flask: duración de la
+# petición a _dash-update-component (incluida la serialización) y tamaño de la
+# respuesta, por nombre de la función del callback
+def instrumentar_callbacks(app):
+    from flask import g, request
+
+    def nombre_callback(salida):
+        callback = app.callback_map.get(salida, {}).get('callback')
+        return getattr(callback, '__name__', salida)
+
+    @app.server.before_request
+    def iniciar_medicion():
+        if request.path.endswith('/_dash-update-component'):
+            g.inicio_callback = time.perf_counter()
+
+    @app.server.after_request
+    def registrar_medicion(respuesta):
+        inicio = g.pop('inicio_callback', None)
+        if inicio is not None:
+            cuerpo = request.get_json(silent=True) or {}
+            callback = nombre_callback(cuerpo.get('output', ''))
+            DURACION_CALLBACKS.observar(time.perf_counter() - inicio, callback)
+            tamano = respuesta.calculate_content_length()
+            if tamano is not None:
+                TAMANO_CALLBACKS.observar(tamano, callback)
+        return respuesta
+
+class PerfiladorMuestreo:
+    def __init__(self):
+        self._pilas = collections.Counter()
+        self._bloqueo = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.muestras = 0
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    # Empezar a muestrear (y parar solo al cabo de `duracion` segundos, para no
+    # dejarlo encendido por olvido); las pilas anteriores se descartan
+    def iniciar(self, intervalo=0.005, duracion=60):
+        if self.activo:
+            return False
+        with self._bloqueo:
+            self._pilas.clear()
+            self.muestras = 0
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._muestrear, args=(intervalo, duracion),
+                                      name='perfilador', daemon=True)
+        self._hilo.start()
+        return True
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def _muestrear(self, intervalo, duracion):
+        propio = threading.get_ident()
+        fin = time.monotonic() + duracion
+        while not self._detener.wait(intervalo) and time.monotonic() < fin:
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            pilas = []
+            for ident, marco in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                marcos = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    marcos.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)})')
+                    marco = marco.f_back
+                marcos.append(nombres.get(ident, str(ident)))
+                pilas.append(';'.join(reversed(marcos)))
+            with self._bloqueo:
+                self._pilas.update(pilas)
+                self.muestras += 1
+
+    # Pilas acumuladas en formato plegado, de la más vista a la menos vista
+    def pilas_plegadas(self):
+        with self._bloqueo:
+            return ''.join(f'{pila} {conteo}\n' for pila, conteo in self._pilas.most_common())
+
+perfilador = PerfiladorMuestreo()
+
+# Los hilos no sobreviven a fork: cada worker empieza con el perfilador apagado
+# (y con bloqueos nuevos, por si otro hilo tenía alguno tomado al hacer fork)
+def _reiniciar_tras_fork():
+    for metrica in _metricas:
+        metrica._bloqueo = threading.Lock()
+    perfilador.__init__()
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from almacenamiento_rfm import valores_float64
+
+# Métricas de productos compartidas por las pestañas de Productos y ABC/BCG.
+# Las transacciones se agrupan por producto una sola vez y el resumen de
+# productos, el análisis ABC y la matriz BCG se derivan de ese mismo frame. El
+# dashboard lo guarda como agregado de cada versión de datos (datos_dashboard)
+# y, para un rango de fechas, lo calcula desde los totales del cubo de ventas.
+#
+# El crecimiento de la matriz BCG compara los ingresos de cada producto en el
+# periodo actual (los últimos `dias_periodo` días) con el periodo anterior de
+# igual largo. Cada fila (transacción o celda del cubo) recibe un código de
+# periodo según cuántos periodos completos la separan del final, y los ingresos
+# por (periodo, producto) salen de un único bincount.
+
+# Largo por defecto (en días) de los periodos que compara el crecimiento BCG
+DIAS_PERIODO_CRECIMIENTO = 90
+
+# Agregar transacciones por producto (única pasada sobre las transacciones)
+def agregar_productos(df):
+    # Montos en float64 (las sumas de float32 pierden centavos)
+    df = df.assign(total_amount=valores_float64(df, 'total_amount'), margin=valores_float64(df, 'margin'))
+    return df.groupby('product_id', observed=True).agg(
+        quantity=('quantity', 'sum'),
+        total_amount=('total_amount', 'sum'),
+        margin=('margin', 'sum'),
+        num_ventas=('product_id', 'size')
+    )
+
+# Resumen para la pestaña de productos
+def resumen_productos(product_metrics):
+    product_analysis = product_metrics[['quantity', 'total_amount', 'num_ventas']].copy()
+    product_analysis['precio_promedio'] = product_analysis['total_amount'] / product_analysis['quantity']
+    return product_analysis
+
+# Agregar cálculos para análisis ABC
+def calculate_abc_analysis(product_metrics):
+    product_metrics = product_metrics[['total_amount', 'margin', 'quantity']].reset_index()
+
+    # Calcular porcentajes acumulados
+    product_metrics = product_metrics.sort_values('total_amount', ascending=False)
+    product_metrics['porcentaje_ventas'] = product_metrics['total_amount'] / product_metrics['total_amount'].sum() * 100
+    product_metrics['porcentaje_acumulado'] = product_metrics['porcentaje_ventas'].cumsum()
+
+    # Asignar clasificación ABC
+    product_metrics['clasificacion_abc'] = np.select(
+        [product_metrics['porcentaje_acumulado'] <= 80, product_metrics['porcentaje_acumulado'] <= 95],
+        ['A', 'B'],
+        default='C'
+    )
+
+    return product_metrics
+
+# Ingresos por (periodo, código) en `n_periodos` periodos consecutivos de
+# `dias_periodo` días que terminan en `ultimo_dia` (fila 0 = periodo actual),
+# sin los días anteriores a `primer_dia` si se indica. `dias` son días enteros
+# (datetime64[D] como int64)
+def ingresos_por_periodo(dias, codigos, montos, n_codigos, ultimo_dia, dias_periodo,
+                         n_periodos=2, primer_dia=None):
+    periodo = (ultimo_dia - dias) // dias_periodo
+    en_rango = (periodo >= 0) & (periodo < n_periodos)
+    if primer_dia is not None:
+        en_rango &= dias >= primer_dia
+    posicion = periodo[en_rango] * n_codigos + codigos[en_rango]
+    return np.bincount(posicion, weights=montos[en_rango],
+                       minlength=n_periodos * n_codigos).reshape(n_periodos, n_codigos)
+
+# Tasa de crecimiento (%) del periodo actual respecto del anterior; NaN para
+# productos nuevos (sin ingresos en el anterior) y 0 si no vendieron en ninguno
+def tasa_crecimiento(ingresos, etiquetas):
+    actual, anterior = ingresos[0], ingresos[1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crecimiento = np.where(anterior > 0, (actual / anterior - 1) * 100,
+                               np.where(actual > 0, np.nan, 0.0))
+    return pd.Series(crecimiento, index=etiquetas, name='growth_rate')
+
+# Crecimiento por producto a partir de las transacciones
+def crecimiento_productos(df, dias_periodo=DIAS_PERIODO_CRECIMIENTO):
+    codigos, productos = pd.factorize(df['product_id'])
+    dias = df['transaction_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    ingresos = ingresos_por_periodo(dias, codigos, valores_float64(df, 'total_amount'), len(productos),
+                                    dias.max(), dias_periodo)
+    return tasa_crecimiento(ingresos, productos)
+
+# Cálculos para matriz BCG (growth_rates: tasa de crecimiento indexada por producto)
+def calculate_bcg_analysis(product_metrics, growth_rates):
+    product_metrics = product_metrics[['total_amount', 'margin', 'quantity']].reset_index()
+
+    # Calcular participación de mercado relativa
+    total_market = product_metrics['total_amount'].sum()
+    product_metrics['market_share'] = product_metrics['total_amount'] / total_market
+
+    # Crecimiento real del periodo actual contra el anterior
+    product_metrics['growth_rate'] = growth_rates.reindex(product_metrics['product_id']).to_numpy()
+
+    # Ajustar umbrales para clasificación (un producto nuevo, sin ventas en el
+    # periodo anterior, cuenta como de alto crecimiento)
+    participacion_alta = product_metrics['market_share'] >= 0.03
+    crecimiento = product_metrics['growth_rate']
+    crecimiento_alto = (crecimiento >= 20) | crecimiento.isna()
+    product_metrics['bcg_category'] = np.select(
+        [participacion_alta & crecimiento_alto,
+         participacion_alta & (crecimiento < 10),
+         ~participacion_alta & crecimiento_alto],
+        ['Estrella', 'Vaca', 'Interrogante'],
+        default='Perro'
+    )
+
+    return product_metrics
+
+# Tabla combinada ABC/BCG (en el orden del análisis ABC)
+def combinar_abc_bcg(abc, bcg):
+    return pd.merge(abc, bcg, on='product_id', suffixes=('_abc', ''))
+
+def calcular_metricas_productos(df, dias_periodo=DIAS_PERIODO_CRECIMIENTO):
+    return metricas_desde_agregado(agregar_productos(df), crecimiento_productos(df, dias_periodo))
+
+# Métricas a partir de totales y crecimiento por producto ya calculados (p. ej.
+# los de un rango de fechas del cubo de ventas)
+def metricas_desde_agregado(product_metrics, growth_rates):
+    abc = calculate_abc_analysis(product_metrics)
+    bcg = calculate_bcg_analysis(product_metrics, growth_rates)
+    return {
+        'productos': product_metrics,
+        'resumen': resumen_productos(product_metrics),
+        'abc': abc,
+        'bcg': bcg,
+        'abc_bcg': combinar_abc_bcg(abc, bcg)
+    }
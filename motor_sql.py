@@ -0,0 +1,480 @@
+import argparse
+import fcntl
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from rutas_datos import RUTA_TRANSACCIONES, version_tabla
+
+# Agregaciones sobre una base SQL embebida, sin servidor.
+#
+# Con RFM_MOTOR_SQL=sqlite (sqlite3 de la biblioteca estándar) o
+# RFM_MOTOR_SQL=duckdb (si el paquete duckdb está instalado) las transacciones
+# se cargan por lotes en un archivo local (RFM_BASE_SQL, por defecto
+# transacciones_rfm.sqlite / .duckdb) con índices por cliente, producto y día, y
+# el resumen de productos, el análisis ABC, la matriz BCG, los totales por
+# categoría y segmento, el historial de un cliente y la agregación RFM por
+# cliente se resuelven en SQL. A Python solo llegan los resultados (una fila
+# por producto, categoría, segmento o cliente), así que el dashboard puede
+# consultar transacciones que no caben en la memoria del worker.
+#
+# La base se construye en un archivo temporal que luego reemplaza al anterior y
+# guarda la versión de las transacciones con que se cargó: nunca se modifica
+# en el lugar, así que cualquier cantidad de procesos la lee a la vez. Los
+# segmentos de los clientes (que cambian con resultados_rfm.csv, no con las
+# transacciones) van en una base aparte, más chica, que se adjunta a la
+# consulta de ventas por segmento.
+#
+# En SQLite los índices de cliente y de producto incluyen las columnas que
+# suman sus agregaciones: la agregación RFM y la de productos recorren solo el
+# índice, ya ordenado por el grupo, sin ordenar las transacciones. DuckDB
+# agrega por hash sobre sus columnas y solo usa índices simples.
+#
+# Este módulo solo importa la biblioteca estándar al cargarse (pandas, numpy y
+# duckdb se importan al consultar), así datos_dashboard puede leer la
+# configuración sin importar pandas.
+#
+# Uso: python motor_sql.py [--motor sqlite|duckdb] [--base ruta] [--transacciones ruta]
+
+MOTOR_SQL = os.environ.get('RFM_MOTOR_SQL', '')
+EXTENSIONES_BASE = {'sqlite': 'sqlite', 'duckdb': 'duckdb'}
+
+def ruta_base(motor=MOTOR_SQL):
+    return os.environ.get('RFM_BASE_SQL', f"transacciones_rfm.{EXTENSIONES_BASE.get(motor, 'sqlite')}")
+
+RUTA_BASE_SQL = ruta_base()
+
+def ruta_segmentos(ruta=RUTA_BASE_SQL):
+    raiz, extension = os.path.splitext(ruta)
+    return f'{raiz}.segmentos{extension}'
+
+NS_POR_DIA = 86_400_000_000_000
+SIN_DATO = 'Sin dato'
+TAMANO_LOTE = 1_000_000
+
+# Columnas de la base; transaction_date en ns y dia en días desde 1970-01-01
+# (los filtros por rango de fechas comparan enteros). Los tipos se escriben de
+# forma que ambos motores los entiendan igual (en DuckDB INTEGER es de 32 bits
+# y REAL de precisión simple)
+ESQUEMA_TRANSACCIONES = '''
+CREATE TABLE transacciones (
+    transaction_date BIGINT NOT NULL,
+    dia BIGINT NOT NULL,
+    customer_id TEXT,
+    product_id TEXT,
+    category TEXT,
+    quantity BIGINT,
+    total_amount DOUBLE,
+    margin DOUBLE
+)
+'''
+COLUMNAS_BASE = ['transaction_date', 'dia', 'customer_id', 'product_id', 'category',
+                 'quantity', 'total_amount', 'margin']
+COLUMNAS_ORIGEN = ['transaction_date', 'customer_id', 'product_id', 'category',
+                   'quantity', 'total_amount', 'margin']
+
+INDICES = {
+    'sqlite': [
+        'CREATE INDEX transacciones_cliente ON transacciones '
+        '(customer_id, transaction_date, dia, total_amount, margin, quantity)',
+        'CREATE INDEX transacciones_producto ON transacciones '
+        '(product_id, dia, quantity, total_amount, margin)',
+        'CREATE INDEX transacciones_dia ON transacciones (dia)'
+    ],
+    'duckdb': [
+        'CREATE INDEX transacciones_cliente ON transacciones (customer_id)',
+        'CREATE INDEX transacciones_producto ON transacciones (product_id)',
+        'CREATE INDEX transacciones_dia ON transacciones (dia)'
+    ]
+}
+
+ESQUEMA_METADATOS = 'CREATE TABLE metadatos (clave TEXT PRIMARY KEY, valor TEXT)'
+ESQUEMA_SEGMENTOS = 'CREATE TABLE segmentos (customer_id TEXT PRIMARY KEY, Segmento TEXT)'
+
+def _modulo_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError('RFM_MOTOR_SQL=duckdb requiere el paquete duckdb (pip install duckdb)') from None
+    return duckdb
+
+def _validar_motor(motor):
+    if motor not in EXTENSIONES_BASE:
+        raise ValueError(f"Motor SQL desconocido: {motor!r} (use 'sqlite' o 'duckdb')")
+
+@contextmanager
+def _conectar(ruta, motor, escritura=False):
+    _validar_motor(motor)
+    if motor == 'duckdb':
+        conexion = _modulo_duckdb().connect(ruta, read_only=not escritura)
+    elif escritura:
+        conexion = sqlite3.connect(ruta, isolation_level=None)
+    else:
+        conexion = sqlite3.connect(f'file:{ruta}?mode=ro', uri=True, timeout=30)
+    try:
+        yield conexion
+    finally:
+        conexion.close()
+
+# Resultado de una consulta como DataFrame (`tipos`: dtype por columna)
+def _consultar(conexion, sql, parametros=(), tipos=None):
+    import pandas as pd
+
+    cursor = conexion.execute(sql, list(parametros))
+    resultado = pd.DataFrame(cursor.fetchall(), columns=[columna[0] for columna in cursor.description])
+    return resultado.astype(tipos) if tipos else resultado
+
+def _metadatos(ruta, motor):
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with _conectar(ruta, motor) as conexion:
+            return dict(conexion.execute('SELECT clave, valor FROM metadatos').fetchall())
+    except Exception:
+        # Base a medio escribir o de otro motor: se vuelve a construir
+        return None
+
+def _guardar_metadatos(conexion, metadatos):
+    conexion.executemany('INSERT INTO metadatos VALUES (?, ?)',
+                         [(clave, str(valor)) for clave, valor in metadatos.items()])
+
+# Columnas de un lote en el orden de COLUMNAS_BASE, con montos en float64 y
+# las columnas que falten como nulos
+def _preparar_lote(lote):
+    import numpy as np
+    import pandas as pd
+
+    from almacenamiento_rfm import valores_float64
+
+    fechas = lote['transaction_date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    columnas = {'transaction_date': fechas, 'dia': fechas // NS_POR_DIA}
+    for columna in ('customer_id', 'product_id', 'category'):
+        columnas[columna] = (lote[columna].astype(object).where(lote[columna].notna(), None).to_numpy()
+                             if columna in lote.columns else np.full(len(lote), None))
+    columnas['quantity'] = lote['quantity'].to_numpy(dtype=np.int64)
+    columnas['total_amount'] = valores_float64(lote, 'total_amount')
+    columnas['margin'] = (valores_float64(lote, 'margin') if 'margin' in lote.columns
+                          else np.full(len(lote), np.nan))
+    return pd.DataFrame(columnas, columns=COLUMNAS_BASE)
+
+def _insertar_lote(conexion, motor, lote):
+    if motor == 'duckdb':
+        conexion.register('lote', lote)
+        conexion.execute(f"INSERT INTO transacciones SELECT {', '.join(COLUMNAS_BASE)} FROM lote")
+        conexion.unregister('lote')
+    else:
+        # tolist() devuelve tipos de Python, que es lo que acepta sqlite3
+        conexion.executemany(f"INSERT INTO transacciones VALUES ({', '.join('?' * len(COLUMNAS_BASE))})",
+                             zip(*(lote[columna].tolist() for columna in COLUMNAS_BASE)))
+
+# Cargar las transacciones de `ruta_transacciones` (CSV o formato columnar, por
+# lotes de `tamano_lote` filas) en una base nueva que reemplaza a `ruta`
+def construir_base(ruta_transacciones=RUTA_TRANSACCIONES, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL,
+                   tamano_lote=TAMANO_LOTE):
+    from almacenamiento_rfm import iterar_tabla
+
+    _validar_motor(motor)
+    version = version_tabla(ruta_transacciones)
+    temporal = f'{ruta}.tmp-{os.getpid()}'
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    filas, dia_min, dia_max = 0, None, None
+    with _conectar(temporal, motor, escritura=True) as conexion:
+        if motor == 'sqlite':
+            # Archivo temporal que nadie más lee: sin diario ni fsync durante la carga
+            conexion.execute('PRAGMA journal_mode=OFF')
+            conexion.execute('PRAGMA synchronous=OFF')
+        conexion.execute('BEGIN')
+        conexion.execute(ESQUEMA_TRANSACCIONES)
+        conexion.execute(ESQUEMA_METADATOS)
+        for lote in iterar_tabla(ruta_transacciones, COLUMNAS_ORIGEN, tamano_lote):
+            lote = _preparar_lote(lote)
+            if len(lote) == 0:
+                continue
+            _insertar_lote(conexion, motor, lote)
+            filas += len(lote)
+            dia_min = min(dia_min, int(lote['dia'].min())) if dia_min is not None else int(lote['dia'].min())
+            dia_max = max(dia_max, int(lote['dia'].max())) if dia_max is not None else int(lote['dia'].max())
+        # Los índices se crean con los datos ya cargados (más rápido que mantenerlos al insertar)
+        for indice in INDICES[motor]:
+            conexion.execute(indice)
+        _guardar_metadatos(conexion, {'version_transacciones': version, 'filas': filas,
+                                      'dia_min': dia_min, 'dia_max': dia_max})
+        conexion.execute('COMMIT')
+        if motor == 'sqlite':
+            # Estadísticas para que el planificador elija entre índice y recorrido completo
+            conexion.execute('ANALYZE')
+    os.replace(temporal, ruta)
+    return filas
+
+# Construir la base si no existe o es de otra versión de las transacciones. Con
+# varios procesos (workers de gunicorn, trabajos de recálculo) solo uno la
+# construye: los demás esperan el bloqueo y encuentran la base al día
+def actualizar_base(ruta_transacciones=RUTA_TRANSACCIONES, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    version = str(version_tabla(ruta_transacciones))
+    if (_metadatos(ruta, motor) or {}).get('version_transacciones') == version:
+        return False
+    with open(ruta + '.lock', 'w') as bloqueo:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        if (_metadatos(ruta, motor) or {}).get('version_transacciones') == version:
+            return False
+        construir_base(ruta_transacciones, ruta, motor)
+    return True
+
+# Guardar el segmento de cada cliente (resultados RFM de la versión `version`)
+# en la base de segmentos, si no es ya la de esa versión
+def actualizar_segmentos(rfm, version, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    import pandas as pd
+
+    destino = ruta_segmentos(ruta)
+    version = str(version)
+    if (_metadatos(destino, motor) or {}).get('version_resultados') == version:
+        return False
+    with open(destino + '.lock', 'w') as bloqueo:
+        fcntl.flock(bloqueo, fcntl.LOCK_EX)
+        if (_metadatos(destino, motor) or {}).get('version_resultados') == version:
+            return False
+        segmentos = pd.DataFrame({'customer_id': rfm['customer_id'].astype(str).to_numpy(),
+                                  'Segmento': rfm['Segmento'].astype(str).to_numpy()})
+        temporal = f'{destino}.tmp-{os.getpid()}'
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        with _conectar(temporal, motor, escritura=True) as conexion:
+            conexion.execute('BEGIN')
+            conexion.execute(ESQUEMA_SEGMENTOS)
+            conexion.execute(ESQUEMA_METADATOS)
+            if motor == 'duckdb':
+                conexion.register('lote', segmentos)
+                conexion.execute('INSERT INTO segmentos SELECT customer_id, Segmento FROM lote')
+                conexion.unregister('lote')
+            else:
+                conexion.executemany('INSERT INTO segmentos VALUES (?, ?)',
+                                     zip(segmentos['customer_id'].tolist(), segmentos['Segmento'].tolist()))
+            _guardar_metadatos(conexion, {'version_resultados': version})
+            conexion.execute('COMMIT')
+        os.replace(temporal, destino)
+    return True
+
+def _adjuntar_segmentos(conexion, ruta, motor):
+    destino = ruta_segmentos(ruta)
+    if motor == 'duckdb':
+        conexion.execute(f"ATTACH '{destino.replace(chr(39), chr(39) * 2)}' AS seg (READ_ONLY)")
+    else:
+        conexion.execute('ATTACH DATABASE ? AS seg', (f'file:{destino}?mode=ro',))
+
+# Día (desde 1970-01-01) de una fecha; None se mantiene (sin límite)
+def _dia(fecha):
+    import pandas as pd
+
+    return None if fecha is None else pd.Timestamp(fecha).value // NS_POR_DIA
+
+# Primer y último día con transacciones en la base
+def limites_fechas(ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    import pandas as pd
+
+    metadatos = _metadatos(ruta, motor)
+    return tuple(pd.Timestamp(int(metadatos[clave]) * NS_POR_DIA) for clave in ('dia_min', 'dia_max'))
+
+# Condición sobre `dia` para un rango de días (inclusive; None = sin límite)
+def _filtro_dias(desde, hasta, columna='dia'):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append(f'{columna} >= ?')
+        parametros.append(desde)
+    if hasta is not None:
+        condiciones.append(f'{columna} <= ?')
+        parametros.append(hasta)
+    return (f"WHERE {' AND '.join(condiciones)}" if condiciones else ''), parametros
+
+def _tipos_totales():
+    return {'total_amount': 'float64', 'margin': 'float64', 'quantity': 'int64', 'num_ventas': 'int64'}
+
+# Totales por producto, categoría o segmento entre dos fechas (inclusive; None
+# = sin límite), como cubo_ventas.totales_rango: índice `dimension` (los
+# faltantes o clientes sin segmento en SIN_DATO, al final) y columnas
+# total_amount, margin, quantity y num_ventas
+def totales_sql(dimension, inicio=None, fin=None, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    filtro, parametros = _filtro_dias(_dia(inicio), _dia(fin))
+    medidas = ('SUM(total_amount) AS total_amount, SUM(margin) AS margin, '
+               'SUM(quantity) AS quantity, COUNT(*) AS num_ventas')
+    with _conectar(ruta, motor) as conexion:
+        if dimension == 'Segmento':
+            # Primero por cliente (con el índice de clientes) y después por su segmento
+            _adjuntar_segmentos(conexion, ruta, motor)
+            sql = f'''
+                SELECT s.Segmento AS valor, SUM(c.total_amount) AS total_amount, SUM(c.margin) AS margin,
+                       SUM(c.quantity) AS quantity, SUM(c.num_ventas) AS num_ventas
+                FROM (SELECT customer_id, {medidas} FROM transacciones {filtro} GROUP BY customer_id) c
+                LEFT JOIN seg.segmentos s ON s.customer_id = c.customer_id
+                GROUP BY s.Segmento
+            '''
+        elif dimension in ('product_id', 'category'):
+            sql = f'SELECT {dimension} AS valor, {medidas} FROM transacciones {filtro} GROUP BY {dimension}'
+        else:
+            raise ValueError(f'Dimensión desconocida: {dimension!r}')
+        totales = _consultar(conexion, f'{sql} ORDER BY valor IS NULL, valor', parametros, _tipos_totales())
+    totales['valor'] = totales['valor'].fillna(SIN_DATO)
+    return totales.set_index('valor').rename_axis(dimension)
+
+# Una fila por producto vendido en el rango con sus totales, el crecimiento
+# del periodo de `dias_periodo` días que termina en `ultimo` (día) respecto del
+# anterior (ambos sin los días previos a `desde`), el análisis ABC y la categoría BCG; las mismas reglas que
+# metricas_productos.calculate_abc_analysis y calculate_bcg_analysis
+SQL_METRICAS_PRODUCTOS = '''
+WITH p AS (
+    SELECT ? AS desde, ? AS hasta, ? AS corte_actual, ? AS corte_anterior, ? AS ultimo
+),
+ventas AS (
+    SELECT t.product_id,
+           SUM(CASE WHEN t.dia BETWEEN p.desde AND p.hasta THEN t.total_amount ELSE 0 END) AS total_amount,
+           SUM(CASE WHEN t.dia BETWEEN p.desde AND p.hasta THEN t.margin ELSE 0 END) AS margin,
+           SUM(CASE WHEN t.dia BETWEEN p.desde AND p.hasta THEN t.quantity ELSE 0 END) AS quantity,
+           SUM(CASE WHEN t.dia BETWEEN p.desde AND p.hasta THEN 1 ELSE 0 END) AS num_ventas,
+           SUM(CASE WHEN t.dia > p.corte_actual AND t.dia <= p.ultimo AND t.dia >= p.desde
+                    THEN t.total_amount ELSE 0 END) AS ingresos_actual,
+           SUM(CASE WHEN t.dia > p.corte_anterior AND t.dia <= p.corte_actual AND t.dia >= p.desde
+                    THEN t.total_amount ELSE 0 END) AS ingresos_anterior
+    FROM transacciones t CROSS JOIN p
+    {filtro}
+    GROUP BY t.product_id
+),
+productos AS (
+    SELECT product_id, total_amount, margin, quantity, num_ventas,
+           total_amount / quantity AS precio_promedio,
+           total_amount / SUM(total_amount) OVER () AS market_share,
+           total_amount / SUM(total_amount) OVER () * 100 AS porcentaje_ventas,
+           CASE WHEN ingresos_anterior > 0 THEN (ingresos_actual / ingresos_anterior - 1) * 100
+                WHEN ingresos_actual > 0 THEN NULL
+                ELSE 0 END AS growth_rate
+    FROM ventas
+    WHERE num_ventas > 0
+),
+acumulado AS (
+    SELECT *, SUM(porcentaje_ventas) OVER (ORDER BY total_amount DESC, product_id
+                                           ROWS UNBOUNDED PRECEDING) AS porcentaje_acumulado
+    FROM productos
+)
+SELECT product_id, total_amount, margin, quantity, num_ventas, precio_promedio,
+       porcentaje_ventas, porcentaje_acumulado,
+       CASE WHEN porcentaje_acumulado <= 80 THEN 'A'
+            WHEN porcentaje_acumulado <= 95 THEN 'B'
+            ELSE 'C' END AS clasificacion_abc,
+       market_share, growth_rate,
+       CASE WHEN market_share >= 0.03 AND (growth_rate >= 20 OR growth_rate IS NULL) THEN 'Estrella'
+            WHEN market_share >= 0.03 AND growth_rate < 10 THEN 'Vaca'
+            WHEN growth_rate >= 20 OR growth_rate IS NULL THEN 'Interrogante'
+            ELSE 'Perro' END AS bcg_category
+FROM acumulado
+ORDER BY total_amount DESC, product_id
+'''
+
+# Métricas de productos (resumen, ABC, BCG) de un rango de fechas, con las
+# mismas tablas que metricas_productos.metricas_desde_agregado; el crecimiento
+# BCG compara los dos últimos periodos de `dias_periodo` días del rango,
+# recortados al inicio del rango
+def metricas_productos_sql(inicio=None, fin=None, dias_periodo=None, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    from metricas_productos import DIAS_PERIODO_CRECIMIENTO, combinar_abc_bcg
+
+    dias_periodo = dias_periodo or DIAS_PERIODO_CRECIMIENTO
+    metadatos = _metadatos(ruta, motor)
+    dia_min, dia_max = int(metadatos['dia_min']), int(metadatos['dia_max'])
+    desde = dia_min if inicio is None else _dia(inicio)
+    hasta = dia_max if fin is None else _dia(fin)
+    ultimo = min(max(hasta, dia_min), dia_max)
+    corte_actual, corte_anterior = ultimo - dias_periodo, ultimo - 2 * dias_periodo
+
+    # Solo las transacciones del rango y de los dos periodos de crecimiento; sin
+    # filtro si eso cubre toda la base (un recorrido completo es más rápido que el índice)
+    inferior, superior = desde, max(hasta, ultimo)
+    filtro, parametros = _filtro_dias(None if inferior <= dia_min else inferior,
+                                      None if superior >= dia_max else superior, 't.dia')
+    with _conectar(ruta, motor) as conexion:
+        filas = _consultar(conexion, SQL_METRICAS_PRODUCTOS.format(filtro=filtro),
+                           [desde, hasta, corte_actual, corte_anterior, ultimo, *parametros],
+                           {**_tipos_totales(), 'precio_promedio': 'float64', 'porcentaje_ventas': 'float64',
+                            'porcentaje_acumulado': 'float64', 'market_share': 'float64',
+                            'growth_rate': 'float64'})
+
+    # Las filas vienen en el orden del análisis ABC; el resto de las tablas va por producto
+    por_producto = filas.sort_values('product_id', ignore_index=True)
+    productos = por_producto.set_index('product_id')
+    abc = filas[['product_id', 'total_amount', 'margin', 'quantity', 'porcentaje_ventas',
+                 'porcentaje_acumulado', 'clasificacion_abc']]
+    bcg = por_producto[['product_id', 'total_amount', 'margin', 'quantity', 'market_share',
+                        'growth_rate', 'bcg_category']]
+    return {
+        'productos': productos[['total_amount', 'margin', 'quantity', 'num_ventas']],
+        'resumen': productos[['quantity', 'total_amount', 'num_ventas', 'precio_promedio']],
+        'abc': abc,
+        'bcg': bcg,
+        'abc_bcg': combinar_abc_bcg(abc, bcg)
+    }
+
+# Compras de un cliente de la más antigua a la más reciente (con el índice de
+# clientes), con las columnas de historial_clientes.COLUMNAS_HISTORIAL
+def historial_cliente_sql(cliente, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    import pandas as pd
+
+    with _conectar(ruta, motor) as conexion:
+        historial = _consultar(
+            conexion,
+            'SELECT transaction_date, product_id, category, quantity, total_amount, margin '
+            'FROM transacciones WHERE customer_id = ? ORDER BY transaction_date',
+            [str(cliente)],
+            {'transaction_date': 'int64', 'quantity': 'int64', 'total_amount': 'float64', 'margin': 'float64'})
+    historial['transaction_date'] = pd.to_datetime(historial['transaction_date'], unit='ns')
+    return historial
+
+# Métricas por cliente como analisis_rfm.agregar_clientes (recency, frequency,
+# monetary, margin, first_purchase, last_purchase; índice customer_id). Con
+# `fecha_analisis` solo cuentan las compras anteriores a ella y la recencia se
+# mide hasta ese momento; sin ella, hasta la última compra de los datos
+def agregar_clientes_sql(fecha_analisis=None, ruta=RUTA_BASE_SQL, motor=MOTOR_SQL):
+    import pandas as pd
+
+    from analisis_rfm import DECIMALES_MONTOS, MONTOS_ACUMULADOS, calcular_recencia
+
+    filtro, parametros = '', []
+    if fecha_analisis is not None:
+        filtro, parametros = 'WHERE transaction_date < ?', [pd.Timestamp(fecha_analisis).value]
+    with _conectar(ruta, motor) as conexion:
+        clientes = _consultar(
+            conexion,
+            f'''SELECT customer_id, COUNT(*) AS frequency, SUM(total_amount) AS monetary,
+                       SUM(margin) AS margin, MIN(transaction_date) AS first_purchase,
+                       MAX(transaction_date) AS last_purchase
+                FROM transacciones {filtro}
+                GROUP BY customer_id
+                ORDER BY customer_id''',
+            parametros,
+            {'frequency': 'int64', 'monetary': 'float64', 'margin': 'float64',
+             'first_purchase': 'int64', 'last_purchase': 'int64'})
+
+    # Misma precisión de montos que agregar_clientes (SUM suma en otro orden)
+    for columna in MONTOS_ACUMULADOS:
+        clientes[columna] = clientes[columna].round(DECIMALES_MONTOS)
+    ultima_compra = clientes['last_purchase'].to_numpy()
+    if fecha_analisis is None:
+        fecha_analisis = ultima_compra.max() if len(clientes) else 0
+    clientes.insert(1, 'recency', calcular_recencia(ultima_compra, fecha_analisis))
+    for columna in ('first_purchase', 'last_purchase'):
+        clientes[columna] = clientes[columna].to_numpy().view('datetime64[ns]')
+    return clientes.set_index('customer_id')
+
+def main():
+    parser = argparse.ArgumentParser(description='Cargar las transacciones en una base SQL embebida')
+    parser.add_argument('--motor', default=MOTOR_SQL or 'sqlite', choices=sorted(EXTENSIONES_BASE))
+    parser.add_argument('--base', default=None, help='archivo de la base (por defecto RFM_BASE_SQL)')
+    parser.add_argument('--transacciones', default=RUTA_TRANSACCIONES)
+    parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE, help='filas por lote al cargar')
+    args = parser.parse_args()
+
+    ruta = args.base or ruta_base(args.motor)
+    inicio = time.perf_counter()
+    filas = construir_base(args.transacciones, ruta, args.motor, args.tamano_lote)
+    print(f"{filas:,} transacciones -> {ruta} ({args.motor}, {os.path.getsize(ruta) / 2**20:,.1f} MB) "
+          f"en {time.perf_counter() - inicio:.2f} s")
+
+if __name__ == '__main__':
+    main()
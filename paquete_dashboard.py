@@ -0,0 +1,132 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from datos_dashboard import version_disponible
+
+# Paquete precalculado del dashboard.
+#
+# `python paquete_dashboard.py` carga los datos una vez y guarda en un JSON
+# todo lo que el dashboard muestra antes de cualquier interacción: el contenido
+# de cada pestaña de app.py ya serializado (componentes, figuras y tablas), las
+# figuras y el resumen de clientes que usa dashboard_rfm.py, y las tablas de
+# estadísticas por segmento y de métricas de productos (resumen, ABC, BCG).
+#
+# El paquete lleva la versión de su formato y la versión de los datos con que
+# se construyó: si no coincide con los datos que se sirven se ignora y el
+# dashboard calcula todo como siempre. Leerlo solo requiere json, así que un
+# worker puede atender la primera pestaña sin importar pandas ni plotly
+# mientras carga los datos en segundo plano. El archivo se reemplaza de forma
+# atómica y se vuelve a leer cuando cambia.
+#
+# Uso: python paquete_dashboard.py  (después de analisis_rfm.py; RFM_PAQUETE
+#      cambia la ruta del paquete)
+
+FORMATO_PAQUETE = 5
+RUTA_PAQUETE = os.environ.get('RFM_PAQUETE', 'paquete_dashboard.json')
+
+class PaqueteDashboard:
+    def __init__(self, contenido):
+        self.version = tuple(contenido['version_datos'])
+        self.creado = contenido['creado']
+        self.pestanas = contenido['pestanas']
+        self.figuras = contenido['figuras']
+        self.resumen_rfm = contenido['resumen_rfm']
+        self._tablas = contenido['tablas']
+
+    # DataFrame guardado con _tabla_como_json (mismo índice, columnas y tipos)
+    def tabla(self, nombre):
+        import pandas as pd
+
+        guardada = self._tablas[nombre]
+        indice = pd.Index(guardada['indice']['valores'], dtype=guardada['indice']['dtype'],
+                          name=guardada['indice']['nombre'])
+        return pd.DataFrame({
+            columna: pd.Series(columna_guardada['valores'], dtype=columna_guardada['dtype'], index=indice)
+            for columna, columna_guardada in guardada['columnas'].items()
+        }, index=indice)
+
+    # Tablas guardadas como `prefijo.<nombre>`, por nombre
+    def tablas(self, prefijo):
+        return {nombre.split('.', 1)[1]: self.tabla(nombre)
+                for nombre in self._tablas if nombre.startswith(f'{prefijo}.')}
+
+def cargar_paquete(ruta=RUTA_PAQUETE):
+    try:
+        with open(ruta) as f:
+            contenido = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if contenido.get('formato') != FORMATO_PAQUETE:
+        return None
+    return PaqueteDashboard(contenido)
+
+_leido = {'mtime': None, 'paquete': None, 'ignorar': False}
+
+# Paquete en disco si se construyó con la versión de datos `version` (por
+# defecto, la que se sirve o, antes de la primera carga, la de disco)
+def paquete_vigente(version=None, ruta=RUTA_PAQUETE):
+    if _leido['ignorar']:
+        return None
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+    if _leido['mtime'] != mtime:
+        _leido['paquete'], _leido['mtime'] = cargar_paquete(ruta), mtime
+    paquete = _leido['paquete']
+    if paquete is None or paquete.version != (version or version_disponible()):
+        return None
+    return paquete
+
+# Valores de cada columna (e índice) con su dtype; json guarda los float con
+# repr, así que se recuperan exactamente (to_json los redondea)
+def _tabla_como_json(tabla):
+    return {
+        'indice': {'nombre': tabla.index.name, 'dtype': str(tabla.index.dtype),
+                   'valores': tabla.index.tolist()},
+        'columnas': {str(columna): {'dtype': str(serie.dtype), 'valores': serie.tolist()}
+                     for columna, serie in tabla.items()}
+    }
+
+def _como_json(objeto):
+    from plotly.utils import PlotlyJSONEncoder
+
+    return json.loads(json.dumps(objeto, cls=PlotlyJSONEncoder))
+
+# Todo se calcula desde los datos, aunque ya haya un paquete de esta versión
+def construir_paquete(ruta=RUTA_PAQUETE):
+    _leido['ignorar'] = True
+    import app
+
+    datos = app.datos_actuales()
+    tablas = {'estadisticas_segmentos': app.estadisticas_segmentos(datos)}
+    for nombre, tabla in app.metricas_productos(datos).items():
+        tablas[f'metricas_productos.{nombre}'] = tabla
+    contenido = {
+        'formato': FORMATO_PAQUETE,
+        'version_datos': list(datos.version),
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'pestanas': {pestana: _como_json(constructor(datos))
+                     for pestana, constructor in app.CONSTRUCTORES_PESTANAS.items()
+                     if pestana not in app.PESTANAS_SIN_PAQUETE},
+        'figuras': _como_json(app.figuras_rfm(datos)),
+        'resumen_rfm': app.resumen_rfm(datos),
+        'tablas': {nombre: _tabla_como_json(tabla) for nombre, tabla in tablas.items()}
+    }
+
+    temporal = f'{ruta}.tmp-{os.getpid()}'
+    with open(temporal, 'w') as f:
+        json.dump(contenido, f, separators=(',', ':'))
+    os.replace(temporal, ruta)
+    return contenido
+
+def main():
+    inicio = time.perf_counter()
+    contenido = construir_paquete()
+    print(f"Paquete {RUTA_PAQUETE} (datos {tuple(contenido['version_datos'])}, "
+          f"{os.path.getsize(RUTA_PAQUETE) / 1024:,.1f} KB) en {time.perf_counter() - inicio:.2f} s")
+
+if __name__ == '__main__':
+    main()
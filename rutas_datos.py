@@ -0,0 +1,27 @@
+import os
+
+# Rutas de las tablas y su versión en disco.
+#
+# Solo usa os: quien necesita saber qué versión de los datos hay en disco (p.
+# ej. al arrancar el dashboard desde el paquete precalculado) no tiene que
+# importar pandas ni numpy. almacenamiento_rfm.py reexporta estos nombres.
+
+RUTA_TRANSACCIONES = 'transacciones_rfm.csv'
+RUTA_RESULTADOS = 'resultados_rfm.csv'
+ARCHIVO_ESQUEMA = 'esquema.json'
+
+def ruta_columnar(ruta_csv):
+    return os.path.splitext(ruta_csv)[0] + '.columnas'
+
+def columnar_actualizado(ruta_csv):
+    esquema = os.path.join(ruta_columnar(ruta_csv), ARCHIVO_ESQUEMA)
+    if not os.path.exists(esquema):
+        return False
+    return not os.path.exists(ruta_csv) or os.path.getmtime(esquema) >= os.path.getmtime(ruta_csv)
+
+# Versión de los datos de una tabla: fecha de modificación (en ns) de la fuente
+# que leería leer_tabla
+def version_tabla(ruta_csv):
+    if columnar_actualizado(ruta_csv):
+        return os.stat(os.path.join(ruta_columnar(ruta_csv), ARCHIVO_ESQUEMA)).st_mtime_ns
+    return os.stat(ruta_csv).st_mtime_ns
@@ -0,0 +1,123 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Paginación, orden y filtro del lado del servidor para la tabla de clientes.
+#
+# Por cada segmento se precalculan las posiciones de sus clientes ordenadas por
+# cada columna de la tabla, así que una página es un slice de un array y no un
+# filtro más un ordenamiento del frame completo. Con filtro, la máscara se
+# aplica sobre el orden precalculado (sin volver a ordenar).
+
+COLUMNAS_TABLA = ['customer_id', 'recency', 'frequency', 'monetary']
+REDONDEO_TABLA = {'recency': 1, 'frequency': 0, 'monetary': 2}
+
+# {columna} operador valor, con los operadores que genera DataTable
+# (p. ej. "{recency} s> 30", "{customer_id} scontains CUST_01"). Cualquier
+# operador puede llevar el prefijo "s" (distingue mayúsculas, como sin
+# prefijo) o "i" (no las distingue)
+PATRON_FILTRO = re.compile(
+    r'\{(?P<columna>[^}]+)\}\s*(?P<prefijo>[si]?)(?P<operador>>=|<=|!=|>|<|=|eq|ne|gt|lt|ge|le|'
+    r'contains|datestartswith)\s+(?P<valor>.+)')
+OPERADORES = {
+    '>=': np.greater_equal, 'ge': np.greater_equal,
+    '<=': np.less_equal, 'le': np.less_equal,
+    '>': np.greater, 'gt': np.greater,
+    '<': np.less, 'lt': np.less,
+    '=': np.equal, 'eq': np.equal,
+    '!=': np.not_equal, 'ne': np.not_equal
+}
+
+# Valores que definen el orden de una columna (los IDs categóricos se ordenan
+# por texto aunque el orden de sus categorías sea otro)
+def _clave_orden(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        rango = np.argsort(np.argsort(serie.cat.categories.to_numpy(dtype=str)))
+        return rango[serie.cat.codes.to_numpy()]
+    return serie.to_numpy()
+
+# {segmento: {None: posiciones en orden original, columna: posiciones ordenadas}}
+def indexar_segmentos(rfm):
+    codigos, segmentos = pd.factorize(rfm['Segmento'])
+    por_segmento = np.argsort(codigos, kind='stable')
+    limites = np.cumsum(np.bincount(codigos, minlength=len(segmentos)))[:-1]
+    claves = {columna: _clave_orden(rfm[columna]) for columna in COLUMNAS_TABLA}
+
+    indices = {}
+    for segmento, posiciones in zip(segmentos, np.split(por_segmento, limites)):
+        indices[str(segmento)] = {None: posiciones}
+        for columna, clave in claves.items():
+            indices[str(segmento)][columna] = posiciones[np.argsort(clave[posiciones], kind='stable')]
+    return indices
+
+# Valor del filtro como texto (sin comillas); se convierte a número recién al
+# compararlo con una columna numérica
+def _convertir_valor(valor):
+    valor = valor.strip()
+    if len(valor) > 1 and valor[0] == valor[-1] and valor[0] in ('"', "'", '`'):
+        return valor[1:-1]
+    return valor
+
+def _mascara_condicion(serie, operador, valor, sin_mayusculas=False):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Evaluar sobre las categorías (como texto) y expandir por código
+        categorias = serie.cat.categories.to_series().astype(str)
+        cumple = np.asarray(_mascara_condicion(categorias, operador, valor, sin_mayusculas))
+        return np.append(cumple, False)[serie.cat.codes.to_numpy()]
+
+    if operador in ('contains', 'datestartswith'):
+        return _mascara_texto(serie.astype(str), operador, valor, sin_mayusculas).to_numpy()
+
+    if pd.api.types.is_numeric_dtype(serie):
+        try:
+            valor = float(valor)
+        except ValueError:
+            return np.zeros(len(serie), dtype=bool)
+        return OPERADORES[operador](serie.to_numpy(), valor)
+    textos = serie.astype(str)
+    if sin_mayusculas:
+        textos, valor = textos.str.lower(), valor.lower()
+    return OPERADORES[operador](textos.to_numpy(), valor)
+
+def _mascara_texto(textos, operador, valor, sin_mayusculas=False):
+    if operador == 'datestartswith':
+        if sin_mayusculas:
+            textos, valor = textos.str.lower(), valor.lower()
+        return textos.str.startswith(valor)
+    return textos.str.contains(valor, case=not sin_mayusculas, regex=False)
+
+# Máscara booleana sobre rfm para un filter_query de DataTable ('' = sin filtro)
+def mascara_filtro(rfm, filtro):
+    if not filtro:
+        return None
+    mascara = np.ones(len(rfm), dtype=bool)
+    for parte in filtro.split(' && '):
+        coincidencia = PATRON_FILTRO.match(parte.strip())
+        if coincidencia is None or coincidencia['columna'] not in rfm.columns:
+            continue
+        mascara &= _mascara_condicion(rfm[coincidencia['columna']], coincidencia['operador'],
+                                      _convertir_valor(coincidencia['valor']),
+                                      sin_mayusculas=coincidencia['prefijo'] == 'i')
+    return mascara
+
+# Posiciones (en rfm) de las filas visibles del segmento con orden y filtro
+def ordenar_y_filtrar(rfm, indices, segmento, sort_by=None, filtro=''):
+    if segmento not in indices:
+        return np.empty(0, dtype=np.intp)
+
+    columna, descendente = None, False
+    if sort_by:
+        columna = sort_by[0]['column_id']
+        descendente = sort_by[0]['direction'] == 'desc'
+    posiciones = indices[segmento].get(columna, indices[segmento][None])
+
+    mascara = mascara_filtro(rfm, filtro)
+    if mascara is not None:
+        posiciones = posiciones[mascara[posiciones]]
+    return posiciones[::-1] if descendente else posiciones
+
+def pagina(rfm, posiciones, pagina_actual, tamano_pagina):
+    inicio = pagina_actual * tamano_pagina
+    filas = rfm.iloc[posiciones[inicio:inicio + tamano_pagina]][COLUMNAS_TABLA]
+    return filas.round(REDONDEO_TABLA).to_dict('records')
@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from almacenamiento_rfm import compactar_tipos, valores_float64
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transacciones_rfm.csv')
+
+# Los montos compactados a float32 se recuperan exactos con valores_float64
+def test_compactar_tipos_recupera_montos_exactos():
+    df = pd.read_csv(RUTA_DATOS)
+    compacto = compactar_tipos(df)
+    for columna in df.select_dtypes('float').columns:
+        assert np.array_equal(valores_float64(compacto, columna), df[columna].to_numpy())
+
+# Una columna que float32 no reproduce exactamente queda en float64
+def test_montos_sin_float32_exacto_quedan_en_float64():
+    df = pd.DataFrame({'monto': [10713.16, 218803.15, 0.1 + 0.2, 1234567.89]})
+    compacto = compactar_tipos(df)
+    assert compacto['monto'].dtype == np.float64
+    assert np.array_equal(valores_float64(compacto, 'monto'), df['monto'].to_numpy())
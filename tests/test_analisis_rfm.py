@@ -0,0 +1,42 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from analisis_rfm import (COLUMNAS_RESULTADOS, agregar_clientes, agregar_clientes_en_paralelo,
+                          agregar_clientes_por_lotes, cargar_transacciones, puntuar_rfm)
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transacciones_rfm.csv')
+
+# Resultados tal como se escriben en resultados_rfm.csv
+def _resultados(rfm):
+    resultados = puntuar_rfm(rfm)[COLUMNAS_RESULTADOS].copy()
+    resultados.index = resultados.index.astype(str)
+    resultados['Segmento'] = resultados['Segmento'].astype(str)
+    return resultados
+
+@pytest.fixture(scope='module')
+def serial():
+    return _resultados(agregar_clientes(cargar_transacciones(RUTA_DATOS)))
+
+# Con lotes chicos cada cliente se suma en muchas partes y en otro orden
+@pytest.mark.parametrize('tamano_lote', [1000, 777, 100_000])
+def test_streaming_igual_a_serial(serial, tamano_lote):
+    pd.testing.assert_frame_equal(_resultados(agregar_clientes_por_lotes(RUTA_DATOS, tamano_lote)), serial,
+                                  check_exact=True)
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_paralelo_igual_a_serial(serial, tmp_path, workers):
+    ruta = str(tmp_path / 'transacciones.csv')
+    shutil.copy(RUTA_DATOS, ruta)
+    pd.testing.assert_frame_equal(_resultados(agregar_clientes_en_paralelo(ruta, workers)), serial,
+                                  check_exact=True)
+
+def test_sql_igual_a_serial(serial, tmp_path):
+    from motor_sql import actualizar_base, agregar_clientes_sql
+
+    base = str(tmp_path / 'transacciones.sqlite')
+    actualizar_base(RUTA_DATOS, base, 'sqlite')
+    pd.testing.assert_frame_equal(_resultados(agregar_clientes_sql(ruta=base, motor='sqlite')), serial,
+                                  check_exact=True)
@@ -0,0 +1,31 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from analisis_rfm import agregar_clientes, agregar_clientes_en_paralelo, puntuar_rfm
+from cuantiles_rfm import cortes_desde_sketches, fusionar_sketches, sketches_particion, sketches_rfm
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transacciones_rfm.csv')
+
+# Con error 0.001 el compactador no descarta nada con 1.000 clientes: los
+# cortes de las particiones fusionadas deben dar los mismos scores que qcut
+def test_particiones_fusionadas_igual_a_exacto(tmp_path):
+    ruta = str(tmp_path / 'transacciones.csv')
+    shutil.copy(RUTA_DATOS, ruta)
+    rfm, sketches = agregar_clientes_en_paralelo(ruta, workers=2, error_cuantiles=0.001)
+    exacto = puntuar_rfm(rfm.copy())
+    aproximado = puntuar_rfm(rfm, cortes_desde_sketches(sketches, rfm['last_purchase'].max()))
+    for columna in ('R', 'F', 'M', 'Segmento'):
+        assert (aproximado[columna] == exacto[columna]).all()
+
+def test_recencia_derivada_igual_a_sketch_directo():
+    rfm = agregar_clientes(pd.read_csv(RUTA_DATOS, parse_dates=['transaction_date']))
+    mitades = np.arange(len(rfm)) % 2 == 0
+    fusionados = fusionar_sketches([sketches_particion(rfm[mitades], 0.001, semilla=0),
+                                    sketches_particion(rfm[~mitades], 0.001, semilla=1)])
+    derivados = cortes_desde_sketches(fusionados, rfm['last_purchase'].max())
+    directos = cortes_desde_sketches(sketches_rfm(rfm, 0.001, semilla=0))
+    for metrica in ('recency', 'frequency', 'monetary'):
+        assert np.array_equal(derivados[metrica], directos[metrica])
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cubo_ventas import MEDIDAS, SIN_DATO, construir_cubo, crecimiento_rango, totales_rango
+
+# Transacciones sintéticas con horas distintas, categorías faltantes y clientes
+# sin resultados RFM (van a SIN_DATO)
+@pytest.fixture(scope='module')
+def datos():
+    generador = np.random.default_rng(0)
+    n = 20000
+    inicio = pd.Timestamp('2023-01-15')
+    transacciones = pd.DataFrame({
+        'customer_id': pd.Categorical([f'CUST_{i:04d}' for i in generador.integers(0, 300, n)]),
+        'transaction_date': inicio + pd.to_timedelta(generador.integers(0, 400 * 86400, n), unit='s'),
+        'product_id': [f'PROD_{i:03d}' for i in generador.integers(0, 40, n)],
+        'category': generador.choice(['A', 'B', 'C', None], n, p=[0.4, 0.3, 0.2, 0.1]),
+        'quantity': generador.integers(1, 6, n),
+        'total_amount': generador.uniform(10, 3000, n).round(2),
+        'margin': generador.uniform(-100, 800, n).round(2)
+    })
+    rfm = pd.DataFrame({
+        'customer_id': [f'CUST_{i:04d}' for i in range(250)],
+        'Segmento': generador.choice(['Champions', 'Leales', 'En riesgo'], 250)
+    })
+    return transacciones, rfm, construir_cubo(transacciones, rfm)
+
+def _con_segmento(transacciones, rfm):
+    segmentos = rfm.set_index('customer_id')['Segmento']
+    return transacciones.assign(
+        Segmento=transacciones['customer_id'].astype(str).map(segmentos).fillna(SIN_DATO),
+        category=transacciones['category'].fillna(SIN_DATO),
+        num_ventas=1)
+
+# Referencia con pandas: filtrar por fecha (días completos) y agrupar
+def _referencia_totales(transacciones, rfm, dimension, inicio, fin):
+    df = _con_segmento(transacciones, rfm)
+    dias = df['transaction_date'].dt.normalize()
+    if inicio is not None:
+        df = df[dias >= pd.Timestamp(inicio)]
+        dias = dias[dias >= pd.Timestamp(inicio)]
+    if fin is not None:
+        df = df[dias <= pd.Timestamp(fin)]
+    return df.groupby(dimension)[MEDIDAS].sum().sort_index()
+
+@pytest.mark.parametrize('inicio, fin', [
+    (None, None),
+    ('2023-03-10', '2023-11-20'),  # meses completos y días sueltos en los extremos
+    ('2023-04-01', '2023-06-30'),  # solo meses completos
+    ('2023-05-07', '2023-05-21'),  # dentro de un mes
+    ('2023-08-15', '2023-08-15'),  # un día
+    ('2022-01-01', '2023-02-10'),  # antes del primer día
+    ('2024-01-20', '2030-01-01'),  # después del último día
+    ('2023-09-01', '2023-08-01')   # fin anterior al inicio
+])
+@pytest.mark.parametrize('dimension', ['product_id', 'category', 'Segmento'])
+def test_totales_rango_igual_a_pandas(datos, dimension, inicio, fin):
+    transacciones, rfm, cubo = datos
+    totales = totales_rango(cubo, dimension, inicio, fin).sort_index()
+    esperado = _referencia_totales(transacciones, rfm, dimension, inicio, fin)
+    assert list(totales.index) == list(esperado.index)
+    assert np.allclose(totales[MEDIDAS].to_numpy(dtype=float), esperado[MEDIDAS].to_numpy(dtype=float))
+
+# Referencia con pandas: ingresos de los `dias_periodo` días que terminan en
+# `fin` contra los `dias_periodo` anteriores, sin los días previos a `inicio`
+def _referencia_crecimiento(transacciones, rfm, dimension, dias_periodo, fin, inicio=None):
+    df = _con_segmento(transacciones, rfm)
+    dias = df['transaction_date'].dt.normalize()
+    if inicio is not None:
+        df = df[dias >= pd.Timestamp(inicio)]
+        dias = dias[dias >= pd.Timestamp(inicio)]
+    ultimo = dias.max() if fin is None else pd.Timestamp(fin)
+    atras = (ultimo - dias).dt.days
+    actual = df[(atras >= 0) & (atras < dias_periodo)].groupby(dimension)['total_amount'].sum()
+    anterior = df[(atras >= dias_periodo) & (atras < 2 * dias_periodo)].groupby(dimension)['total_amount'].sum()
+    etiquetas = sorted(_con_segmento(transacciones, rfm)[dimension].unique())
+    actual, anterior = actual.reindex(etiquetas, fill_value=0), anterior.reindex(etiquetas, fill_value=0)
+    crecimiento = (actual / anterior - 1) * 100
+    crecimiento[(anterior == 0) & (actual == 0)] = 0.0
+    crecimiento[(anterior == 0) & (actual > 0)] = np.nan
+    return crecimiento
+
+@pytest.mark.parametrize('dias_periodo, fin', [(90, None), (30, '2023-10-15'), (7, '2023-03-01'),
+                                               (1, '2023-06-30')])
+@pytest.mark.parametrize('dimension', ['product_id', 'category', 'Segmento'])
+def test_crecimiento_rango_igual_a_pandas(datos, dimension, dias_periodo, fin):
+    transacciones, rfm, cubo = datos
+    crecimiento = crecimiento_rango(cubo, dimension, dias_periodo, fin).sort_index()
+    esperado = _referencia_crecimiento(transacciones, rfm, dimension, dias_periodo, fin)
+    assert list(crecimiento.index) == list(esperado.index)
+    assert np.allclose(crecimiento.to_numpy(), esperado.to_numpy(), equal_nan=True)
+
+# Rango acotado: los periodos de crecimiento no salen del rango elegido
+@pytest.mark.parametrize('dias_periodo, inicio, fin', [(30, '2023-09-01', '2023-10-15'),
+                                                       (90, '2023-06-01', '2023-08-31'),
+                                                       (7, '2023-03-01', '2023-03-01'),
+                                                       (30, '2022-01-01', '2023-02-20')])
+@pytest.mark.parametrize('dimension', ['product_id', 'Segmento'])
+def test_crecimiento_rango_acotado_al_inicio(datos, dimension, dias_periodo, inicio, fin):
+    transacciones, rfm, cubo = datos
+    crecimiento = crecimiento_rango(cubo, dimension, dias_periodo, fin, inicio).sort_index()
+    esperado = _referencia_crecimiento(transacciones, rfm, dimension, dias_periodo, fin, inicio)
+    assert list(crecimiento.index) == list(esperado.index)
+    assert np.allclose(crecimiento.to_numpy(), esperado.to_numpy(), equal_nan=True)
+    # Sin acotar, el periodo anterior sí tiene ventas de antes del inicio
+    if pd.Timestamp(inicio) > transacciones['transaction_date'].min() + pd.Timedelta(days=2 * dias_periodo):
+        assert not np.allclose(crecimiento.to_numpy(), crecimiento_rango(cubo, dimension, dias_periodo, fin)
+                               .sort_index().to_numpy(), equal_nan=True)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dispersion_clientes import (MAX_PUNTOS, RESOLUCION, distribucion_clientes, indexar_dispersion,
+                                 rango_relayout, rejilla_clientes)
+
+SEGMENTOS = ['Champions', 'En riesgo', 'Leales', 'Regular']
+
+# Resultados RFM sintéticos: recency entera (muchos valores sobre los bordes de
+# los intervalos) y monetary continuo
+@pytest.fixture(scope='module')
+def rfm():
+    generador = np.random.default_rng(0)
+    n = 20000
+    return pd.DataFrame({
+        'customer_id': [f'CUST_{i:05d}' for i in generador.permutation(n)],
+        'recency': generador.integers(0, 600, n),
+        'monetary': generador.gamma(2, 20000, n).round(2),
+        'Segmento': pd.Categorical(generador.choice(SEGMENTOS, n))
+    })
+
+def _en_rango(rfm, rango_x, rango_y):
+    mascara = np.ones(len(rfm), dtype=bool)
+    if rango_x is not None:
+        mascara &= rfm['recency'].between(*rango_x).to_numpy()
+    if rango_y is not None:
+        mascara &= rfm['monetary'].between(*rango_y).to_numpy()
+    return rfm[mascara]
+
+def _bordes(valores, rango):
+    minimo, maximo = rango if rango is not None else (valores.min(), valores.max())
+    return np.linspace(minimo, maximo, RESOLUCION + 1)
+
+# Referencia con numpy: histograma 2D por segmento y, en cada celda, el segmento
+# con más clientes (en empate, el primero en orden alfabético)
+def _referencia_rejilla(rfm, rango_x, rango_y):
+    visibles = _en_rango(rfm, rango_x, rango_y)
+    bordes_x = _bordes(visibles['recency'].to_numpy(dtype=float), rango_x)
+    bordes_y = _bordes(visibles['monetary'].to_numpy(), rango_y)
+    conteo = np.stack([np.histogram2d(grupo['recency'], grupo['monetary'], bins=[bordes_x, bordes_y])[0]
+                       for _, grupo in visibles.groupby(visibles['Segmento'].astype(str))])
+    total, predominante = conteo.sum(axis=0), conteo.argmax(axis=0)
+    centros_x, centros_y = (bordes_x[:-1] + bordes_x[1:]) / 2, (bordes_y[:-1] + bordes_y[1:]) / 2
+    esperado = {}
+    for codigo, nombre in enumerate(sorted(visibles['Segmento'].astype(str).unique())):
+        i, j = np.nonzero((total > 0) & (predominante == codigo))
+        esperado[nombre] = set(zip(centros_x[i].round(6), centros_y[j].round(6), total[i, j].astype(int)))
+    return {nombre: celdas for nombre, celdas in esperado.items() if celdas}
+
+@pytest.mark.parametrize('rango_x, rango_y', [
+    (None, None),
+    ((100, 400), None),
+    (None, (5000, 60000)),
+    ((30.5, 250.5), (1000, 90000))
+])
+def test_rejilla_igual_a_histograma(rfm, rango_x, rango_y):
+    indice = indexar_dispersion(rfm, 'recency', 'monetary')
+    series, agrupado = rejilla_clientes(indice, rango_x, rango_y)
+    assert agrupado
+    obtenido = {nombre: set(zip(serie['x'].round(6), serie['y'].round(6), serie['clientes'].astype(int)))
+                for nombre, serie in series.items()}
+    assert obtenido == _referencia_rejilla(rfm, rango_x, rango_y)
+    assert sum(int(serie['clientes'].sum()) for serie in series.values()) == \
+        len(_en_rango(rfm, rango_x, rango_y))
+
+def test_pocos_clientes_devuelve_puntos_exactos(rfm):
+    indice = indexar_dispersion(rfm, 'recency', 'monetary')
+    rango_x, rango_y = (100, 110), (0, 50000)
+    visibles = _en_rango(rfm, rango_x, rango_y)
+    assert len(visibles) <= MAX_PUNTOS
+    series, agrupado = rejilla_clientes(indice, rango_x, rango_y)
+    assert not agrupado
+    for nombre, grupo in visibles.groupby(visibles['Segmento'].astype(str)):
+        assert set(series[nombre]['ids']) == set(grupo['customer_id'])
+        assert sorted(zip(series[nombre]['x'], series[nombre]['y'])) == \
+            sorted(zip(grupo['recency'].astype(float), grupo['monetary']))
+
+@pytest.mark.parametrize('rango_x', [None, (50, 300), (599.5, 700)])
+def test_distribucion_igual_a_histograma(rfm, rango_x):
+    indice = indexar_dispersion(rfm, 'recency', 'monetary')
+    bordes, conteos = distribucion_clientes(indice, rango_x)
+    visibles = _en_rango(rfm, rango_x, None)
+    if len(visibles) == 0:
+        assert conteos == {}
+        return
+    assert np.allclose(bordes, _bordes(visibles['recency'].to_numpy(dtype=float), rango_x))
+    esperado = {nombre: np.histogram(grupo['recency'], bins=bordes)[0]
+                for nombre, grupo in visibles.groupby(visibles['Segmento'].astype(str))}
+    assert sorted(conteos) == sorted(nombre for nombre, conteo in esperado.items() if conteo.any())
+    for nombre, conteo in conteos.items():
+        assert np.array_equal(conteo, esperado[nombre])
+
+def test_rango_relayout():
+    assert rango_relayout(None, 'xaxis', (1, 2)) == (1, 2)
+    assert rango_relayout({'xaxis.autorange': True}, 'xaxis', (1, 2)) is None
+    assert rango_relayout({'xaxis.range[0]': '3', 'xaxis.range[1]': 8}, 'xaxis') == (3.0, 8.0)
+    assert rango_relayout({'yaxis.range': [0, 5]}, 'yaxis') == (0.0, 5.0)
+    assert rango_relayout({'xaxis.range[0]': 3, 'xaxis.range[1]': 8}, 'yaxis', (1, 2)) == (1, 2)
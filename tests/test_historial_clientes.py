@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from historial_clientes import COLUMNAS_HISTORIAL, historial_cliente, indexar_transacciones
+
+# Transacciones sintéticas desordenadas, con fechas repetidas y algunas sin cliente
+@pytest.fixture(scope='module', params=['categorico', 'texto'])
+def transacciones(request):
+    generador = np.random.default_rng(0)
+    n = 5000
+    clientes = np.array([f'CUST_{i:04d}' for i in generador.integers(0, 400, n)], dtype=object)
+    clientes[generador.random(n) < 0.01] = None
+    df = pd.DataFrame({
+        'customer_id': clientes,
+        'transaction_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(generador.integers(0, 200, n), unit='D'),
+        'product_id': [f'PROD_{i:03d}' for i in generador.integers(0, 30, n)],
+        'category': generador.choice(['A', 'B', 'C'], n),
+        'quantity': generador.integers(1, 6, n),
+        'total_amount': generador.uniform(10, 3000, n).round(2),
+        'margin': generador.uniform(-100, 800, n).round(2)
+    })
+    if request.param == 'categorico':
+        df['customer_id'] = df['customer_id'].astype('category')
+    return df
+
+# Referencia con pandas: filtrar por cliente y ordenar por fecha (estable: en
+# la misma fecha, en el orden de la tabla)
+def _referencia(transacciones, cliente):
+    compras = transacciones[transacciones['customer_id'].astype(object) == cliente]
+    return compras.sort_values('transaction_date', kind='stable')[COLUMNAS_HISTORIAL]
+
+def test_historial_igual_a_pandas(transacciones):
+    indice = indexar_transacciones(transacciones)
+    for cliente in transacciones['customer_id'].dropna().unique():
+        historial = historial_cliente(transacciones, indice, cliente)
+        pd.testing.assert_frame_equal(historial, _referencia(transacciones, cliente))
+
+def test_cliente_inexistente_devuelve_historial_vacio(transacciones):
+    indice = indexar_transacciones(transacciones)
+    historial = historial_cliente(transacciones, indice, 'CUST_9999')
+    assert len(historial) == 0
+    assert list(historial.columns) == COLUMNAS_HISTORIAL
+
+def test_transacciones_sin_cliente_quedan_fuera(transacciones):
+    indice = indexar_transacciones(transacciones)
+    assert indice['inicio'][-1] == transacciones['customer_id'].notna().sum()
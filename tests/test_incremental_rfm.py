@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+
+from analisis_rfm import agregar_clientes
+from incremental_rfm import actualizar
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transacciones_rfm.csv')
+
+# Con pocas compras por cliente los quintiles de qcut no tienen bordes únicos:
+# las pruebas usan al menos 6.000 transacciones
+def _lineas():
+    with open(RUTA_DATOS) as f:
+        return f.readlines()
+
+def _escribir(ruta, lineas):
+    with open(ruta, 'w') as f:
+        f.writelines(lineas)
+
+def _referencia(ruta):
+    return agregar_clientes(pd.read_csv(ruta, parse_dates=['transaction_date']))
+
+def _comparar(rfm, ruta):
+    esperado = _referencia(ruta)
+    rfm = rfm.sort_index()
+    assert list(rfm.index) == list(esperado.index.astype(str))
+    for columna in ('frequency', 'monetary', 'recency'):
+        assert (abs(rfm[columna].to_numpy() - esperado[columna].to_numpy()) < 1e-6).all()
+
+def test_sin_cambios_no_devuelve_resultados(tmp_path):
+    log, estado = str(tmp_path / 'log.csv'), str(tmp_path / 'estado.pkl')
+    _escribir(log, _lineas()[:6001])
+    assert actualizar(log, estado) is not None
+    assert actualizar(log, estado) is None
+
+def test_agregar_al_log(tmp_path):
+    log, estado = str(tmp_path / 'log.csv'), str(tmp_path / 'estado.pkl')
+    lineas = _lineas()
+    _escribir(log, lineas[:6001])
+    actualizar(log, estado)
+    with open(log, 'a') as f:
+        f.writelines(lineas[6001:8001])
+    _comparar(actualizar(log, estado), log)
+
+def test_log_reemplazado_mas_largo(tmp_path):
+    log, estado = str(tmp_path / 'log.csv'), str(tmp_path / 'estado.pkl')
+    lineas = _lineas()
+    _escribir(log, lineas[:6001])
+    actualizar(log, estado)
+    # Otro archivo (otro inodo) más largo que el procesado
+    nuevo = tmp_path / 'nuevo.csv'
+    _escribir(nuevo, lineas[:1] + lineas[2001:])
+    os.replace(nuevo, log)
+    _comparar(actualizar(log, estado), log)
+
+def test_log_reescrito_en_el_lugar(tmp_path):
+    log, estado = str(tmp_path / 'log.csv'), str(tmp_path / 'estado.pkl')
+    lineas = _lineas()
+    _escribir(log, lineas[:6001])
+    actualizar(log, estado)
+    # Mismo archivo (mismo inodo), más largo y con otro contenido
+    _escribir(log, lineas[:1] + lineas[2001:10001])
+    _comparar(actualizar(log, estado), log)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tabla_clientes import indexar_segmentos, mascara_filtro, ordenar_y_filtrar
+
+# Resultados RFM sintéticos con los tipos con que se cargan: IDs y segmentos categóricos
+@pytest.fixture(scope='module')
+def rfm():
+    generador = np.random.default_rng(0)
+    n = 500
+    clientes = [f'CUST_{i:04d}' for i in generador.permutation(n)]
+    return pd.DataFrame({
+        'customer_id': pd.Categorical(clientes),
+        'recency': generador.integers(0, 400, n),
+        'frequency': generador.integers(1, 30, n),
+        'monetary': generador.uniform(10, 5000, n).round(2),
+        'Segmento': pd.Categorical(generador.choice(['Champions', 'Leales', 'Perdidos', 'Regular'], n))
+    })
+
+# Referencia con pandas: la semántica del filtro de DataTable del lado del cliente
+def _referencia(rfm, columna, operador, valor):
+    serie = rfm[columna]
+    if operador == 'contains':
+        return serie.astype(str).str.contains(valor, regex=False).to_numpy()
+    if pd.api.types.is_numeric_dtype(serie):
+        serie, valor = serie.astype(float), float(valor)
+    else:
+        serie = serie.astype(str)
+    return {'=': serie == valor, '!=': serie != valor, '>': serie > valor,
+            '<': serie < valor, '>=': serie >= valor, '<=': serie <= valor}[operador].to_numpy()
+
+@pytest.mark.parametrize('columna, operador, valor', [
+    ('customer_id', 'contains', '00'),
+    ('customer_id', 'contains', '01'),
+    ('customer_id', 'contains', '1'),
+    ('customer_id', 'contains', 'CUST_04'),
+    ('customer_id', '=', 'CUST_0001'),
+    ('customer_id', '!=', 'CUST_0001'),
+    ('customer_id', '>', 'CUST_0250'),
+    ('Segmento', '=', 'Leales'),
+    ('Segmento', 'contains', 'al'),
+    ('Segmento', '!=', 'Regular'),
+    ('recency', '>', '30'),
+    ('recency', '<=', '100'),
+    ('frequency', '=', '5'),
+    ('monetary', '>=', '2500.5'),
+])
+def test_filtro_como_pandas(rfm, columna, operador, valor):
+    esperado = _referencia(rfm, columna, operador, valor)
+    assert esperado.any()
+    np.testing.assert_array_equal(mascara_filtro(rfm, f'{{{columna}}} {operador} {valor}'), esperado)
+
+def test_filtro_combinado_y_comillas(rfm):
+    esperado = (_referencia(rfm, 'customer_id', 'contains', '00') &
+                _referencia(rfm, 'recency', '>', '50'))
+    np.testing.assert_array_equal(mascara_filtro(rfm, '{customer_id} contains "00" && {recency} s> 50'), esperado)
+
+# Prefijos "s" (distingue mayúsculas) e "i" (no las distingue) que DataTable
+# agrega a cualquier operador
+@pytest.mark.parametrize('filtro, esperado', [
+    ('{Segmento} scontains Camp', lambda rfm: rfm['Segmento'].astype(str).str.contains('Camp')),
+    ('{Segmento} scontains camp', lambda rfm: rfm['Segmento'].astype(str).str.contains('camp')),
+    ('{customer_id} scontains CUST_00', lambda rfm: rfm['customer_id'].astype(str).str.contains('CUST_00')),
+    ('{Segmento} icontains CAMP', lambda rfm: rfm['Segmento'].astype(str).str.lower().str.contains('camp')),
+    ('{Segmento} ieq leales', lambda rfm: rfm['Segmento'].astype(str) == 'Leales'),
+    ('{Segmento} seq leales', lambda rfm: rfm['Segmento'].astype(str) == 'leales'),
+    ('{customer_id} ine cust_0001', lambda rfm: rfm['customer_id'].astype(str) != 'CUST_0001'),
+    ('{recency} ieq 3', lambda rfm: rfm['recency'] == 3),
+    ('{recency} i< 30', lambda rfm: rfm['recency'] < 30),
+    ('{monetary} sge 2500', lambda rfm: rfm['monetary'] >= 2500),
+])
+def test_prefijos_de_operador(rfm, filtro, esperado):
+    np.testing.assert_array_equal(mascara_filtro(rfm, filtro), esperado(rfm).to_numpy())
+
+def test_valor_no_numerico_en_columna_numerica(rfm):
+    assert not mascara_filtro(rfm, '{recency} > abc').any()
+
+@pytest.mark.parametrize('columna', [None, 'customer_id', 'recency', 'frequency', 'monetary'])
+@pytest.mark.parametrize('direccion', ['asc', 'desc'])
+def test_ordenar_y_filtrar_como_pandas(rfm, columna, direccion):
+    indices = indexar_segmentos(rfm)
+    sort_by = [{'column_id': columna, 'direction': direccion}] if columna else None
+    filtro = '{recency} > 50 && {customer_id} contains 1'
+    for segmento in rfm['Segmento'].cat.categories:
+        esperado = rfm[(rfm['Segmento'] == segmento).to_numpy() & mascara_filtro(rfm, filtro)]
+        if columna is not None:
+            clave = esperado[columna].astype(str) if columna == 'customer_id' else esperado[columna]
+            esperado = esperado.iloc[np.argsort(clave.to_numpy(), kind='stable')]
+            if direccion == 'desc':
+                esperado = esperado.iloc[::-1]
+        posiciones = ordenar_y_filtrar(rfm, indices, segmento, sort_by, filtro)
+        np.testing.assert_array_equal(posiciones, rfm.index.get_indexer(esperado.index))
+
+def test_segmento_inexistente(rfm):
+    assert len(ordenar_y_filtrar(rfm, indexar_segmentos(rfm), 'No existe')) == 0
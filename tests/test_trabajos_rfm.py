@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analisis_rfm import agregar_clientes
+from trabajos_rfm import _recalcular
+
+RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transacciones_rfm.csv')
+
+def _sin_progreso(avance, mensaje):
+    pass
+
+# Transacciones de ejemplo con horas distintas (en los datos de ejemplo todas
+# las compras tienen la misma hora del día), en el directorio de trabajo
+@pytest.fixture
+def transacciones(tmp_path, monkeypatch):
+    df = pd.read_csv(RUTA_DATOS, parse_dates=['transaction_date'])
+    horas = np.random.default_rng(0).integers(0, 24 * 3600, len(df))
+    df['transaction_date'] = df['transaction_date'].dt.normalize() + pd.to_timedelta(horas, unit='s')
+    df.to_csv(tmp_path / 'transacciones_rfm.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    return df
+
+# Con la fecha por defecto del dashboard (último día de los datos) el recálculo
+# reproduce la recencia de analisis_rfm
+def test_fecha_por_defecto_reproduce_recencia(transacciones):
+    fecha = str(transacciones['transaction_date'].max().date())
+    rfm, resumen = _recalcular({'fecha_analisis': fecha}, _sin_progreso)
+    esperado = agregar_clientes(transacciones)
+    assert resumen['clientes'] == len(esperado)
+    assert list(rfm.index.astype(str)) == list(esperado.index)
+    assert (rfm['recency'].to_numpy() == esperado['recency'].to_numpy()).all()
+
+def test_fecha_anterior_cuenta_solo_compras_hasta_ese_dia(transacciones):
+    fecha = transacciones['transaction_date'].quantile(0.5).normalize()
+    rfm, _ = _recalcular({'fecha_analisis': str(fecha.date())}, _sin_progreso)
+    esperado = agregar_clientes(transacciones[transacciones['transaction_date'] < fecha + pd.Timedelta(days=1)])
+    assert (rfm['frequency'].to_numpy() == esperado['frequency'].to_numpy()).all()
+    assert (rfm['recency'].to_numpy() == esperado['recency'].to_numpy()).all()
+
+# Como `python app.py`: el módulo principal arranca el vigía de datos y lanza
+# un trabajo; el proceso del pool vuelve a importarlo pero no debe tener vigía
+SCRIPT_VIGIA = '''
+import threading
+
+from datos_dashboard import iniciar_vigilancia
+from trabajos_rfm import _pool_trabajos
+
+iniciar_vigilancia(en_segundo_plano=True)
+
+def hilos():
+    return sorted(hilo.name for hilo in threading.enumerate())
+
+if __name__ == '__main__':
+    print(hilos())
+    print(_pool_trabajos().submit(hilos).result())
+'''
+
+def test_proceso_de_trabajo_sin_vigia(tmp_path):
+    script = tmp_path / 'servidor.py'
+    script.write_text(SCRIPT_VIGIA)
+    entorno = dict(os.environ, PYTHONPATH=os.path.dirname(RUTA_DATOS))
+    salida = subprocess.run([sys.executable, str(script)], cwd=tmp_path, env=entorno,
+                            capture_output=True, text=True, timeout=120, check=True).stdout
+    servidor, trabajo = [linea for linea in salida.splitlines() if linea.startswith('[')]
+    assert 'recarga-datos' in servidor
+    assert 'recarga-datos' not in trabajo
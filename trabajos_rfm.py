@@ -0,0 +1,240 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from rutas_datos import RUTA_TRANSACCIONES, version_tabla
+
+# Recálculo del análisis RFM en segundo plano, pedido desde el dashboard.
+#
+# Cada pedido (fecha de análisis y reglas de segmentación) es una fila de una
+# tabla SQLite local con su estado y progreso; el cálculo corre en un pool de
+# procesos del propio servidor, sin broker externo, así que el callback que lo
+# pide vuelve enseguida y el dashboard consulta el estado periódicamente. La
+# tabla es compartida por todos los workers de gunicorn: cualquiera puede
+# informar el progreso de un trabajo que lanzó otro.
+#
+# La clave de un trabajo es un hash de sus parámetros y de la versión de las
+# transacciones: pedir otra vez los mismos parámetros devuelve el trabajo ya
+# terminado (o el que está en curso) sin recalcular. El resultado de un trabajo
+# es su resumen por segmento, guardado en la tabla; se conservan los últimos
+# MAX_RESULTADOS.
+#
+# RFM_TRABAJOS (base SQLite, por defecto trabajos_rfm.sqlite) y
+# RFM_TRABAJOS_WORKERS (procesos por worker del servidor, por defecto 1)
+
+RUTA_TRABAJOS = os.environ.get('RFM_TRABAJOS', 'trabajos_rfm.sqlite')
+WORKERS_TRABAJOS = int(os.environ.get('RFM_TRABAJOS_WORKERS', 1))
+MAX_RESULTADOS = 20
+
+PENDIENTE, EN_CURSO, TERMINADO, ERROR = 'pendiente', 'en_curso', 'terminado', 'error'
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave TEXT UNIQUE NOT NULL,
+    parametros TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    progreso REAL NOT NULL DEFAULT 0,
+    mensaje TEXT,
+    pid INTEGER,
+    resumen TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+)
+'''
+
+# Conexión en modo autocommit (cada UPDATE de progreso se ve enseguida desde
+# los otros procesos); WAL permite leer mientras un trabajo escribe
+@contextmanager
+def _conectar(ruta=RUTA_TRABAJOS):
+    conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+    try:
+        conexion.row_factory = sqlite3.Row
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute(ESQUEMA)
+        yield conexion
+    finally:
+        conexion.close()
+
+# Reglas de analisis_rfm.REGLAS_SEGMENTOS con otro score mínimo (en R, F y M)
+# para Champions y Leales
+def reglas_con_minimos(minimo_champions, minimo_leales):
+    from analisis_rfm import REGLAS_SEGMENTOS
+
+    minimos = {'Champions': minimo_champions, 'Leales': minimo_leales}
+    return [[nombre, {eje: [minimos[nombre], 5] if nombre in minimos else list(rango)
+                      for eje, rango in condiciones.items()}]
+            for nombre, condiciones in REGLAS_SEGMENTOS]
+
+def clave_trabajo(parametros):
+    texto = json.dumps(parametros, sort_keys=True) + str(version_tabla(RUTA_TRANSACCIONES))
+    return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except (OSError, TypeError):
+        return False
+    return True
+
+def _actualizar(conexion, id_trabajo, **campos):
+    campos['actualizado'] = time.time()
+    conexion.execute(f"UPDATE trabajos SET {', '.join(f'{campo} = ?' for campo in campos)} WHERE id = ?",
+                     (*campos.values(), id_trabajo))
+
+_pool = {'pool': None}
+_bloqueo_pool = threading.Lock()
+
+# Los procesos del pool salen de un forkserver y no de un fork del worker del
+# servidor: este ya tiene hilos (el vigía de datos_dashboard, los del propio
+# servidor) y un fork heredaría sus bloqueos y reiniciaría el vigía en cada
+# proceso de trabajo. El forkserver no precarga el módulo principal (por
+# defecto importaría app.py); cada proceso lo vuelve a importar al arrancar,
+# pero datos_dashboard no carga datos ni arranca el vigía en procesos de pool
+def _pool_trabajos():
+    with _bloqueo_pool:
+        if _pool['pool'] is None:
+            contexto = multiprocessing.get_context('forkserver')
+            contexto.set_forkserver_preload([])
+            _pool['pool'] = ProcessPoolExecutor(max_workers=WORKERS_TRABAJOS, mp_context=contexto)
+        return _pool['pool']
+
+# Encolar un recálculo; devuelve el id del trabajo. Si ya hay uno con los mismos
+# parámetros y datos terminado o en curso se devuelve ese; uno con error o cuyo
+# proceso ya no existe (p. ej. se reinició el servidor) se vuelve a lanzar
+def enviar(parametros):
+    clave = clave_trabajo(parametros)
+    ahora = time.time()
+    with _conectar() as conexion:
+        conexion.execute('BEGIN IMMEDIATE')
+        fila = conexion.execute('SELECT * FROM trabajos WHERE clave = ?', (clave,)).fetchone()
+        if fila is not None and (fila['estado'] == TERMINADO or
+                                 (fila['estado'] in (PENDIENTE, EN_CURSO) and _proceso_vivo(fila['pid']))):
+            conexion.execute('COMMIT')
+            return fila['id']
+        if fila is None:
+            id_trabajo = conexion.execute(
+                'INSERT INTO trabajos (clave, parametros, estado, pid, creado, actualizado) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (clave, json.dumps(parametros, sort_keys=True), PENDIENTE, os.getpid(), ahora, ahora)).lastrowid
+        else:
+            id_trabajo = fila['id']
+            _actualizar(conexion, id_trabajo, estado=PENDIENTE, progreso=0, mensaje=None,
+                        pid=os.getpid(), creado=ahora)
+        conexion.execute('COMMIT')
+    _pool_trabajos().submit(ejecutar, id_trabajo)
+    return id_trabajo
+
+# Estado de un trabajo ({id, estado, progreso, mensaje, parametros, resumen}) o
+# None si no existe; uno pendiente o en curso cuyo proceso terminó se marca con error
+def estado_trabajo(id_trabajo):
+    with _conectar() as conexion:
+        fila = conexion.execute('SELECT * FROM trabajos WHERE id = ?', (id_trabajo,)).fetchone()
+        if fila is None:
+            return None
+        if fila['estado'] in (PENDIENTE, EN_CURSO) and not _proceso_vivo(fila['pid']):
+            _actualizar(conexion, id_trabajo, estado=ERROR, mensaje='El proceso del trabajo terminó sin completarlo')
+            fila = conexion.execute('SELECT * FROM trabajos WHERE id = ?', (id_trabajo,)).fetchone()
+    return {
+        'id': fila['id'],
+        'clave': fila['clave'],
+        'estado': fila['estado'],
+        'progreso': fila['progreso'],
+        'mensaje': fila['mensaje'],
+        'parametros': json.loads(fila['parametros']),
+        'resumen': json.loads(fila['resumen']) if fila['resumen'] else None
+    }
+
+def _recalcular(parametros, progreso):
+    import pandas as pd
+
+    from almacenamiento_rfm import leer_transacciones
+    from analisis_rfm import (COLUMNAS_RESULTADOS, COLUMNAS_TRANSACCIONES, agregar_clientes,
+                              asignar_segmentos, calcular_recencia, compilar_reglas, puntuar_quintiles)
+    from motor_sql import MOTOR_SQL, actualizar_base, agregar_clientes_sql
+
+    fecha_corte = None
+    if parametros.get('fecha_analisis'):
+        # Solo cuentan las compras hasta la fecha de análisis (inclusive). La
+        # recencia se mide como en analisis_rfm, hasta la última compra que
+        # entra en el corte: con la fecha por defecto (el último día de los
+        # datos) el recálculo reproduce la recencia publicada
+        fecha_corte = pd.Timestamp(parametros['fecha_analisis']).normalize() + pd.Timedelta(days=1)
+
+    if MOTOR_SQL:
+        # Con la base SQL la agregación por cliente se hace en la base
+        progreso(0.1, 'Actualizando la base SQL')
+        actualizar_base()
+        progreso(0.4, 'Agregando clientes')
+        rfm = agregar_clientes_sql(fecha_corte)
+        if len(rfm) == 0:
+            raise ValueError(f"No hay transacciones hasta {parametros['fecha_analisis']}")
+        rfm['recency'] = calcular_recencia(rfm['last_purchase'], rfm['last_purchase'].max())
+    else:
+        progreso(0.1, 'Leyendo transacciones')
+        df = leer_transacciones(COLUMNAS_TRANSACCIONES)
+        if fecha_corte is not None:
+            df = df[df['transaction_date'] < fecha_corte]
+            if len(df) == 0:
+                raise ValueError(f"No hay transacciones hasta {parametros['fecha_analisis']}")
+
+        progreso(0.4, 'Agregando clientes')
+        rfm = agregar_clientes(df)
+        del df
+
+    progreso(0.7, 'Asignando scores y segmentos')
+    rfm = puntuar_quintiles(rfm)
+    reglas = parametros.get('reglas')
+    tabla, segmentos = compilar_reglas([(nombre, {eje: tuple(rango) for eje, rango in condiciones.items()})
+                                        for nombre, condiciones in reglas]) if reglas else compilar_reglas()
+    rfm['Segmento'] = asignar_segmentos(rfm['R'], rfm['F'], rfm['M'], tabla, segmentos)
+
+    resumen = rfm.groupby('Segmento', observed=True).agg(
+        clientes=('recency', 'size'), recency=('recency', 'mean'),
+        frequency=('frequency', 'mean'), monetary=('monetary', 'mean')).round(2)
+    resumen.index = resumen.index.astype(str)
+    return rfm[COLUMNAS_RESULTADOS], {
+        'clientes': len(rfm),
+        'segmentos': resumen.reset_index().to_dict('records')
+    }
+
+# Se ejecuta en un proceso del pool
+def ejecutar(id_trabajo):
+    with _conectar() as conexion:
+        fila = conexion.execute('SELECT * FROM trabajos WHERE id = ?', (id_trabajo,)).fetchone()
+        _actualizar(conexion, id_trabajo, estado=EN_CURSO, pid=os.getpid(), progreso=0,
+                    mensaje='Iniciando')
+
+        def progreso(avance, mensaje):
+            _actualizar(conexion, id_trabajo, progreso=avance, mensaje=mensaje)
+
+        try:
+            _, resumen = _recalcular(json.loads(fila['parametros']), progreso)
+        except Exception as error:
+            _actualizar(conexion, id_trabajo, estado=ERROR, mensaje=repr(error))
+            return
+        _actualizar(conexion, id_trabajo, estado=TERMINADO, progreso=1, mensaje='Terminado',
+                    resumen=json.dumps(resumen))
+        limpiar_resultados(conexion)
+
+# Borrar los resultados terminados más antiguos por encima de MAX_RESULTADOS
+def limpiar_resultados(conexion, conservar=MAX_RESULTADOS):
+    viejos = conexion.execute(
+        'SELECT id FROM trabajos WHERE estado = ? ORDER BY actualizado DESC LIMIT -1 OFFSET ?',
+        (TERMINADO, conservar)).fetchall()
+    for fila in viejos:
+        conexion.execute('DELETE FROM trabajos WHERE id = ?', (fila['id'],))
+
+# El pool no sobrevive a fork (p. ej. gunicorn --preload): cada worker crea el suyo
+def _reiniciar_tras_fork():
+    global _bloqueo_pool
+    _bloqueo_pool = threading.Lock()
+    _pool['pool'] = None
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)